@@ -0,0 +1,234 @@
+'''
+Benchmark suite for the power rankings scripts and Misc_Code windows.
+
+Times csv ingestion, stats, rankings and graph rendering on synthetic sheets of
+growing size (see synthetic_ballots.py), plus the Misc_Code window functions, and
+saves the results as json so a later run can be compared against them.
+
+Usage (from this directory):
+    python benchmark_suite.py --size small --save baseline.json
+    python benchmark_suite.py --size small --compare baseline.json --tolerance 0.25
+
+Compare exits with status 1 if anything is slower than the baseline by more than the tolerance.
+
+Python 3.9
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import synthetic_ballots
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NFL_DIR = os.path.join(HERE, '..', 'NFL_Power_Rankings_Reddit')
+NBA_DIR = os.path.join(HERE, '..', 'NBA_Power_Rankings_Reddit')
+MISC_DIR = os.path.join(HERE, '..', 'Misc_Code')
+
+# (rankers, weeks, missing rate) for the script benchmarks, (teams) for the engine, (length) for the windows.
+SIZES = {
+    'small': {'rankers': [32, 256], 'weeks': [4], 'missing_rate': [0.0, 0.1], 'teams': [32, 128], 'window_len': [1000], 'contig_len': [60]},
+    'medium': {'rankers': [32, 1024, 4096], 'weeks': [8], 'missing_rate': [0.0, 0.1], 'teams': [32, 256], 'window_len': [10 ** 4, 10 ** 5], 'contig_len': [60, 120]},
+    'large': {'rankers': [32, 4096, 16384], 'weeks': [17], 'missing_rate': [0.0, 0.2], 'teams': [32, 512, 1024], 'window_len': [10 ** 5, 10 ** 6], 'contig_len': [120, 200]},
+}
+
+@contextlib.contextmanager
+def working_directory(path):
+    '''
+    Temporarily change directory (the scripts use paths relative to their own directory).
+    '''
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+def import_script(directory, name):
+    '''
+    Import a script from its own directory, so its relative data files are found.
+    '''
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    with working_directory(directory), contextlib.redirect_stdout(io.StringIO()):
+        return __import__(name)
+
+def best_time(func, repeat):
+    '''
+    Best wall time in seconds of repeat calls of func.
+    '''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_scripts(size, repeat, results, workdir):
+    '''
+    Benchmark the NFL and NBA Week methods and graphs on synthetic seasons.
+    '''
+    import matplotlib
+    matplotlib.use('Agg')
+    nfl = import_script(NFL_DIR, 'nfl_power_rankings')
+    nba = import_script(NBA_DIR, 'nba_power_rankings')
+    # on the path once a script is imported.
+    import ballots
+    import season_summary
+
+    for n_rankers in size['rankers']:
+        for missing_rate in size['missing_rate']:
+            for n_weeks in size['weeks']:
+                params = {'rankers': n_rankers, 'missing_rate': missing_rate, 'weeks': n_weeks}
+                season_dir = os.path.join(workdir, 'nfl_%d_%s_%d' %(n_rankers, missing_rate, n_weeks))
+                csv_files = synthetic_ballots.write_season(season_dir, 'nfl', n_weeks, n_rankers, 32, missing_rate, names=sorted(nfl.TEAM_COLORS))
+                weeks_data = [nfl.Week(week_no, csv_file, nfl.TEAM_COLORS) for week_no, csv_file in enumerate(csv_files, 1)]
+                week_data = weeks_data[-1]
+
+                results.append(('nfl.Week.convert_csv_to_list', params, best_time(week_data.convert_csv_to_list, repeat)))
+                # the stats a Week reads are calculated by summarize (ballot_stats plus whiskers and outliers).
+                results.append(('nfl.ballots.ballot_stats', params, best_time(lambda: ballots.ballot_stats(week_data.ballots), repeat)))
+                results.append(('nfl.season_summary.summarize', params, best_time(lambda: season_summary.summarize(week_data.teams, week_data.ballots), repeat)))
+                results.append(('nfl.Week.get_power_rankings', params, best_time(week_data.get_power_rankings, repeat)))
+
+                os.makedirs(os.path.join(season_dir, 'boxplots'), exist_ok=True)
+                os.makedirs(os.path.join(season_dir, 'scatterplots'), exist_ok=True)
+                with working_directory(season_dir):
+                    results.append(('nfl.Week.create_boxplot', params, best_time(week_data.create_boxplot, repeat)))
+                    results.append(('nfl.create_scatter', params, best_time(lambda: nfl.create_scatter(weeks_data), repeat)))
+                    results.append(('nfl.export_scatter_timeline', params, best_time(lambda: nfl.export_scatter_timeline(weeks_data, 'season.pdf'), repeat)))
+
+                nba_dir = os.path.join(workdir, 'nba_%d_%s_%d' %(n_rankers, missing_rate, n_weeks))
+                csv_file = synthetic_ballots.write_season(nba_dir, 'nba', 1, n_rankers, 30, missing_rate, names=sorted(nba.TEAM_NICKNAMES))[0]
+                nba_week = nba.Week(1, csv_file)
+                results.append(('nba.Week.convert_csv_to_list', params, best_time(nba_week.convert_csv_to_list, repeat)))
+                results.append(('nba.Week.get_power_rankings', params, best_time(nba_week.get_power_rankings, repeat)))
+                os.makedirs(os.path.join(nba_dir, 'boxplots'), exist_ok=True)
+                with working_directory(nba_dir):
+                    results.append(('nba.Week.create_boxplot', params, best_time(nba_week.create_boxplot, repeat)))
+
+def bench_engine(size, repeat, results, workdir):
+    '''
+    Benchmark league agnostic ingestion and stats with more teams than a real league.
+    '''
+    sys.path.insert(0, os.path.join(HERE, '..', 'Power_Rankings_Common'))
+    import ballots
+    import rank_sketch
+    import rankings_engine
+
+    for n_teams in size['teams']:
+        for n_rankers in size['rankers']:
+            params = {'rankers': n_rankers, 'teams': n_teams}
+            csv_file = synthetic_ballots.write_season(os.path.join(workdir, 'engine_%d_%d' %(n_teams, n_rankers)), 'nfl', 1, n_rankers, n_teams, 0.1)[0]
+            results.append(('rankings_engine.read_rank_rows', params, best_time(lambda: rankings_engine.read_rank_rows(csv_file), repeat)))
+            results.append(('rank_sketch.sketch_rank_rows', params, best_time(lambda: rankings_engine.read_rank_rows(csv_file, encode=rank_sketch.sketch_rank_rows), repeat)))
+            week_ballots = rankings_engine.read_rank_rows(csv_file)[1]
+            results.append(('ballots.ballot_stats', params, best_time(lambda: ballots.ballot_stats(week_ballots), repeat)))
+
+def bench_windows(size, repeat, results):
+    '''
+    Benchmark the Misc_Code window functions.
+    '''
+    conseq = import_script(MISC_DIR, 'conseq_seq_sliding_windows')
+    rolling_windows = import_script(MISC_DIR, 'rolling_windows')
+    rng = np.random.default_rng(0)
+
+    for length in size['window_len']:
+        values = rng.integers(-100, 100, length)
+        value_list = values.tolist()
+        params = {'length': length, 'window': 10}
+        results.append(('conseq.window', params, best_time(lambda: sum(1 for _ in conseq.window(value_list, 10)), repeat)))
+        results.append(('rolling_windows.windows', params, best_time(lambda: sum(1 for _ in rolling_windows.windows(value_list, 10)), repeat)))
+        results.append(('rolling_windows.rolling_max', params, best_time(lambda: rolling_windows.rolling_max(values, 10), repeat)))
+        results.append(('rolling_windows.stream_rolling_max', params, best_time(lambda: sum(1 for _ in rolling_windows.stream_rolling_max(value_list, 10)), repeat)))
+        params = {'length': length}
+        results.append(('conseq.max_contig_sum', params, best_time(lambda: conseq.max_contig_sum(value_list), repeat)))
+        results.append(('conseq.max_contig_sum_batch', params, best_time(lambda: conseq.max_contig_sum_batch(values[None]), repeat)))
+
+    for length in size['contig_len']:
+        # window_no_import makes every window of every length, so only small inputs.
+        value_list = rng.integers(-100, 100, length).tolist()
+        params = {'length': length}
+        results.append(('conseq.window_no_import', params, best_time(lambda: sum(1 for _ in conseq.window_no_import(value_list)), repeat)))
+
+def result_key(name, params):
+    return name + ' ' + json.dumps(params, sort_keys=True)
+
+def compare(results, baseline, tolerance):
+    '''
+    Print each result against the baseline. Returns the list of keys that regressed.
+    '''
+    base_times = {result_key(result['name'], result['params']): result['seconds'] for result in baseline['results']}
+    regressions = []
+    for result in results:
+        key = result_key(result['name'], result['params'])
+        if key not in base_times:
+            print('%-80s %10.5fs (new)' %(key, result['seconds']))
+            continue
+        ratio = result['seconds'] / base_times[key] if base_times[key] else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print('%-80s %10.5fs %6.2fx%s' %(key, result['seconds'], ratio, flag))
+    return regressions
+
+def main(argv=None):
+    '''
+    Run the benchmarks, then save and/or compare the results.
+    '''
+    parser = argparse.ArgumentParser(description='Power rankings benchmark suite.')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs (default %(default)s)')
+    parser.add_argument('--only', choices=('scripts', 'engine', 'windows'), action='append', help='only run these groups (default all)')
+    parser.add_argument('--save', help='save the results to this json file')
+    parser.add_argument('--compare', help='compare against the results in this json file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs the baseline (default %(default)s = 25%%)')
+    args = parser.parse_args(argv)
+
+    size = SIZES[args.size]
+    groups = args.only or ['scripts', 'engine', 'windows']
+    raw_results = []
+    workdir = tempfile.mkdtemp(prefix='power_rankings_bench_')
+    try:
+        if 'scripts' in groups:
+            bench_scripts(size, args.repeat, raw_results, workdir)
+        if 'engine' in groups:
+            bench_engine(size, args.repeat, raw_results, workdir)
+        if 'windows' in groups:
+            bench_windows(size, args.repeat, raw_results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = [{'name': name, 'params': params, 'seconds': seconds} for name, params, seconds in raw_results]
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as open_file:
+            regressions = compare(results, json.load(open_file), args.tolerance)
+        if regressions:
+            print('%d regression(s) over %d%%' %(len(regressions), args.tolerance * 100))
+            status = 1
+    else:
+        for result in results:
+            print('%-80s %10.5fs' %(result_key(result['name'], result['params']), result['seconds']))
+
+    if args.save:
+        with open(args.save, 'w') as open_file:
+            json.dump({'size': args.size, 'repeat': args.repeat, 'python': platform.python_version(),
+                       'machine': platform.machine(), 'results': results}, open_file, indent=1)
+
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+'''
+Synthetic power rankings ballots for benchmarking.
+
+Each team gets a strength and each ranker ranks the teams by strength plus their own
+noise, so the ballots look like the real ones (a clear top and bottom, a muddled middle).
+Any number of rankers, teams and weeks, and a share of missing rankers ('--' columns
+like the NBA sheets), written in either the NFL or NBA csv format.
+
+Python 3.9
+'''
+
+import csv
+import os
+
+import numpy as np
+
+def generate_ballots(n_rankers, n_teams, missing_rate=0.0, noise=4.0, seed=0):
+    '''
+    Returns a (rankers x teams) array of ranks (1 = best), 0 for the rankers that are missing.
+    '''
+    rng = np.random.default_rng(seed)
+    strength = np.sort(rng.normal(0, n_teams / 4, n_teams))[::-1]
+    scores = strength + rng.normal(0, noise, (n_rankers, n_teams))
+    # argsort of argsort turns scores into ranks, best score = rank 1.
+    week_ballots = (np.argsort(np.argsort(-scores, axis=1), axis=1) + 1).astype(np.int16)
+    week_ballots[rng.random(n_rankers) < missing_rate] = 0
+    return week_ballots
+
+def team_names(n_teams, names=None):
+    '''
+    Returns n_teams team names, from names (e.g. the real teams, so colors and nicknames work) if there are enough.
+    '''
+    if names is not None and len(names) >= n_teams:
+        return list(names)[:n_teams]
+    return ['Team%03d' %(idx) for idx in range(1, n_teams + 1)]
+
+def _rank_columns(teams, week_ballots):
+    '''
+    Returns a (ranks x rankers) list of lists of team names, '--' for missing rankers.
+    '''
+    n_rankers, n_teams = week_ballots.shape
+    order = np.argsort(week_ballots, axis=1) # team index at each rank, per ranker
+    columns = []
+    for ranker in range(n_rankers):
+        if week_ballots[ranker, 0] == 0:
+            columns.append(['--'] * n_teams)
+        else:
+            columns.append([teams[idx] for idx in order[ranker]])
+    return [list(row) for row in zip(*columns)]
+
+def write_nfl_csv(csv_file, teams, week_ballots):
+    '''
+    Write ballots as an NFL sheet: one row per rank, one column per ranker, no header.
+    '''
+    with open(csv_file, 'w', newline='') as open_file:
+        csv.writer(open_file).writerows(_rank_columns(teams, week_ballots))
+
+def write_nba_csv(csv_file, teams, week_ballots):
+    '''
+    Write ballots as an NBA sheet: a header row of rankers, a rank column, one column per ranker,
+    then a blank column and some summary columns (which the readers ignore).
+    '''
+    n_rankers = week_ballots.shape[0]
+    with open(csv_file, 'w', newline='') as open_file:
+        writer = csv.writer(open_file)
+        writer.writerow(['1/1/16'] + ['Team ranker%d' %(idx) for idx in range(1, n_rankers + 1)] + ['', '', 'Median', 'Average'])
+        for rank, row in enumerate(_rank_columns(teams, week_ballots), 1):
+            writer.writerow([rank] + row + ['', teams[rank - 1], rank, rank])
+
+def write_season(directory, fmt, n_weeks, n_rankers, n_teams, missing_rate=0.0, names=None, seed=0):
+    '''
+    Write n_weeks synthetic sheets into directory in fmt ('nfl' or 'nba').
+    Returns the list of csv filenames, in week order.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    teams = team_names(n_teams, names)
+    writer = write_nfl_csv if fmt == 'nfl' else write_nba_csv
+    csv_files = []
+    for week_no in range(1, n_weeks + 1):
+        csv_file = os.path.join(directory, '%s_week%s.csv' %(fmt, str(week_no).rjust(2, '0')))
+        writer(csv_file, teams, generate_ballots(n_rankers, n_teams, missing_rate, seed=seed + week_no))
+        csv_files.append(csv_file)
+    return csv_files
@@ -11,6 +11,8 @@ Chris
 
 from collections import deque
 
+import numpy as np
+
 def window_no_import(seq, n=2):
     '''
     Sliding window without using import.
@@ -30,6 +32,7 @@ def window(seq, n=3):
     Takes seq, a sequence (list), and n, an int for length of the sliding window.
     e.g ([1, 2, 3, 4], 3) returns (1, 2, 3) and (2, 3, 4).
     Triangular progression, n * (n+1) / 2 or O(n**2).
+    Copies every window into a new list, see rolling_windows.windows for windows without copying.
     '''
     it = iter(seq)
     win = deque((next(it, None) for _ in range(n)), maxlen=n)
@@ -43,13 +46,78 @@ def max_contig_sum(L):
     """ L, a list of integers, at least one positive
     Returns the maximum sum of a contiguous subsequence in L """
 
-    # get all possible sliding windows of all possible lengths.
-    options = []
-    for n in range(len(L) + 1):
-        options.extend([item for item in window(L, n)])
+    # O(n) with Kadane's algorithm, rather than summing every window of every length (O(n**3)).
+    return max_contig_subsequence(L)[0]
+
+def max_contig_subsequence(L):
+    '''
+    Takes L, a sequence of numbers (not empty).
+    Returns (max sum, start, end) of the best contiguous subsequence, so sum(L[start:end]) == max sum.
+    O(n) time, O(1) memory.
+    '''
+    return max_contig_sum_stream(L)
+
+def max_contig_sum_stream(iterable):
+    '''
+    Kadane's algorithm over any iterable or iterator (e.g. a generator of millions of values),
+    only keeping the current and best runs in memory.
+    Returns (max sum, start, end) where start and end are positions in the stream, end exclusive.
+    Ties keep the earliest, shortest subsequence.
+    '''
+    best = best_start = best_end = None
+    cur = cur_start = 0
+    for idx, value in enumerate(iterable):
+        # start a new run if the current one can't help.
+        if idx == 0 or cur <= 0:
+            cur, cur_start = value, idx
+        else:
+            cur += value
+        if best is None or cur > best:
+            best, best_start, best_end = cur, cur_start, idx + 1
+
+    if best is None:
+        raise ValueError('max_contig_sum_stream() arg is an empty sequence')
+    return best, best_start, best_end
+
+def max_contig_sum_batch(seqs):
+    '''
+    Takes seqs, a 2d array (or list of sequences, which can be different lengths) with one sequence per row.
+    Returns three arrays (max sums, starts, ends), one value per sequence, end exclusive.
+    Vectorized with numpy using prefix sums: the best sum ending at j is prefix[j] - min(prefix[:j]).
+    '''
+    if isinstance(seqs, np.ndarray) and seqs.ndim == 2:
+        values = seqs
+        lengths = np.full(len(seqs), seqs.shape[1])
+    else:
+        arrays = [np.asarray(seq) for seq in seqs]
+        lengths = np.array([len(array) for array in arrays])
+        if not arrays:
+            raise ValueError('max_contig_sum_batch() got no sequences')
+        # pad the shorter sequences with zeros, they are masked out below.
+        values = np.zeros((len(arrays), lengths.max()), dtype=np.result_type(*set(array.dtype for array in arrays)))
+        for row, array in enumerate(arrays):
+            values[row, :len(array)] = array
+    if (lengths == 0).any():
+        raise ValueError('max_contig_sum_batch() got an empty sequence')
+
+    n_seqs, length = values.shape
+    prefix = np.zeros((n_seqs, length + 1), dtype=np.result_type(values.dtype, np.int64))
+    np.cumsum(values, axis=1, out=prefix[:, 1:])
+
+    # best[:, j - 1] = best sum of a subsequence ending at position j (exclusive end).
+    lowest = np.minimum.accumulate(prefix[:, :-1], axis=1)
+    best = (prefix[:, 1:] - lowest).astype(np.float64)
+    best[np.arange(length) >= lengths[:, None]] = -np.inf # padding of shorter sequences
+    ends = best.argmax(axis=1) + 1
+
+    # start = position of the lowest prefix before the end (the last one, for the shortest subsequence).
+    before_end = np.arange(length) < ends[:, None]
+    masked = np.where(before_end, prefix[:, :-1], np.inf if prefix.dtype.kind == 'f' else np.iinfo(prefix.dtype).max)
+    rows = np.arange(n_seqs)
+    starts = length - 1 - masked[:, ::-1].argmin(axis=1)
+    sums = prefix[rows, ends] - prefix[rows, starts]
 
-    # return the max sum from the possible options.
-    return sum(max(options, key=sum))
+    return sums, starts, ends
 
 def testing():
     '''
@@ -59,6 +127,9 @@ def testing():
     print(max_contig_sum([10, -8, 2]), 10)
     print(max_contig_sum([5, -2, 7]), 10)
     print(max_contig_sum([1, 2, 3, -10, 40, -50, 100]), 100)
+    print(max_contig_subsequence([5, -2, 7]), (10, 0, 3))
+    print(max_contig_sum_stream(iter([-3, 4, -1, 2, -8, 1])), (5, 1, 4))
+    print(max_contig_sum_batch([[1, 2, 3], [10, -8, 2], [1, 2, 3, -10, 40, -50, 100]]), ([6, 10, 100], [0, 0, 6], [3, 1, 7]))
 
 a = window([1, 2, 3, 4, 5], 2)
 for item in a:
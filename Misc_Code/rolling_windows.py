@@ -0,0 +1,174 @@
+'''
+Rolling windows without copying
+
+Sliding windows and rolling aggregates (sum, mean, min, max) that never build a
+new list per window.
+- numpy arrays get zero copy strided views, one row per window.
+- any other iterable gets a reused read-only buffer, so each window is a view, not a new list.
+- rolling sum/mean use prefix sums, rolling min/max use the van Herk/Gil-Werman block
+  trick on arrays and a monotonic deque on streams, so everything is O(n) whatever the window size.
+
+Python 3.9, numpy 1.20 (sliding_window_view)
+'''
+
+from collections import deque
+
+import numpy as np
+
+def windows(seq, n, dtype=object):
+    '''
+    Takes seq, an array or any iterable, n, the window length, and dtype, the numpy dtype of the
+    reused buffer for iterables (e.g. float for a stream of numbers, the default works for anything).
+    For a numpy array returns a read-only (len(seq) - n + 1, n) strided view, no data is copied.
+    Otherwise returns a generator of read-only views of length n into one reused buffer, each view
+    is only valid until the next one is produced (copy it with tuple(view) to keep it).
+    e.g windows([1, 2, 3, 4], 3) gives [1, 2, 3] then [2, 3, 4].
+    Input shorter than n has no windows: an empty (0, n) view of an array, an empty generator otherwise.
+    '''
+    if n < 1:
+        raise ValueError('window length must be at least 1')
+    if isinstance(seq, np.ndarray):
+        if len(seq) < n:
+            return np.lib.stride_tricks.as_strided(seq, (0,) + seq.shape[1:] + (n,), seq.strides + seq.strides[:1], writeable=False)
+        return np.lib.stride_tricks.sliding_window_view(seq, n, axis=0)
+    return _iter_windows(seq, n, dtype)
+
+def _iter_windows(iterable, n, dtype):
+    '''
+    Each value is written twice into a buffer of length 2n (at i and i + n), so the last n values
+    are always buf[start:start + n], a contiguous slice that can be returned as a view.
+    '''
+    it = iter(iterable)
+    first = [value for _, value in zip(range(n), it)]
+    if len(first) < n:
+        return
+
+    buf = np.empty(2 * n, dtype=dtype)
+    buf[:n] = first
+    buf[n:] = first
+    view = buf.view()
+    view.setflags(write=False)
+    yield view[:n]
+
+    start = 0
+    for value in it:
+        buf[start] = value
+        buf[start + n] = value
+        start += 1
+        if start == n:
+            start = 0
+        yield view[start:start + n]
+
+def rolling_sum(values, n):
+    '''
+    Sum of every window of length n of values (array like), as an array of len(values) - n + 1.
+    Uses prefix sums, O(len(values)) whatever n is.
+    For floats the prefix sums can lose a little precision on very long arrays.
+    '''
+    values = np.asarray(values)
+    if n < 1 or n > len(values):
+        raise ValueError('window length must be between 1 and len(values)')
+    prefix = np.zeros(len(values) + 1, dtype=np.result_type(values.dtype, np.int64))
+    np.cumsum(values, out=prefix[1:])
+    return prefix[n:] - prefix[:-n]
+
+def rolling_mean(values, n):
+    '''
+    Mean of every window of length n of values, as an array of len(values) - n + 1.
+    '''
+    return rolling_sum(values, n) / n
+
+def _rolling_extreme(values, n, accumulate, pick):
+    '''
+    van Herk/Gil-Werman: split values into blocks of n, then the window starting at i is
+    covered by the suffix of its block from i and the prefix of the next block up to i + n - 1.
+    '''
+    values = np.asarray(values)
+    if n < 1 or n > len(values):
+        raise ValueError('window length must be between 1 and len(values)')
+    n_blocks = -(-len(values) // n)
+    padded = np.empty(n_blocks * n, dtype=values.dtype)
+    padded[:len(values)] = values
+    padded[len(values):] = values[-1] # padding is never the only value in a window, so any value will do
+    blocks = padded.reshape(n_blocks, n)
+
+    prefix = accumulate(blocks, axis=1).ravel()
+    suffix = accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    n_windows = len(values) - n + 1
+    return pick(suffix[:n_windows], prefix[n - 1:n - 1 + n_windows])
+
+def rolling_min(values, n):
+    '''
+    Minimum of every window of length n of values, as an array of len(values) - n + 1. O(len(values)).
+    '''
+    return _rolling_extreme(values, n, np.minimum.accumulate, np.minimum)
+
+def rolling_max(values, n):
+    '''
+    Maximum of every window of length n of values, as an array of len(values) - n + 1. O(len(values)).
+    '''
+    return _rolling_extreme(values, n, np.maximum.accumulate, np.maximum)
+
+def stream_rolling_sum(iterable, n):
+    '''
+    Generator of the sum of every window of length n of an iterable, keeping only the window in memory.
+    '''
+    win = deque()
+    total = 0
+    for value in iterable:
+        win.append(value)
+        total += value
+        if len(win) > n:
+            total -= win.popleft()
+        if len(win) == n:
+            yield total
+
+def stream_rolling_mean(iterable, n):
+    '''
+    Generator of the mean of every window of length n of an iterable.
+    '''
+    for total in stream_rolling_sum(iterable, n):
+        yield total / n
+
+def _stream_extreme(iterable, n, better):
+    '''
+    Monotonic deque of (index, value): values that can never be the answer again are dropped
+    from the back, so each value is added and removed at most once.
+    '''
+    candidates = deque()
+    for idx, value in enumerate(iterable):
+        while candidates and not better(candidates[-1][1], value):
+            candidates.pop()
+        candidates.append((idx, value))
+        if candidates[0][0] <= idx - n:
+            candidates.popleft()
+        if idx >= n - 1:
+            yield candidates[0][1]
+
+def stream_rolling_min(iterable, n):
+    '''
+    Generator of the minimum of every window of length n of an iterable, O(1) amortised per value.
+    '''
+    return _stream_extreme(iterable, n, lambda kept, new: kept < new)
+
+def stream_rolling_max(iterable, n):
+    '''
+    Generator of the maximum of every window of length n of an iterable, O(1) amortised per value.
+    '''
+    return _stream_extreme(iterable, n, lambda kept, new: kept > new)
+
+def testing():
+    '''
+    testing
+    '''
+    print(windows(np.arange(5), 3).tolist(), [[0, 1, 2], [1, 2, 3], [2, 3, 4]])
+    print([tuple(win) for win in windows(iter('abcd'), 2)], [('a', 'b'), ('b', 'c'), ('c', 'd')])
+    print(rolling_sum([1, 2, 3, 4, 5], 2).tolist(), [3, 5, 7, 9])
+    print(rolling_mean([1, 2, 3, 4, 5], 2).tolist(), [1.5, 2.5, 3.5, 4.5])
+    print(rolling_min([4, 2, 12, 3, 8, 1, 5], 3).tolist(), [2, 2, 3, 1, 1])
+    print(rolling_max([4, 2, 12, 3, 8, 1, 5], 3).tolist(), [12, 12, 12, 8, 8])
+    print(list(stream_rolling_sum(iter([1, 2, 3, 4, 5]), 2)), [3, 5, 7, 9])
+    print(list(stream_rolling_min(iter([4, 2, 12, 3, 8, 1, 5]), 3)), [2, 2, 3, 1, 1])
+    print(list(stream_rolling_max(iter([4, 2, 12, 3, 8, 1, 5]), 3)), [12, 12, 12, 8, 8])
+
+#testing()
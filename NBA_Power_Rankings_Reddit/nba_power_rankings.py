@@ -8,7 +8,7 @@ Example: https://www.reddit.com/r/nba/comments/5goop7/official_rnba_power_rankin
 
 Last Updated: 2016-Dec-06
 First Created: 2016-Nov-05
-Python 3.5
+Python 3.9
 Chris
 
 Todo:
@@ -18,177 +18,340 @@ Todo:
 # add assertions, try/except, comments, pylint, tidy comments
 '''
 
-import matplotlib.pyplot as plt
-import csv
-import collections
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Power_Rankings_Common'))
+import ballots
+import graphs
+import instrumentation
+import rank_aggregation
+import rank_bootstrap
+import rankings_cli
+import ranker_analytics
+import rankings_engine
+import render_cache
+import season_store
+import season_summary
+import team_names
+
+# matplotlib is slow to import, so it's only imported inside the functions that draw graphs.
 
 class Week(object):
     '''
     '''
-    def __init__(self, week_no, csv_file):
+    def __init__(self, week_no, csv_file, summary_table=None, method='mean', max_fliers=None, sketch=None):
         '''
-        Create Week object. Takes an int for week_no, filename for csv_file.
+        Create Week object. Takes an int for week_no, filename for csv_file and optionally
+        a season_summary.SummaryTable to load/save the week's summary, the rank_aggregation
+        method used for the power rankings (default mean rank) and the most outliers per team
+        drawn on the boxplot (default all).
+        Or a rank_sketch.RankSketch of the week (see get_weeks_sketches) in place of reading the csv,
+        the summary is then read off the sketch, ballots, rankers and pr_data are None and the method is mean rank.
         '''
         self.week_no = week_no
         self.csv_file = csv_file
-
-        self.pr_data = self.convert_csv_to_list()
-        self.power_rankings = self.get_power_rankings()
+        self.method = method
+        self.max_fliers = max_fliers
+        self.sketch = sketch
+
+        if sketch is not None:
+            self.teams, self.ballots, self.rankers, self.pr_data = sketch.teams, None, None, None
+        else:
+            self.pr_data = self.convert_csv_to_list()
+        with instrumentation.stage('summary', week=week_no):
+            if sketch is not None:
+                self.summary = sketch.summary()
+            elif summary_table is None:
+                self.summary = season_summary.summarize(self.teams, self.ballots)
+            else:
+                self.summary = summary_table.get(week_no, season_store.csv_source(csv_file), self.teams, self.ballots)
+        self.stats = self.summary.stats
+        with instrumentation.stage('rankings', week=week_no):
+            self.power_rankings = self.get_power_rankings()
 
     def convert_csv_to_list(self):
         '''
-        Takes a csv of data and converts it into a dict.
-        Returns a dict in the form {team1: [ranking1, ranking2], team2: [ranking1, ranking2]} etc.
+        Takes a csv of data and converts it into self.teams (list of team names),
+        self.ballots (rankers x teams array of ranks, '--' missing rankers are ballots.MISSING)
+        and self.rankers (list of ranker names from the header).
+        Cells are resolved to team names by TEAM_NAMES, so 'GSW' or 'Warriors' give 'Golden State'.
+        Returns a dict in the form {team1: array([ranking1, ranking2]), team2: ...} etc.
         '''
-        # so that when appending row no, if it's the first append for this team
-        # it first creates a list before appending the value. Could also use try... except.
-        pr_data = collections.defaultdict(list)
-
-        for row_idx, row in enumerate(csv.reader(open(self.csv_file))):
-            if row_idx > 0: # skip header
-                for col_team in row[1:31]:
-                    pr_data[col_team].append(row_idx)
-
-        pr_data.pop('--', None) # get rid of missing rankers
+        with instrumentation.stage('csv', week=self.week_no):
+            self.teams, self.ballots, self.rankers = rankings_engine.read_wide_sheet(self.csv_file, clean_name=TEAM_NAMES.clean_name)
 
         # check there are 30 nba teams
-        assert len(pr_data) == 30
-        return pr_data
+        assert len(self.teams) == rankings_engine.LEAGUES['nba'].n_teams
+        return ballots.team_rankings(self.teams, self.ballots)
 
     def get_power_rankings(self):
         '''
+        Return a list of teams in ascending order of mean rank, or by another rank_aggregation method.
         '''
-        # using sum at the moment which is ok as all have same number of rankings
-        return [item[0] for item in sorted(self.pr_data.items(), key=lambda x:sum(x[1]))]
+        if self.method != 'mean':
+            return rank_aggregation.aggregate(self.teams, self.ballots, self.method)
+
+        # mean not sum, so a team isn't pushed down by rankers who missed it.
+        return [item[0] for item in sorted(zip(self.teams, self.stats['mean'].tolist()), key=lambda x: x[1])]
 
-    def create_boxplot(self):
+    def print_power_rankings(self):
         '''
-        Create boxplot.
+        Print power rankings in the format 1 Golden State \n 2 San Antonio
         '''
+        for rank, team in enumerate(self.power_rankings, 1):
+            print(rank, team)
+
+    def create_boxplot(self, filename=None):
+        '''
+        Create boxplot. Returns the saved filename.
+        filename defaults to boxplot_filename, it can also be a file object (e.g. io.BytesIO).
+        Records the draw (figure and boxes), style (colors and labels) and save stages.
+        '''
+        import matplotlib.pyplot as plt
+
         team_labels = list(reversed(self.power_rankings)) # reversed to get 1. team at top, 32. team at bottom.
-        team_rankings = [self.pr_data[team] for team in team_labels]
+        team_stats = self.summary.bxp_stats(team_labels, self.max_fliers)
         team_labels = [TEAM_NICKNAMES[team] for team in team_labels]
 
         team_colors = [TEAM_COLORS[team] if team in TEAM_COLORS else ('red', 'black', 'yellow') for team in team_labels]
 
-        # Create a figure instance
-        fig = plt.figure(figsize=(15, 8))
+        with instrumentation.stage('boxplot.draw', week=self.week_no):
+            # Create a figure instance
+            fig = plt.figure(figsize=(15, 8))
 
-        # Create an axes instance
-        ax = fig.add_subplot(111)
+            # Create an axes instance
+            ax = fig.add_subplot(111)
 
-        ax.set_title('NBA Reddit Power Rankings - #%d' %(self.week_no))
-        ax.set_xlabel('Rank')
-        ax.set_ylabel('Team Avg. Rank')
+            ax.set_title('NBA Reddit Power Rankings - #%d' %(self.week_no))
+            ax.set_xlabel('Rank')
+            ax.set_ylabel('Team Avg. Rank')
 
-        # Create the boxplot
-        bp = ax.boxplot(team_rankings, patch_artist=True, vert=False)
+            # Create the boxplot from the precomputed quartiles, whiskers and outliers.
+            bp = ax.bxp(team_stats, patch_artist=True, vert=False)
 
-        ## change outline color, fill color and linewidth of the boxes
-        assert len(bp['boxes']) == len(bp['medians']), 'Boxes and medians differ.'
+        with instrumentation.stage('boxplot.style', week=self.week_no):
+            ## change outline color, fill color and linewidth of the boxes
+            assert len(bp['boxes']) == len(bp['medians']), 'Boxes and medians differ.'
 
-        for idx in range(len(bp['boxes'])):
-            box = bp['boxes'][idx]
-            median = bp['medians'][idx]
-            box.set(color='black', linewidth=2) # change outline color of box to team color 1
-            box.set(facecolor=team_colors[idx][0], alpha=0.7) # change fill color of box to team color 1
-            median.set(color=team_colors[idx][1], linewidth=2, marker='o') # change median color to team color 3
+            for idx in range(len(bp['boxes'])):
+                box = bp['boxes'][idx]
+                median = bp['medians'][idx]
+                box.set(color='black', linewidth=2) # change outline color of box to team color 1
+                box.set(facecolor=team_colors[idx][0], alpha=0.7) # change fill color of box to team color 1
+                median.set(color=team_colors[idx][1], linewidth=2, marker='o') # change median color to team color 3
 
-        ## change color and linewidth of the whiskers
-        for whisker in bp['whiskers']:
-            whisker.set(color='grey', linewidth=2, alpha=0.5)
+            ## change color and linewidth of the whiskers
+            for whisker in bp['whiskers']:
+                whisker.set(color='grey', linewidth=2, alpha=0.5)
 
-        ## change color and linewidth of the caps
-        for cap in bp['caps']:
-            cap.set(color='grey', linewidth=2)
+            ## change color and linewidth of the caps
+            for cap in bp['caps']:
+                cap.set(color='grey', linewidth=2)
 
-        ## change the style of fliers and their fill
-        for flier in bp['fliers']:
-            flier.set(marker='o', color='#e7298a', alpha=0.2)
+            ## change the style of fliers and their fill
+            for flier in bp['fliers']:
+                flier.set(marker='o', color='#e7298a', alpha=0.2)
 
-        ## Custom y-axis labels
-        ax.set_yticklabels([str(30 - x) + '. ' + team_labels[x] for x in range(len(team_labels))])
+            ## Custom y-axis labels
+            ax.set_yticklabels([str(30 - x) + '. ' + team_labels[x] for x in range(len(team_labels))])
 
-        ## Remove top axes and right axes ticks
-        ax.get_xaxis().tick_bottom()
-        ax.get_yaxis().tick_left()
+            ## Remove top axes and right axes ticks
+            ax.get_xaxis().tick_bottom()
+            ax.get_yaxis().tick_left()
 
-        # set x limit rank to 1-31
-        ax.set_xlim(0, 31)
+            # set x limit rank to 1-31
+            ax.set_xlim(0, 31)
 
-        # add faint grid on x axis to make it easier to see rank
-        ax.xaxis.grid(True, linestyle='-', which='major', color='lightgrey', alpha=0.7)
+            # add faint grid on x axis to make it easier to see rank
+            ax.xaxis.grid(True, linestyle='-', which='major', color='lightgrey', alpha=0.7)
 
-        plt.show()
+        #plt.show()
 
         # Save the figure
-        fig.savefig('boxplots/nba_power_rankings_boxplot_week%s.png' %(str(3).rjust(2, '0')), bbox_inches='tight')
+        filename = boxplot_filename(self.week_no) if filename is None else filename
+        with instrumentation.stage('boxplot.save', week=self.week_no):
+            graphs.save_figure(fig, filename)
+            plt.close(fig)
+
+        return filename
 
 ### END OF WEEK OBJECT
 
-def get_team_names_from_file(filename):
+def boxplot_filename(week_no):
     '''
-    dict {'Houston': 'Rockets', 'Golden State': 'Warriors'}
+    Filename of the boxplot for week_no.
     '''
-    team_names_dict = {}
-    with open(filename, 'r') as open_file:
-        for line in open_file:
-            line_data = line.split()
-            if len(line_data) == 2 and line_data[0] != 'LA':
-                team_names_dict[line_data[0]] = line_data[-1]
-            elif len(line_data) == 3 or line_data[0] == 'LA':
-                team_names_dict[line_data[0] + ' ' + line_data[1]] = line_data[-1]
-            else:
-                print('error!')
-    return team_names_dict
+    return 'boxplots/nba_power_rankings_boxplot_week%s.png' %(str(week_no).rjust(2, '0'))
 
-def get_team_colors(colors_filename):
+def get_team_names_from_file(filename):
     '''
-    Takes a txt filename and returns a dict of tuples of team colors
-    in the format {Team1: (Main Color, Secondary Color, Third Color)}.
-    If a color is missing then a complimentary color is appended.
+    dict {'Houston': 'Rockets', 'Golden State': 'Warriors', 'LA Clippers': 'Clippers'}
+    '''
+    return {team: nickname for team, city, nickname in team_names.read_team_list(filename)}
 
-    # http://teamcolorcodes.com/nba-team-color-codes/
+def get_weeks_data(weeks, summary_dir=None, method='mean', max_fliers=None):
+    '''
+    Takes a list of weeks and returns a list of Week objects.
+    If summary_dir is given each week's summary is saved there and only recalculated when its csv, the team list or aliases change.
+    method is the rank_aggregation method for the power rankings, max_fliers the most outliers drawn per team.
     '''
-    team_colors = {}
-    with open(colors_filename) as file_name:
-        team_colors = {item[0]: item[1:] for item in [line.split() for line in file_name]}
+    summary_table = None if summary_dir is None else season_summary.SummaryTable(summary_dir, [TEAM_LIST_FILE, TEAM_ALIASES_FILE])
+    return [Week(week_no, CSV_FILE_LIST[week_no - 1], summary_table, method, max_fliers) for week_no in weeks]
 
-    for team, colors in team_colors.items():
-        while len(colors) < 3:
-            try:
-            # http://stackoverflow.com/questions/1664140/js-function-to-calculate-complementary-colour
-            # if missing a color, then add a roughly complimentary color to the main team color.
-            # format by adding # and removing 0x from the start of the hex string.
-                complimentary_color = (int(hex(0xffffff), 16) ^ int('0x'+colors[0][1:], 16))
-                colors.append('#'+hex(complimentary_color)[2:])
-            except:
-                raise ValueError('Problem with color', team, colors)
+def get_weeks_sketches(weeks, workers=None, max_fliers=None):
+    '''
+    Takes a list of weeks and returns a list of Week objects drawn from rank sketches rather than ballots.
+    Each csv is counted into a rank_sketch.RankSketch as it is read (rankings_engine.ingest_sketches),
+    in a process pool of workers processes (0 = one per core, None = in this process), and sketches of
+    the same week (e.g. csv shards) are merged. The sketches are exact, so the graphs are the same as from the ballots.
+    '''
+    sources = [rankings_engine.Source('nba', None, week_no, CSV_FILE_LIST[week_no - 1]) for week_no in weeks]
+    (sketch_weeks,) = rankings_engine.ingest_sketches(sources, workers).values()
+    return [Week(sketch_week.week_no, CSV_FILE_LIST[sketch_week.week_no - 1], max_fliers=max_fliers, sketch=sketch_week.sketch) for sketch_week in sketch_weeks]
 
-    return team_colors
+def render_job(job_skip):
+    '''
+    Render one graph job, a tuple of ('boxplot', 'heatmap' or 'season_heatmap', list of weeks), job_skip is (job, filenames to skip).
+    Module level so it can be sent to a worker process. Returns the saved filename.
+    '''
+    (kind, weeks), skip = job_skip
+    if kind == 'heatmap':
+        return graphs.create_heatmap(weeks[-1], LEAGUE_NAME, FILE_PREFIX, week_label=WEEK_LABEL, display_names=TEAM_NICKNAMES)
+    if kind == 'season_heatmap':
+        return graphs.create_season_heatmap(weeks, LEAGUE_NAME, FILE_PREFIX, week_label=WEEK_LABEL, display_names=TEAM_NICKNAMES)
+    return weeks[-1].create_boxplot()
+
+def render_png(job):
+    '''
+    Render one graph job, a tuple of (kind, list of weeks) as render_job, into memory.
+    Module level so it can be sent to a worker process. Returns the png bytes.
+    '''
+    kind, weeks = job
+    buffer = io.BytesIO()
+    if kind == 'heatmap':
+        graphs.create_heatmap(weeks[-1], LEAGUE_NAME, FILE_PREFIX, buffer, WEEK_LABEL, TEAM_NICKNAMES)
+    elif kind == 'season_heatmap':
+        graphs.create_season_heatmap(weeks, LEAGUE_NAME, FILE_PREFIX, buffer, WEEK_LABEL, TEAM_NICKNAMES)
+    else:
+        weeks[-1].create_boxplot(buffer)
+    return buffer.getvalue()
+
+def graph_outputs(job, cache):
+    '''
+    Returns a list of (filename, render cache key) saved by a graph job.
+    The key covers the csvs, team colors, team names and aliases, the style version, the ranking method and outlier cap.
+    '''
+    kind, weeks = job
+    key = cache.key([week_data.csv_file for week_data in weeks] + [TEAM_COLORS_FILE, TEAM_LIST_FILE, TEAM_ALIASES_FILE],
+                    kind, STYLE_VERSION, weeks[-1].method, weeks[-1].max_fliers)
+    if kind == 'boxplot':
+        return [(boxplot_filename(weeks[-1].week_no), key)]
+    filename = {'heatmap': graphs.heatmap_filename, 'season_heatmap': graphs.season_heatmap_filename}[kind]
+    return [(filename(FILE_PREFIX, weeks[-1].week_no), key)]
+
+def produce_all_graphs(weeks_data, workers=None, cache=None, heatmaps=False):
+    '''
+    Produce all graphs for all weeks.
+    workers = None renders one after another, otherwise the graphs are rendered
+    in a process pool of that many workers (0 = one per core).
+    cache = a render_cache.RenderCache, only graphs whose inputs have changed are rendered.
+    heatmaps = True also renders the rank frequency and season heatmaps.
+    Returns the sorted list of saved filenames.
+    '''
+    jobs = []
+    for idx, week_data in enumerate(weeks_data):
+        jobs.append(('boxplot', [week_data]))
+        if heatmaps:
+            jobs.extend([('heatmap', [week_data]), ('season_heatmap', weeks_data[:idx+1])])
+    return render_cache.render_stale(cache, render_job, jobs, lambda job: graph_outputs(job, cache), workers)
+
+def produce_current_week_graphs(weeks_data, workers=None, cache=None, heatmaps=False):
+    '''
+    Produce all graphs for the current week, heatmaps = True also renders its heatmaps.
+    '''
+    #create_scatter(weeks_data)
+    jobs = [('boxplot', weeks_data[-1:])]
+    if heatmaps:
+        jobs.extend([('heatmap', weeks_data[-1:]), ('season_heatmap', weeks_data)])
+    return render_cache.render_stale(cache, render_job, jobs, lambda job: graph_outputs(job, cache), workers)
 
-def get_weeks_data(weeks):
+def main(argv=None):
     '''
-    Takes a list of weeks and returns a list of Week objects.
+    Command line entry point, see rankings_cli. Renders the current week's graphs if no command is given.
+    Run from this directory.
     '''
-    return [Week(week_no, CSV_FILE_LIST[week_no - 1]) for week_no in weeks]
+    parser, render_parser = rankings_cli.build_parser('NBA power rankings from Reddit.', CUR_WEEK, default_command='render')
+    args = parser.parse_args(argv)
+    rankings_cli.check_week(parser, args, min(CUR_WEEK, len(CSV_FILE_LIST)))
+    if args.command == 'render' and args.sketch and args.method != 'mean':
+        parser.error('render --sketch only supports --method mean')
 
-def produce_current_week_graphs(weeks_data):
+    with rankings_cli.tracing(args):
+        run_command(args)
+
+def run_command(args):
     '''
-    Produce all graphs for the current week.
+    Run the command parsed by main.
     '''
-    #create_scatter(weeks_data)
-    weeks_data[-1].create_boxplot()
+
+    if args.command == 'rankings':
+        get_weeks_data([args.week], SUMMARY_TABLE_DIR, args.method)[0].print_power_rankings()
+    elif args.command == 'stats':
+        rankings_cli.dump_stats(get_weeks_data([args.week], SUMMARY_TABLE_DIR, args.method)[0], args.format)
+    elif args.command == 'rankers':
+        if args.season:
+            agreement = ranker_analytics.season_agreement(get_weeks_data(list(range(1, args.week + 1)), SUMMARY_TABLE_DIR, args.method))
+        else:
+            agreement = ranker_analytics.week_agreement(get_weeks_data([args.week], SUMMARY_TABLE_DIR, args.method)[0])
+        rankings_cli.dump_rankers(agreement, args.format)
+    elif args.command == 'bootstrap':
+        week_data = get_weeks_data([args.week], SUMMARY_TABLE_DIR, args.method)[0]
+        result = rank_bootstrap.week_bootstrap(week_data, resamples=args.resamples, confidence=args.confidence, seed=args.seed, workers=args.workers)
+        rankings_cli.dump_bootstrap(week_data, result, args.format)
+    elif args.command == 'render':
+        if args.sketch:
+            weeks_data = get_weeks_sketches(list(range(1, args.week + 1)), args.workers, args.max_fliers)
+        else:
+            weeks_data = get_weeks_data(list(range(1, args.week + 1)), SUMMARY_TABLE_DIR, args.method, args.max_fliers)
+        cache = None if args.no_cache else render_cache.RenderCache(RENDER_CACHE_FILE)
+        if args.all:
+            filenames = produce_all_graphs(weeks_data, args.workers, cache, args.heatmap)
+        else:
+            filenames = produce_current_week_graphs(weeks_data, args.workers, cache, args.heatmap)
+        for filename in filenames:
+            print(filename)
+    elif args.command == 'serve':
+        import rankings_service # asyncio and the service are only needed here, so the other commands start fast.
+
+        load_week = lambda week_no, method: get_weeks_data([week_no], SUMMARY_TABLE_DIR, method)[0]
+        graph_kinds = {'boxplot': False, 'heatmap': False, 'season_heatmap': True}
+        service = rankings_service.RankingsService(load_week, render_png, CSV_FILE_LIST, args.week, graph_kinds, args.workers, int(args.cache_mb * 2 ** 20),
+                                                   [TEAM_COLORS_FILE, TEAM_LIST_FILE, TEAM_ALIASES_FILE])
+        service.serve(args.host, args.port)
 
 #####
 # Required information.
 CUR_WEEK = 3
 
+LEAGUE_NAME = 'NBA'
+FILE_PREFIX = 'nba_power_rankings'
+WEEK_LABEL = '#%d' # each power rankings is numbered, not a week.
+
 TEAM_COLORS_FILE = 'team_color_codes.txt'
-TEAM_COLORS = get_team_colors(TEAM_COLORS_FILE)
-TEAM_NICKNAMES = get_team_names_from_file('team_list.txt')
+TEAM_COLORS = rankings_engine.get_team_colors(TEAM_COLORS_FILE)
+TEAM_LIST_FILE = 'team_list.txt'
+TEAM_NICKNAMES = get_team_names_from_file(TEAM_LIST_FILE)
+TEAM_ALIASES_FILE = 'team_aliases.txt'
+TEAM_NAMES = team_names.TeamNames(team_names.merge_aliases(team_names.team_list_aliases(team_names.read_team_list(TEAM_LIST_FILE)),
+                                                           team_names.read_aliases(TEAM_ALIASES_FILE)))
 CSV_FILE_LIST = ['csv_data/2016_R%s.csv' %(str(week_num).rjust(2, '0')) for week_num in range(1, CUR_WEEK + 1)]
+RENDER_CACHE_FILE = 'render_cache.json'
+SUMMARY_TABLE_DIR = 'summary_table'
+STYLE_VERSION = 2 # bump when the look of the graphs changes, so cached graphs are rendered again.
 #####
 
-weeks_data = get_weeks_data(list(range(1, CUR_WEEK + 1)))
-produce_current_week_graphs(weeks_data)
+# only run when used as a script, not when a render worker process imports this module.
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,7 @@ Example box plot from thread: http://i.imgur.com/fHSRwKz.png
 
 Last Updated: 2016-Dec-05
 First Created: 2016-Nov-23
-Python 3.5
+Python 3.9
 Chris
 
 Todo:
@@ -19,73 +19,108 @@ Todo:
 # line by line, look for optimization.
 '''
 
-import csv
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-import re
-import collections
-import statistics # can also use numpy or manually calculate mean and std, see:
-# http://stackoverflow.com/questions/15389768/standard-deviation-of-a-list
+import io
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Power_Rankings_Common'))
+import ballots
+import graphs
+import instrumentation
+import rank_aggregation
+import rank_bootstrap
+import rankings_cli
+import ranker_analytics
+import rankings_engine
+import render_cache
+import season_store
+import season_summary
+import team_names
+
+# matplotlib is slow to import, so it's only imported inside the functions that draw graphs.
 
 class Week(object):
     '''
     Week object.
     Takes a week_no (int), csv_file (str) and team_colors (dict of tuples).
+    Optionally takes already encoded teams (list) and ballots (array), e.g. from the season store,
+    in which case the csv is not read, and a season_summary.SummaryTable to load/save the week's summary.
+    Or a rank_sketch.RankSketch of the week (see get_weeks_sketches) in place of the ballots, the
+    summary is then read off the sketch and ballots, rankers and pr_data are None.
+    method is the rank_aggregation method used for the power rankings (default mean rank, the only
+    method with a sketch), max_fliers the most outliers per team drawn on the boxplot (default all).
     '''
-    def __init__(self, week_no, csv_file, team_colors):
+    def __init__(self, week_no, csv_file, team_colors, teams=None, week_ballots=None, summary_table=None, method='mean', max_fliers=None, sketch=None):
         '''
         Create Week object. Takes an int for week_no, filename for csv_file.
         '''
         self.week_no = week_no
         self.csv_file = csv_file
+        self.method = method
+        self.max_fliers = max_fliers
+        self.sketch = sketch
 
         self.team_colors = team_colors
 
-        self.pr_data = self.convert_csv_to_list()
-
-        self.mean_std_dict = self.calc_mean_std()
-        self.power_rankings = self.get_power_rankings()
+        if sketch is not None:
+            self.teams, self.ballots, self.rankers, self.pr_data = sketch.teams, None, None, None
+        elif week_ballots is None:
+            self.pr_data = self.convert_csv_to_list()
+        else:
+            self.teams, self.ballots, self.rankers = teams, week_ballots, None
+            self.pr_data = ballots.team_rankings(self.teams, self.ballots)
+        self.team_index = {team: idx for idx, team in enumerate(self.teams)}
+
+        with instrumentation.stage('summary', week=week_no):
+            if sketch is not None:
+                self.summary = sketch.summary()
+            elif summary_table is None:
+                self.summary = season_summary.summarize(self.teams, self.ballots)
+            else:
+                self.summary = summary_table.get(week_no, season_store.csv_source(csv_file), self.teams, self.ballots)
+
+        with instrumentation.stage('rankings', week=week_no):
+            self.mean_std_dict = self.calc_mean_std()
+            self.power_rankings = self.get_power_rankings()
 
     def convert_csv_to_list(self):
         '''
-        Takes a csv of data and converts it into a dict.
-        Returns a dict in the form {team1: [ranking1, ranking2], team2: [ranking1, ranking2]} etc.
+        Takes a csv of data (one row per rank, one column per ranker) and converts it into
+        self.teams (list of team names) and self.ballots (rankers x teams array of ranks).
+        Cells are resolved to team names by TEAM_NAMES, so 'NE', '[](/NE)' or 'Patriots ' all give 'Patriots'.
+        Returns a dict in the form {team1: array([ranking1, ranking2]), team2: ...} etc.
         '''
-        # so that when appending row no, if it's the first append for this team
-        # it first creates a list before appending the value. Could also use try... except.
-        pr_data = collections.defaultdict(list)
-
-        row_no = 0
-        for row in csv.reader(open(self.csv_file)):
-            row_no += 1
-            for team in row:
-                # ensure no whitespace. using group to get the actual string.
-                try:
-                    team = re.match('(\w+)', team).group(0)
-                    pr_data[team].append(row_no)
-                except:
-                    raise ValueError('Error importing %s on line %d!' %(team, row))
-
-        # check there are 32 teams
-        assert len(pr_data) == 32
-
-        return pr_data
+        self.teams, self.ballots, self.rankers = read_csv_ballots(self.week_no, self.csv_file)
+
+        return ballots.team_rankings(self.teams, self.ballots)
 
     def calc_mean_std(self):
         '''
-        Using power rankings data, calculates the mean and std for each team.
+        Using the week's summary, keeps the mean, std, median, quartiles and whiskers for each team
+        in self.stats (dict of arrays ordered like self.teams).
         Returns a dict of tuples in the form {Team1: (mean, std)}
         '''
-        mean_std_dict = {team: (statistics.mean(self.pr_data[team]), statistics.pstdev(self.pr_data[team])) for team in self.pr_data}
-        return mean_std_dict
+        self.stats = self.summary.stats
+        return {team: (mean, std) for team, mean, std in zip(self.teams, self.stats['mean'].tolist(), self.stats['std'].tolist())}
 
     def get_power_rankings(self):
         '''
         Using mean_std_dict, return a list of teams in ascending order of mean.
+        Other methods use rank_aggregation on the ballots.
         '''
+        if self.method != 'mean':
+            return rank_aggregation.aggregate(self.teams, self.ballots, self.method)
+
         # item[0] = team, x[1] = (mean, std), so x[1][0] = sort by mean
         return [item[0] for item in sorted(self.mean_std_dict.items(), key=lambda x: x[1][0])]
 
+    def team_means(self, teams):
+        '''
+        Returns an array of the mean rank of each team in teams (list), in the same order.
+        '''
+        return self.stats['mean'][[self.team_index[team] for team in teams]]
+
     def print_power_rankings(self):
         '''
         Print power rankings in the format 1 Cowboys \n 2 Patriots
@@ -93,117 +128,114 @@ class Week(object):
         for rank, team in enumerate(self.power_rankings, 1):
             print(rank, team)
 
-    def create_boxplot(self):
+    def create_boxplot(self, filename=None):
         '''
-        Create boxplot.
+        Create boxplot. Returns the saved filename.
+        filename defaults to boxplot_filename, it can also be a file object (e.g. io.BytesIO).
+        Records the draw (figure and boxes), style (colors and labels) and save stages.
         '''
+        import matplotlib.pyplot as plt
+
         team_labels = list(reversed(self.power_rankings)) # reversed to get 1. team at top, 32. team at bottom.
-        team_rankings = [self.pr_data[team] for team in team_labels]
 
         team_colors = [self.team_colors[team] if team in self.team_colors else ('red', 'black', 'yellow') for team in team_labels]
 
-        # Create a figure instance
-        fig = plt.figure(figsize=(15, 8))
+        with instrumentation.stage('boxplot.draw', week=self.week_no):
+            # Create a figure instance
+            fig = plt.figure(figsize=(15, 8))
 
-        # Create an axes instance
-        ax = fig.add_subplot(111)
+            # Create an axes instance
+            ax = fig.add_subplot(111)
 
-        ax.set_title('Avg. Rank Team vs Rank - Week %d' %(self.week_no))
-        ax.set_xlabel('Rank')
-        ax.set_ylabel('Team Avg. Rank')
+            ax.set_title('Avg. Rank Team vs Rank - Week %d' %(self.week_no))
+            ax.set_xlabel('Rank')
+            ax.set_ylabel('Team Avg. Rank')
 
-        # Create the boxplot
-        bp = ax.boxplot(team_rankings, patch_artist=True, vert=False)
+            # Create the boxplot from the precomputed quartiles, whiskers and outliers.
+            bp = ax.bxp(self.summary.bxp_stats(team_labels, self.max_fliers), patch_artist=True, vert=False)
 
-        ## change outline color, fill color and linewidth of the boxes
-        assert len(bp['boxes']) == len(bp['medians']), 'Boxes and medians differ.'
+        with instrumentation.stage('boxplot.style', week=self.week_no):
+            ## change outline color, fill color and linewidth of the boxes
+            assert len(bp['boxes']) == len(bp['medians']), 'Boxes and medians differ.'
 
-        for idx in range(len(bp['boxes'])):
-            box = bp['boxes'][idx]
-            median = bp['medians'][idx]
-            box.set(color='black', linewidth=2) # change outline color of box to team color 1
-            box.set(facecolor=team_colors[idx][0], alpha=0.7) # change fill color of box to team color 1
-            median.set(color=team_colors[idx][1], linewidth=2, marker='o') # change median color to team color 3
+            for idx in range(len(bp['boxes'])):
+                box = bp['boxes'][idx]
+                median = bp['medians'][idx]
+                box.set(color='black', linewidth=2) # change outline color of box to team color 1
+                box.set(facecolor=team_colors[idx][0], alpha=0.7) # change fill color of box to team color 1
+                median.set(color=team_colors[idx][1], linewidth=2, marker='o') # change median color to team color 3
 
-        ## change color and linewidth of the whiskers
-        for whisker in bp['whiskers']:
-            whisker.set(color='grey', linewidth=2, alpha=0.5)
+            ## change color and linewidth of the whiskers
+            for whisker in bp['whiskers']:
+                whisker.set(color='grey', linewidth=2, alpha=0.5)
 
-        ## change color and linewidth of the caps
-        for cap in bp['caps']:
-            cap.set(color='grey', linewidth=2)
+            ## change color and linewidth of the caps
+            for cap in bp['caps']:
+                cap.set(color='grey', linewidth=2)
 
-        ## change the style of fliers and their fill
-        for flier in bp['fliers']:
-            flier.set(marker='o', color='#e7298a', alpha=0.2)
+            ## change the style of fliers and their fill
+            for flier in bp['fliers']:
+                flier.set(marker='o', color='#e7298a', alpha=0.2)
 
-        ## Custom y-axis labels
-        ax.set_yticklabels([str(32 - x) + '. ' + team_labels[x] for x in range(len(team_labels))])
+            ## Custom y-axis labels
+            ax.set_yticklabels([str(32 - x) + '. ' + team_labels[x] for x in range(len(team_labels))])
 
-        ## Remove top axes and right axes ticks
-        ax.get_xaxis().tick_bottom()
-        ax.get_yaxis().tick_left()
+            ## Remove top axes and right axes ticks
+            ax.get_xaxis().tick_bottom()
+            ax.get_yaxis().tick_left()
 
-        # set x limit rank to 1-33
-        ax.set_xlim(0, 33)
+            # set x limit rank to 1-33
+            ax.set_xlim(0, 33)
 
-        # add faint grid on x axis to make it easier to see rank
-        ax.xaxis.grid(True, linestyle='-', which='major', color='lightgrey', alpha=0.7)
+            # add faint grid on x axis to make it easier to see rank
+            ax.xaxis.grid(True, linestyle='-', which='major', color='lightgrey', alpha=0.7)
 
         #plt.show()
 
         # Save the figure
-        fig.savefig('boxplots/nfl_power_rankings_boxplot_week%s.png' %(str(self.week_no).rjust(2, '0')), bbox_inches='tight')
+        filename = boxplot_filename(self.week_no) if filename is None else filename
+        with instrumentation.stage('boxplot.save', week=self.week_no):
+            graphs.save_figure(fig, filename)
+            plt.close(fig)
+
+        return filename
 
         #####
 
 
-def get_team_colors(colors_filename):
+def boxplot_filename(week_no):
     '''
-    Takes a txt filename and returns a dict of tuples of team colors
-    in the format {Team1: (Main Color, Secondary Color, Third Color)}.
-    If a color is missing then a complimentary color is appended.
-
-    # http://teamcolorcodes.com/nfl-team-color-codes/
+    Filename of the boxplot for week_no.
     '''
-    team_colors = {}
-    with open(colors_filename) as file_name:
-        team_colors = {item[0]: item[1:] for item in [line.split() for line in file_name]}
-
-    for team, colors in team_colors.items():
-        while len(colors) < 3:
-            try:
-            # http://stackoverflow.com/questions/1664140/js-function-to-calculate-complementary-colour
-            # if missing a color, then add a roughly complimentary color to the main team color.
-            # format by adding # and removing 0x from the start of the hex string.
-                complimentary_color = (int(hex(0xffffff), 16) ^ int('0x'+colors[0][1:], 16))
-                colors.append('#'+hex(complimentary_color)[2:])
-                # some complimentary_colors were coming out wrong, this was temp code to avoid problems.
-                # seems to be fixed.
-                # if len(str(complimentary_color)) == 7 or len(str(complimentary_color)) == 8:
-                #     colors.append('#'+hex(complimentary_color)[2:])
-                # else:
-                #     print(team, colors, complimentary_color, 'not working,, fix sometime')
-                #     colors.append('red')
-            except:
-                raise ValueError('Problem with color', team, colors)
+    return 'boxplots/nfl_power_rankings_boxplot_week%s.png' %(str(week_no).rjust(2, '0'))
 
-    return team_colors
+def scatter_filename(week_no):
+    '''
+    Filename of the scatter plot up to week_no.
+    '''
+    return 'scatterplots/nfl_power_rankings_boxplot_week%s.png' %(str(week_no).rjust(2, '0'))
 
-def create_scatter(weeks_data):
+def scatter_alphas(n_weeks):
     '''
-    Create a scatter plot of progress of teams over the specified weeks (default = full season).
-    X-axis = rank, Y-axis = team, Alpha value of dot = week no. (earlier weeks more transparent).
+    Alpha for each week's dots, going from 0.2 (near transparent) until 0.95 (near opaque) the more recent the data is.
+    '''
+    if n_weeks == 1:
+        return [0.95]
+    return [0.2 + (x * 0.75 / (n_weeks - 1)) for x in range(n_weeks)]
 
-    Takes a list of weeks, the last item should be the current week.
+def scatter_colors(team_colors, teams):
     '''
-    cur_week = weeks_data[-1]
+    Returns an (teams x 4) array of RGBA main colors ordered to match teams.
+    '''
+    import matplotlib.colors as mcolors
 
-    team_labels = list(reversed(cur_week.power_rankings)) # reversed to get 1. team at top, 32. team at bottom.
-    # team_colors is a list ordered to match team_labels.
-    team_colors = [cur_week.team_colors[team] if team in cur_week.team_colors else ('red', 'black', 'yellow') for team in team_labels]
-    # alpha should go from 0.2 (near transparent) until 0.95 (near opaque) the more recent the data is.
-    alphas = [0.2 + (x * 0.75 / (len(weeks_data) - 1)) for x in range(len(weeks_data))]
+    return mcolors.to_rgba_array([team_colors[team][0] if team in team_colors else 'red' for team in teams])
+
+def new_scatter_figure():
+    '''
+    Create the figure and axes for a scatter plot, with everything that doesn't depend on the weeks.
+    '''
+    import matplotlib.pyplot as plt
 
     # Create a figure instance
     fig = plt.figure(figsize=(15, 8))
@@ -211,78 +243,431 @@ def create_scatter(weeks_data):
     # Create an axes instance
     ax = fig.add_subplot(111)
 
-    ax.set_title('Average (mean) Reddit Power Rankings of NFL teams during the 2016 season '\
-    '- weeks %d to %d.' % (weeks_data[0].week_no, weeks_data[-1].week_no))
     ax.set_xlabel('Rank')
     ax.set_ylabel('Team')
 
-    for idx, week_data in enumerate(weeks_data):
-        team_rankings = [week_data.pr_data[team] for team in team_labels]
-        team_means = [sum(data) / len(data) for data in team_rankings] # float
-
-        for team_idx in range(len(team_labels)):
-            # s = magic number, may need editing depending on graph size.
-            plt.scatter(team_means[team_idx], team_idx, c=team_colors[team_idx], alpha=alphas[idx], s=50)
-
-    ax.yaxis.set_major_locator(ticker.MultipleLocator(1))
-
     ## Remove top axes and right axes ticks
     ax.get_xaxis().tick_bottom()
     ax.get_yaxis().tick_left()
 
+    # add faint grid on x axis to make it easier to see rank
+    ax.xaxis.grid(True, linestyle='-', which='major', color='lightgrey', alpha=0.7)
+
+    return fig, ax
+
+def label_scatter(ax, weeks_data, team_labels):
+    '''
+    Set the title, limits and team labels of a scatter plot of weeks_data.
+    '''
+    ax.set_title('Average (mean) Reddit Power Rankings of NFL teams during the 2016 season '\
+    '- weeks %d to %d.' % (weeks_data[0].week_no, weeks_data[-1].week_no))
+
     # set x limit rank to 1-33
-    ax.set_xlim(0, 33)
-    ax.set_ylim(-1, 32)
+    ax.set_xlim(0, len(team_labels) + 1)
+    ax.set_ylim(-1, len(team_labels))
 
-    # fix this strange bug
-    y_labels = [str(32 - x) + '. ' + team_labels[x] for x in range(len(team_labels))]
-    y_labels.insert(0, '')
-    y_labels.insert(1, '')
-    ax.set_yticklabels(y_labels)
+    # one tick per team, team_labels[0] (last place) at the bottom.
+    ax.set_yticks(range(len(team_labels)))
+    ax.set_yticklabels([str(len(team_labels) - x) + '. ' + team_labels[x] for x in range(len(team_labels))])
 
-    # add faint grid on x axis to make it easier to see rank
-    ax.xaxis.grid(True, linestyle='-', which='major', color='lightgrey', alpha=0.7)
+def save_scatter(fig, cur_week, filename=None):
+    '''
+    Save a scatter plot figure for cur_week. Returns the saved filename.
+    filename defaults to scatter_filename, it can also be a file object.
+    '''
+    filename = scatter_filename(cur_week.week_no) if filename is None else filename
+    graphs.save_figure(fig, filename)
+    return filename
+
+def create_scatter(weeks_data, filename=None):
+    '''
+    Create a scatter plot of progress of teams over the specified weeks (default = full season).
+    X-axis = rank, Y-axis = team, Alpha value of dot = week no. (earlier weeks more transparent).
+    Each week is drawn as one scatter artist from its precomputed mean array.
+
+    Takes a list of weeks, the last item should be the current week, and optionally filename
+    (default scatter_filename, can also be a file object).
+    Returns the saved filename.
+    '''
+    import matplotlib.pyplot as plt
+
+    cur_week = weeks_data[-1]
+
+    team_labels = list(reversed(cur_week.power_rankings)) # reversed to get 1. team at top, 32. team at bottom.
+    # colors is an array ordered to match team_labels.
+    colors = scatter_colors(cur_week.team_colors, team_labels)
+    positions = np.arange(len(team_labels))
+
+    fig, ax = new_scatter_figure()
+
+    with instrumentation.stage('scatter.draw', week=cur_week.week_no):
+        for week_data, alpha in zip(weeks_data, scatter_alphas(len(weeks_data))):
+            # s = magic number, may need editing depending on graph size.
+            ax.scatter(week_data.team_means(team_labels), positions, c=colors, alpha=alpha, s=50)
+
+        label_scatter(ax, weeks_data, team_labels)
 
     #plt.show()
 
     # Save the figure
-    fig.savefig('scatterplots/nfl_power_rankings_boxplot_week%s.png' %(str(cur_week.week_no).rjust(2, '0')), bbox_inches='tight')
+    with instrumentation.stage('scatter.save', week=cur_week.week_no):
+        filename = save_scatter(fig, cur_week, filename)
+        plt.close(fig)
+
+    return filename
 
+class ScatterTimeline(object):
+    '''
+    ScatterTimeline object, one scatter plot figure of weeks_data that can show the same plot as
+    create_scatter(weeks_data[:idx+1]) for any idx. Every week's scatter artist is created once,
+    each frame only moves the artists to that week's team order, fades them and hides the later weeks.
+
+    fixed_layout = True places the axes at a fixed position, so frames can be saved without
+    bbox_inches='tight' (which draws the figure twice) and every frame has the same size.
+    '''
+    def __init__(self, weeks_data, fixed_layout=False):
+        '''
+        Create ScatterTimeline object.
+        '''
+        self.weeks_data = weeks_data
+        self.fig, self.ax = new_scatter_figure()
+        if fixed_layout:
+            self.fig.subplots_adjust(left=0.14, right=0.98, bottom=0.07, top=0.95)
+
+        # layers keep a fixed team order, only their y positions change as the rankings change.
+        self.teams = list(weeks_data[0].power_rankings)
+        colors = scatter_colors(weeks_data[0].team_colors, self.teams)
+        self.layers = []
+        for week_data in weeks_data:
+            means = week_data.team_means(self.teams)
+            # s = magic number, may need editing depending on graph size.
+            self.layers.append((self.ax.scatter(means, np.zeros(len(self.teams)), c=colors, s=50, visible=False), means))
+
+    def show_week(self, idx):
+        '''
+        Update the figure to the scatter plot of weeks_data[:idx+1].
+        '''
+        week_data = self.weeks_data[idx]
+        team_labels = list(reversed(week_data.power_rankings))
+        position = {team: pos for pos, team in enumerate(team_labels)}
+        positions = np.array([position[team] for team in self.teams])
+
+        for (layer, layer_means), alpha in zip(self.layers[:idx+1], scatter_alphas(idx + 1)):
+            layer.set_offsets(np.column_stack((layer_means, positions)))
+            layer.set_alpha(alpha)
+            layer.set_visible(True)
+        for layer, _ in self.layers[idx+1:]:
+            layer.set_visible(False)
+
+        label_scatter(self.ax, self.weeks_data[:idx+1], team_labels)
+
+    def close(self):
+        '''
+        Close the figure.
+        '''
+        import matplotlib.pyplot as plt
+
+        plt.close(self.fig)
+
+def create_scatter_frames(weeks_data, skip=()):
+    '''
+    Create the same scatter plots as create_scatter(weeks_data[:2]), create_scatter(weeks_data[:3]) ...
+    create_scatter(weeks_data) using one figure (see ScatterTimeline), instead of redrawing every week from scratch.
+    Frames whose filename is in skip are not saved.
+
+    Returns the list of saved filenames.
+    '''
+    timeline = ScatterTimeline(weeks_data)
+
+    filenames = []
+    for idx, week_data in enumerate(weeks_data):
+        if idx == 0 or scatter_filename(week_data.week_no) in skip:
+            continue
+
+        with instrumentation.stage('scatter_frames.update', week=week_data.week_no):
+            timeline.show_week(idx)
+
+        with instrumentation.stage('scatter_frames.save', week=week_data.week_no):
+            filenames.append(save_scatter(timeline.fig, week_data))
+
+    timeline.close()
+
+    return filenames
+
+def export_problem(filename):
+    '''
+    Returns why the scatter plots can't be exported to filename (see export_scatter_timeline),
+    or None if they can. Checked before any frame is drawn.
+    '''
+    from matplotlib import animation
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in ('.pdf',) + tuple(EXPORT_WRITERS):
+        return 'Can only export a .pdf, .gif or .mp4, not %s' %(filename)
+    if extension in EXPORT_WRITERS and not animation.writers.is_available(EXPORT_WRITERS[extension]):
+        return 'Exporting a %s needs the matplotlib %s animation writer, which is not installed' %(extension, EXPORT_WRITERS[extension])
     return None
 
-def get_weeks_data(weeks):
+def export_scatter_timeline(weeks_data, filename, fps=2):
+    '''
+    Export the season's scatter plots, create_scatter(weeks_data[:1]) up to create_scatter(weeks_data),
+    as the pages of one pdf (filename ending .pdf) or the frames of an animation (.gif, or .mp4 which needs ffmpeg),
+    at fps frames per second. One fixed layout figure is drawn for all the frames (see ScatterTimeline).
+
+    Returns filename.
+    '''
+    from matplotlib import animation
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    problem = export_problem(filename)
+    if problem:
+        raise ValueError(problem)
+    extension = os.path.splitext(filename)[1].lower()
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    timeline = ScatterTimeline(weeks_data, fixed_layout=True)
+    try:
+        if extension == '.pdf':
+            with PdfPages(filename) as pdf:
+                for idx, week_data in enumerate(weeks_data):
+                    with instrumentation.stage('timeline.update', week=week_data.week_no):
+                        timeline.show_week(idx)
+                    with instrumentation.stage('timeline.save', week=week_data.week_no):
+                        pdf.savefig(timeline.fig)
+        else:
+            writer = animation.writers[EXPORT_WRITERS[extension]](fps=fps)
+            with writer.saving(timeline.fig, filename, dpi=timeline.fig.dpi):
+                for idx, week_data in enumerate(weeks_data):
+                    with instrumentation.stage('timeline.update', week=week_data.week_no):
+                        timeline.show_week(idx)
+                    with instrumentation.stage('timeline.save', week=week_data.week_no):
+                        writer.grab_frame()
+    finally:
+        timeline.close()
+
+    return filename
+
+def read_csv_ballots(week_no, csv_file):
+    '''
+    Reads a week's csv (one row per rank, one column per ranker) into (teams, ballots, rankers),
+    as rankings_engine.read_rank_rows with the names resolved by TEAM_NAMES.
+    '''
+    with instrumentation.stage('csv', week=week_no):
+        teams, week_ballots, rankers = rankings_engine.read_rank_rows(csv_file, clean_name=TEAM_NAMES.clean_name)
+
+    # check there are 32 teams
+    assert len(teams) == rankings_engine.LEAGUES['nfl'].n_teams
+
+    return teams, week_ballots, rankers
+
+def get_weeks_data(weeks, store_dir=None, summary_dir=None, method='mean', max_fliers=None):
     '''
     Takes a list of weeks and returns a list of Week objects.
+    If store_dir is given the ballots are loaded from the season store there, and only csvs
+    that are new or have changed (or the team aliases have) since they were imported are parsed (then appended to the store).
+    If summary_dir is given each week's summary is saved there and only recalculated when its csv or the team aliases change.
+    method is the rank_aggregation method for the power rankings, max_fliers the most outliers drawn per team.
+    '''
+    summary_table = None if summary_dir is None else season_summary.SummaryTable(summary_dir, [TEAM_ALIASES_FILE])
+    if store_dir is None:
+        return [Week(week_no, CSV_FILE_LIST[week_no - 1], TEAM_COLORS, summary_table=summary_table, method=method, max_fliers=max_fliers) for week_no in weeks]
+
+    store = season_store.SeasonStore(store_dir)
+    # the names in the store depend on the aliases too.
+    names_source = season_store.csv_source(TEAM_ALIASES_FILE)
+    for week_no in weeks:
+        csv_file = CSV_FILE_LIST[week_no - 1]
+        source = {'csv': season_store.csv_source(csv_file), 'names': names_source}
+        if store.source(week_no) != source:
+            # straight from the csv rows, no Week (summary, rankings) is needed just to store the ballots.
+            teams, week_ballots, rankers = read_csv_ballots(week_no, csv_file)
+            with instrumentation.stage('season_store.append', week=week_no):
+                store.append_week(week_no, teams, week_ballots, rankers, source=source)
+
+    return [Week(week_no, CSV_FILE_LIST[week_no - 1], TEAM_COLORS, *store.week_ballots(week_no), summary_table=summary_table, method=method, max_fliers=max_fliers) for week_no in weeks]
+
+def get_weeks_sketches(weeks, workers=None, max_fliers=None):
+    '''
+    Takes a list of weeks and returns a list of Week objects drawn from rank sketches rather than ballots.
+    Each csv is counted into a rank_sketch.RankSketch as it is read (rankings_engine.ingest_sketches),
+    in a process pool of workers processes (0 = one per core, None = in this process), and sketches of
+    the same week (e.g. csv shards) are merged, so no ballots are kept and only the sketches are sent
+    to the render workers. The sketches are exact, so the graphs are the same as from the ballots.
+    '''
+    sources = [rankings_engine.Source('nfl', None, week_no, CSV_FILE_LIST[week_no - 1]) for week_no in weeks]
+    (sketch_weeks,) = rankings_engine.ingest_sketches(sources, workers).values()
+    return [Week(sketch_week.week_no, CSV_FILE_LIST[sketch_week.week_no - 1], TEAM_COLORS, max_fliers=max_fliers, sketch=sketch_week.sketch) for sketch_week in sketch_weeks]
+
+def render_job(job_skip):
+    '''
+    Render one graph job, a tuple of ('boxplot', 'heatmap', 'scatter', 'season_heatmap' or 'scatter_frames', list of weeks),
+    skipping any filenames in skip (only used by scatter_frames, the others are only sent when stale).
+    Module level so it can be sent to a worker process. Returns the saved filename(s).
+    '''
+    (kind, weeks), skip = job_skip
+    if kind == 'boxplot':
+        return weeks[-1].create_boxplot()
+    if kind == 'heatmap':
+        return graphs.create_heatmap(weeks[-1], LEAGUE_NAME, FILE_PREFIX)
+    if kind == 'season_heatmap':
+        return graphs.create_season_heatmap(weeks, LEAGUE_NAME, FILE_PREFIX)
+    if kind == 'scatter_frames':
+        return create_scatter_frames(weeks, skip)
+    return create_scatter(weeks)
+
+def render_png(job):
     '''
-    return [Week(week_no, CSV_FILE_LIST[week_no - 1], TEAM_COLORS) for week_no in weeks]
+    Render one graph job, a tuple of (kind, list of weeks) as render_job but not 'scatter_frames',
+    into memory. Module level so it can be sent to a worker process. Returns the png bytes.
+    '''
+    kind, weeks = job
+    buffer = io.BytesIO()
+    if kind == 'boxplot':
+        weeks[-1].create_boxplot(buffer)
+    elif kind == 'heatmap':
+        graphs.create_heatmap(weeks[-1], LEAGUE_NAME, FILE_PREFIX, buffer)
+    elif kind == 'season_heatmap':
+        graphs.create_season_heatmap(weeks, LEAGUE_NAME, FILE_PREFIX, buffer)
+    else:
+        create_scatter(weeks, buffer)
+    return buffer.getvalue()
+
+def graph_key(cache, kind, weeks):
+    '''
+    Render cache key of a graph: its csvs, the team colors and aliases, the style version, the ranking method and outlier cap.
+    Full and incremental scatter plots have the same key as they produce the same graph.
+    '''
+    return cache.key([week_data.csv_file for week_data in weeks] + [TEAM_COLORS_FILE, TEAM_ALIASES_FILE], kind, STYLE_VERSION, weeks[-1].method, weeks[-1].max_fliers)
 
-def produce_all_graphs(weeks_data):
+def graph_outputs(job, cache):
+    '''
+    Returns a list of (filename, render cache key) saved by a graph job.
+    '''
+    kind, weeks = job
+    if kind == 'boxplot':
+        return [(boxplot_filename(weeks[-1].week_no), graph_key(cache, 'boxplot', weeks))]
+    if kind == 'heatmap':
+        return [(graphs.heatmap_filename(FILE_PREFIX, weeks[-1].week_no), graph_key(cache, 'heatmap', weeks))]
+    if kind == 'season_heatmap':
+        return [(graphs.season_heatmap_filename(FILE_PREFIX, weeks[-1].week_no), graph_key(cache, 'season_heatmap', weeks))]
+    if kind == 'scatter_frames':
+        return [(scatter_filename(weeks[idx].week_no), graph_key(cache, 'scatter', weeks[:idx+1])) for idx in range(1, len(weeks))]
+    return [(scatter_filename(weeks[-1].week_no), graph_key(cache, 'scatter', weeks))]
+
+def produce_all_graphs(weeks_data, workers=None, incremental=False, cache=None, heatmaps=False):
     '''
     Produce all graphs for all weeks.
+    workers = None renders one after another, otherwise the graphs are rendered
+    in a process pool of that many workers (0 = one per core).
+    incremental = True renders the season's scatter plots as frames of one figure
+    (see create_scatter_frames), so the cost is linear in the number of weeks.
+    cache = a render_cache.RenderCache, only graphs whose inputs have changed are rendered.
+    heatmaps = True also renders the rank frequency and season heatmaps.
+    Returns the sorted list of saved filenames.
     '''
+    jobs = []
+    if incremental and len(weeks_data) > 1:
+        jobs.append(('scatter_frames', weeks_data))
     for idx, week_data in enumerate(weeks_data):
-        if idx > 0:
-            create_scatter(weeks_data[:idx+1])
-        week_data.create_boxplot()
-
-def produce_current_week_graphs(weeks_data):
+        # biggest scatter jobs first so the pool finishes evenly.
+        if idx > 0 and not incremental:
+            jobs.insert(0, ('scatter', weeks_data[:idx+1]))
+        jobs.append(('boxplot', [week_data]))
+        if heatmaps:
+            jobs.extend([('heatmap', [week_data]), ('season_heatmap', weeks_data[:idx+1])])
+    return render_cache.render_stale(cache, render_job, jobs, lambda job: graph_outputs(job, cache), workers)
+
+def produce_current_week_graphs(weeks_data, workers=None, cache=None, heatmaps=False):
+    '''
+    Produce all graphs for the current week, heatmaps = True also renders its heatmaps.
+    Returns the sorted list of saved filenames.
     '''
-    Produce all graphs for the current week.
+    jobs = [('boxplot', weeks_data[-1:])]
+    if len(weeks_data) > 1:
+        jobs.insert(0, ('scatter', weeks_data))
+    if heatmaps:
+        jobs.extend([('heatmap', weeks_data[-1:]), ('season_heatmap', weeks_data)])
+    return render_cache.render_stale(cache, render_job, jobs, lambda job: graph_outputs(job, cache), workers)
+
+def main(argv=None):
     '''
-    create_scatter(weeks_data)
-    weeks_data[-1].create_boxplot()
+    Command line entry point, see rankings_cli. Run from this directory.
+    '''
+    parser, render_parser = rankings_cli.build_parser('NFL power rankings from Reddit.', CUR_WEEK)
+    render_parser.add_argument('--incremental', action='store_true', help='render the scatter plots as frames of one figure')
+    render_parser.add_argument('--export', metavar='FILE', help='instead of the pngs, export the scatter plots of weeks 1 to --week as one multipage pdf or animation (.pdf, .gif or .mp4)')
+    args = parser.parse_args(argv)
+    rankings_cli.check_week(parser, args, min(CUR_WEEK, len(CSV_FILE_LIST)))
+    if args.command == 'render' and args.export and export_problem(args.export):
+        render_parser.error(export_problem(args.export))
+    if args.command == 'render' and args.sketch and args.method != 'mean':
+        parser.error('render --sketch only supports --method mean')
+    if args.command == 'rankers' and args.season:
+        parser.error('rankers --season needs the rankers\' names to match them across weeks, the NFL sheets don\'t have them')
+
+    with rankings_cli.tracing(args):
+        run_command(args)
+
+def run_command(args):
+    '''
+    Run the command parsed by main.
+    '''
+
+    if args.command == 'rankings':
+        get_weeks_data([args.week], SEASON_STORE_DIR, SUMMARY_TABLE_DIR, args.method)[0].print_power_rankings()
+    elif args.command == 'stats':
+        rankings_cli.dump_stats(get_weeks_data([args.week], SEASON_STORE_DIR, SUMMARY_TABLE_DIR, args.method)[0], args.format)
+    elif args.command == 'rankers':
+        agreement = ranker_analytics.week_agreement(get_weeks_data([args.week], SEASON_STORE_DIR, SUMMARY_TABLE_DIR, args.method)[0])
+        rankings_cli.dump_rankers(agreement, args.format)
+    elif args.command == 'bootstrap':
+        week_data = get_weeks_data([args.week], SEASON_STORE_DIR, SUMMARY_TABLE_DIR, args.method)[0]
+        result = rank_bootstrap.week_bootstrap(week_data, resamples=args.resamples, confidence=args.confidence, seed=args.seed, workers=args.workers)
+        rankings_cli.dump_bootstrap(week_data, result, args.format)
+    elif args.command == 'render':
+        if args.sketch:
+            weeks_data = get_weeks_sketches(list(range(1, args.week + 1)), args.workers, args.max_fliers)
+        else:
+            weeks_data = get_weeks_data(list(range(1, args.week + 1)), SEASON_STORE_DIR, SUMMARY_TABLE_DIR, args.method, args.max_fliers)
+        cache = None if args.no_cache else render_cache.RenderCache(RENDER_CACHE_FILE)
+        if args.export:
+            filenames = [export_scatter_timeline(weeks_data, args.export)]
+        elif args.all:
+            filenames = produce_all_graphs(weeks_data, args.workers, args.incremental, cache, args.heatmap)
+        else:
+            filenames = produce_current_week_graphs(weeks_data, args.workers, cache, args.heatmap)
+        for filename in filenames:
+            print(filename)
+    elif args.command == 'serve':
+        import rankings_service # asyncio and the service are only needed here, so the other commands start fast.
+
+        load_week = lambda week_no, method: get_weeks_data([week_no], SEASON_STORE_DIR, SUMMARY_TABLE_DIR, method)[0]
+        graph_kinds = {'boxplot': False, 'heatmap': False, 'scatter': True, 'season_heatmap': True}
+        service = rankings_service.RankingsService(load_week, render_png, CSV_FILE_LIST, args.week, graph_kinds, args.workers, int(args.cache_mb * 2 ** 20),
+                                                   [TEAM_COLORS_FILE, TEAM_ALIASES_FILE])
+        service.serve(args.host, args.port)
 
 ###
 # Required information.
 CUR_WEEK = 12
 
+LEAGUE_NAME = 'NFL'
+FILE_PREFIX = 'nfl_power_rankings'
+
 TEAM_COLORS_FILE = 'nfl_team_color_codes.txt'
-TEAM_COLORS = get_team_colors(TEAM_COLORS_FILE)
+TEAM_COLORS = rankings_engine.get_team_colors(TEAM_COLORS_FILE)
+TEAM_ALIASES_FILE = 'nfl_team_aliases.txt'
+TEAM_NAMES = team_names.TeamNames(team_names.read_aliases(TEAM_ALIASES_FILE))
 CSV_FILE_LIST = ['csv_data/nfl_power_rankings_week%s.csv' %(str(week_num).rjust(2, '0')) for week_num in range(1, 18)]
+SEASON_STORE_DIR = 'season_store'
+SUMMARY_TABLE_DIR = 'summary_table'
+RENDER_CACHE_FILE = 'render_cache.json'
+STYLE_VERSION = 2 # bump when the look of the graphs changes, so cached graphs are rendered again.
+EXPORT_WRITERS = {'.gif': 'pillow', '.mp4': 'ffmpeg'} # matplotlib animation writer of each export
 ###
 
-weeks_data = get_weeks_data(list(range(1, CUR_WEEK + 1)))
-
-
+if __name__ == '__main__':
+    main()
 
 ### END ###
@@ -0,0 +1,249 @@
+'''
+Streaming ballot accumulator for live power rankings threads.
+
+Ballots are fed in one at a time (or from a generator) and the per team stats are
+kept up to date as they arrive: an exact integer rank sum for the mean (so tied
+teams stay tied), Welford's running variance for the std, and a Fenwick (binary indexed) tree over the ranks of each team for the median and
+quartiles. Each ballot costs O(teams log teams), rather than re-calculating
+everything from the whole sheet.
+
+Example:
+    accumulator = BallotAccumulator()
+    for ballot in live_ballots(): # each ballot is a list of team names, rank 1 first
+        accumulator.add_ballot(ballot)
+        print(accumulator.power_rankings[:5])
+
+Python 3.9
+'''
+
+import itertools
+
+import numpy as np
+
+import ballots
+
+class BallotAccumulator(object):
+    '''
+    BallotAccumulator object.
+    Optionally takes teams (list of team names, in tie break order), clean_name (called on each new
+    cell to get the team name) and missing_cells (cells that mean the ranker skipped the rank, e.g. '--').
+    New teams can still appear in later ballots.
+    '''
+    def __init__(self, teams=(), clean_name=str.strip, missing_cells=ballots.MISSING_CELLS):
+        '''
+        Create an empty BallotAccumulator.
+        '''
+        self.clean_name = clean_name
+        self.missing_cells = missing_cells
+
+        self.teams = []
+        self.team_ids = {}
+        self.cell_ids = {} # raw cell -> team id, or -1 for a missing ranking
+        self.n_ballots = 0
+
+        # Welford running stats, one value per team, plus the exact rank sum for the mean.
+        self.count = np.zeros(0, dtype=np.int64)
+        self.rank_sum = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        # Fenwick tree of rank counts per team (teams x max_rank + 1), index 0 unused.
+        self.tree = np.zeros((0, 1), dtype=np.int64)
+
+        self._power_rankings = []
+        for team in teams:
+            self._team_id(team)
+
+    def _team_id(self, cell):
+        '''
+        Returns the team id for a raw cell (-1 if the cell is a missing ranking), adding new teams.
+        '''
+        team_id = self.cell_ids.get(cell)
+        if team_id is None:
+            team_id = -1
+            if cell.strip() not in self.missing_cells:
+                team = self.clean_name(cell)
+                if not team:
+                    raise ValueError('Error importing team name %r' %(cell))
+                team_id = self.team_ids.get(team)
+                if team_id is None:
+                    team_id = self.team_ids[team] = len(self.teams)
+                    self.teams.append(team)
+            self.cell_ids[cell] = team_id
+        return team_id
+
+    def _grow(self, n_teams, max_rank):
+        '''
+        Make room for n_teams teams and ranks up to max_rank, doubling the arrays as needed.
+        '''
+        old_teams, old_ranks = self.tree.shape[0], self.tree.shape[1] - 1
+        if n_teams <= old_teams and max_rank <= old_ranks:
+            return
+        new_teams = max(n_teams, 2 * old_teams)
+        new_ranks = max(max_rank, 2 * old_ranks)
+
+        for name in ('count', 'rank_sum', 'mean', 'm2'):
+            array = getattr(self, name)
+            grown = np.zeros(new_teams, dtype=array.dtype)
+            grown[:old_teams] = array
+            setattr(self, name, grown)
+
+        if new_ranks == old_ranks:
+            tree = np.zeros((new_teams, new_ranks + 1), dtype=np.int64)
+            tree[:old_teams] = self.tree
+        else:
+            # the tree layout depends on its size, so rebuild it from the rank counts.
+            counts = np.zeros((new_teams, new_ranks + 1), dtype=np.int64)
+            counts[:old_teams, 1:old_ranks + 1] = self._rank_counts()
+            tree = counts
+            for idx in range(1, new_ranks + 1):
+                parent = idx + (idx & -idx)
+                if parent <= new_ranks:
+                    tree[:, parent] += tree[:, idx]
+        self.tree = tree
+
+    def _rank_counts(self):
+        '''
+        Returns the (teams x max_rank) count of each rank per team, recovered from the Fenwick tree.
+        '''
+        counts = self.tree[:, 1:].copy()
+        max_rank = counts.shape[1]
+        for idx in range(max_rank, 0, -1):
+            parent = idx + (idx & -idx)
+            if parent <= max_rank:
+                counts[:, parent - 1] -= self.tree[:, idx]
+        return counts
+
+    def add_ballot(self, ballot):
+        '''
+        Add one ranker's ballot, a sequence of team names where ballot[0] is their number 1.
+        Missing cells (e.g. '--') are skipped, the other teams keep the rank of their position.
+        '''
+        team_ids = []
+        ranks = []
+        for rank, cell in enumerate(ballot, 1):
+            team_id = self._team_id(cell)
+            if team_id >= 0:
+                team_ids.append(team_id)
+                ranks.append(rank)
+        if not team_ids:
+            return
+
+        team_ids = np.asarray(team_ids, dtype=np.intp)
+        ranks = np.asarray(ranks, dtype=np.int64)
+        if len(np.unique(team_ids)) != len(team_ids):
+            raise ValueError('Ballot ranks a team more than once: %r' %(list(ballot)))
+        self._grow(len(self.teams), int(ranks[-1]))
+
+        # Welford update, vectorized over the teams on the ballot.
+        self.count[team_ids] += 1
+        self.rank_sum[team_ids] += ranks
+        delta = ranks - self.mean[team_ids]
+        self.mean[team_ids] += delta / self.count[team_ids]
+        self.m2[team_ids] += delta * (ranks - self.mean[team_ids])
+
+        # Fenwick tree update, every team walks up its own tree at the same time (log max_rank steps).
+        max_rank = self.tree.shape[1] - 1
+        idx = ranks.copy()
+        rows = team_ids
+        while len(idx):
+            self.tree[rows, idx] += 1
+            idx = idx + (idx & -idx)
+            keep = idx <= max_rank
+            rows, idx = rows[keep], idx[keep]
+
+        self.n_ballots += 1
+        # stable sort by mean, ties keep the order the teams were first seen and unranked teams are last.
+        self._power_rankings = [self.teams[idx] for idx in self._means().argsort(kind='stable')]
+
+    def add_ballots(self, ballot_iter):
+        '''
+        Add every ballot from an iterable or generator. Returns self.
+        '''
+        for ballot in ballot_iter:
+            self.add_ballot(ballot)
+        return self
+
+    def stream(self, ballot_iter):
+        '''
+        Generator that adds each ballot from ballot_iter and then yields the current power rankings.
+        '''
+        for ballot in ballot_iter:
+            self.add_ballot(ballot)
+            yield self.power_rankings
+
+    @property
+    def power_rankings(self):
+        '''
+        List of teams in ascending order of mean rank.
+        '''
+        return list(self._power_rankings)
+
+    @property
+    def mean_std_dict(self):
+        '''
+        Dict of tuples in the form {Team1: (mean, std)}, std is the population std.
+        '''
+        return {team: (mean, team_std) for team, mean, team_std in zip(self.teams, self._means().tolist(), self._std().tolist())}
+
+    def _means(self):
+        '''
+        Mean rank of each team from the rank sums (nan if unranked), exactly as ballots.ballot_stats,
+        where the Welford mean can be off in the last bit and split tied teams.
+        '''
+        n_teams = len(self.teams)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.rank_sum[:n_teams] / self.count[:n_teams]
+
+    def _std(self):
+        n_teams = len(self.teams)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2[:n_teams] / self.count[:n_teams])
+
+    def _kth_smallest(self, team_idx, k):
+        '''
+        Returns the k-th smallest (1 based) rank of each team in team_idx, by binary lifting down the Fenwick trees.
+        '''
+        max_rank = self.tree.shape[1] - 1
+        pos = np.zeros(len(team_idx), dtype=np.int64)
+        remaining = k.astype(np.int64)
+        step = 1 << (max_rank.bit_length() - 1) if max_rank else 0
+        while step:
+            nxt = pos + step
+            valid = nxt <= max_rank
+            below = np.zeros(len(pos), dtype=bool)
+            below[valid] = self.tree[team_idx[valid], nxt[valid]] < remaining[valid]
+            remaining[below] -= self.tree[team_idx[below], nxt[below]]
+            pos[below] = nxt[below]
+            step >>= 1
+        return pos + 1
+
+    def stats(self):
+        '''
+        Returns the current stats in the same form as ballots.ballot_stats, a dict of arrays
+        ordered like self.teams with keys count, mean, std, median, q1 and q3.
+        '''
+        n_teams = len(self.teams)
+        count = self.count[:n_teams].copy()
+        team_idx = np.arange(n_teams)
+        last = np.maximum(count - 1, 0)
+
+        result = {'count': count, 'mean': self._means(), 'std': self._std()}
+        for name, percent in (('q1', 25), ('median', 50), ('q3', 75)):
+            # linear interpolation between the two closest ranks, same as np.percentile.
+            position = last * (percent / 100)
+            low = np.floor(position).astype(np.int64)
+            frac = position - low
+            low_rank = self._kth_smallest(team_idx, low + 1)
+            high_rank = self._kth_smallest(team_idx, np.minimum(low + 1, last) + 1)
+            value = low_rank * (1 - frac) + high_rank * frac
+            value[count == 0] = np.nan
+            result[name] = value
+        return result
+
+def sheet_ballots(rows):
+    '''
+    Generator of ballots from the rows of a rank per row sheet (rows[rank - 1][ranker]),
+    i.e. turns the sheet's columns into one ballot per ranker.
+    '''
+    for column in itertools.zip_longest(*rows, fillvalue=''):
+        yield column
@@ -0,0 +1,125 @@
+'''
+Graph helpers shared by the Reddit power rankings scripts.
+
+Saving figures, and the rank frequency and season heatmaps, which only differ between
+leagues by the league name, the file prefix, how a week is labelled and the team names shown:
+
+    graphs.create_heatmap(week_data, 'NFL', 'nfl_power_rankings')
+    graphs.create_season_heatmap(weeks_data, 'NBA', 'nba_power_rankings', week_label='#%d', display_names=TEAM_NICKNAMES)
+
+Both are drawn as a single image (imshow) rather than an artist per cell.
+matplotlib is only imported inside the functions that draw.
+
+Python 3.9
+'''
+
+import os
+
+import instrumentation
+import rank_sketch
+import season_summary
+
+def heatmap_filename(prefix, week_no):
+    '''
+    Filename of the rank frequency heatmap for week_no, e.g. heatmaps/nfl_power_rankings_heatmap_week05.png.
+    '''
+    return 'heatmaps/%s_heatmap_week%s.png' %(prefix, str(week_no).rjust(2, '0'))
+
+def season_heatmap_filename(prefix, week_no):
+    '''
+    Filename of the season heatmap up to week_no.
+    '''
+    return 'heatmaps/%s_season_heatmap_week%s.png' %(prefix, str(week_no).rjust(2, '0'))
+
+def save_figure(fig, filename):
+    '''
+    Save a figure as a png, making its directory if needed. filename can also be a file object.
+    '''
+    if isinstance(filename, str):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    fig.savefig(filename, format='png', bbox_inches='tight')
+
+def _team_labels(team_labels, display_names):
+    '''
+    Tick labels for teams listed last place first, e.g. '1. Cowboys' at the top.
+    display_names optionally maps a team to the name shown (e.g. the NBA nicknames).
+    '''
+    names = [display_names[team] for team in team_labels] if display_names else team_labels
+    return [str(len(names) - x) + '. ' + names[x] for x in range(len(names))]
+
+def create_heatmap(week_data, league, prefix, filename=None, week_label='Week %d', display_names=None):
+    '''
+    Create a heatmap of how many rankers gave each team each rank (team x rank), teams in power rankings order.
+    Takes a Week (anything with week_no, teams, ballots, sketch and power_rankings), the league name (e.g. 'NFL'),
+    the file prefix (e.g. 'nfl_power_rankings'), and optionally filename (default heatmap_filename,
+    can also be a file object), week_label (how a week is shown) and display_names ({team: name shown}).
+    The counts come from the week's rank sketch, or one bincount of the ballots if it has none (sketch is None).
+    Returns the saved filename.
+    '''
+    import matplotlib.pyplot as plt
+
+    team_labels = list(reversed(week_data.power_rankings)) # reversed to get 1. team at top.
+    n_teams = len(team_labels)
+    with instrumentation.stage('heatmap.draw', week=week_data.week_no):
+        sketch = week_data.sketch if week_data.sketch is not None else rank_sketch.RankSketch.from_ballots(week_data.teams, week_data.ballots)
+        frequency = sketch.rank_frequency(team_labels, n_teams)
+
+        fig = plt.figure(figsize=(15, 8))
+        ax = fig.add_subplot(111)
+
+        ax.set_title('%s Reddit Power Rankings Rank Frequency - %s' %(league, week_label % week_data.week_no))
+        ax.set_xlabel('Rank')
+        ax.set_ylabel('Team (power rankings order)')
+
+        # row 0 (last place) at the bottom, one cell per rank.
+        image = ax.imshow(frequency, cmap='Blues', origin='lower', aspect='auto', interpolation='nearest',
+                          extent=(0.5, n_teams + 0.5, -0.5, n_teams - 0.5))
+        fig.colorbar(image, ax=ax, label='Rankers')
+
+        ax.set_yticks(range(n_teams))
+        ax.set_yticklabels(_team_labels(team_labels, display_names))
+
+    filename = heatmap_filename(prefix, week_data.week_no) if filename is None else filename
+    with instrumentation.stage('heatmap.save', week=week_data.week_no):
+        save_figure(fig, filename)
+        plt.close(fig)
+
+    return filename
+
+def create_season_heatmap(weeks_data, league, prefix, filename=None, week_label='Week %d', display_names=None):
+    '''
+    Create a heatmap of each team's mean rank in each week (team x week), teams in the
+    current week's power rankings order, from the weeks' summaries.
+    Takes a list of weeks, the last item should be the current week, and the rest as create_heatmap.
+    Returns the saved filename.
+    '''
+    import matplotlib.pyplot as plt
+
+    cur_week = weeks_data[-1]
+    team_labels = list(reversed(cur_week.power_rankings)) # reversed to get 1. team at top.
+    n_teams = len(team_labels)
+    with instrumentation.stage('season_heatmap.draw', week=cur_week.week_no):
+        means = season_summary.season_table([week_data.summary for week_data in weeks_data], team_labels, ['mean'])['mean'].T
+
+        fig = plt.figure(figsize=(15, 8))
+        ax = fig.add_subplot(111)
+
+        ax.set_title('%s Reddit Power Rankings Avg. Rank - %s to %s' %(league, week_label % weeks_data[0].week_no, week_label % cur_week.week_no))
+        ax.set_xlabel('Power rankings')
+        ax.set_ylabel('Team (power rankings order, %s)' %(week_label % cur_week.week_no))
+
+        # low mean rank = good = bright.
+        image = ax.imshow(means, cmap='viridis_r', origin='lower', aspect='auto', interpolation='nearest', vmin=1, vmax=n_teams)
+        fig.colorbar(image, ax=ax, label='Avg. Rank')
+
+        ax.set_xticks(range(len(weeks_data)))
+        ax.set_xticklabels([week_label % week_data.week_no for week_data in weeks_data])
+        ax.set_yticks(range(n_teams))
+        ax.set_yticklabels(_team_labels(team_labels, display_names))
+
+    filename = season_heatmap_filename(prefix, cur_week.week_no) if filename is None else filename
+    with instrumentation.stage('season_heatmap.save', week=cur_week.week_no):
+        save_figure(fig, filename)
+        plt.close(fig)
+
+    return filename
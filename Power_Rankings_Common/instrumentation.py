@@ -0,0 +1,198 @@
+'''
+Per stage timing and memory instrumentation for the Reddit power rankings.
+
+Wrap a stage of work in a stage block; when instrumentation is enabled its wall time
+(and optionally its peak memory, via tracemalloc) is recorded along with any arguments:
+
+    with instrumentation.stage('boxplot.save', week=5):
+        fig.savefig(filename)
+
+Disabled (the default) stage() returns a shared do nothing context, so stages can stay in
+the code for good. The records export to json or to a Chrome trace (chrome://tracing or
+https://ui.perfetto.dev) with one row per process, so pool workers show up side by side.
+
+Python 3.9
+'''
+
+import collections
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+_ENABLED = False
+_MEMORY = False
+_RECORDS = []
+# open stages, innermost last, each [peak memory so far] while memory is traced.
+_PEAKS = []
+# wall clock time of perf_counter() == 0, so records from different processes line up.
+_WALL_OFFSET = time.time() - time.perf_counter()
+
+class _NullStage(object):
+    '''
+    Context that does nothing, returned by stage() while instrumentation is disabled.
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage(object):
+    '''
+    Context recording the wall time (and peak memory if traced) of one stage.
+    '''
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if _MEMORY:
+            current, peak = tracemalloc.get_traced_memory()
+            if _PEAKS:
+                _PEAKS[-1][0] = max(_PEAKS[-1][0], peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+            _PEAKS.append([current])
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        record = {'name': self.name, 'start': _WALL_OFFSET + self.start, 'seconds': end - self.start,
+                  'pid': os.getpid(), 'tid': threading.get_ident(), 'args': self.args}
+        if _MEMORY and _PEAKS:
+            peak = max(_PEAKS.pop()[0], tracemalloc.get_traced_memory()[1])
+            if _PEAKS:
+                _PEAKS[-1][0] = max(_PEAKS[-1][0], peak)
+            record['peak_bytes'] = peak - self.start_memory
+        _RECORDS.append(record)
+        return False
+
+def enable(memory=False):
+    '''
+    Start recording stages. memory = True also records each stage's peak memory above
+    what was allocated when it started (tracemalloc, which slows Python code down a lot).
+    '''
+    global _ENABLED, _MEMORY
+    _ENABLED = True
+    _MEMORY = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    '''
+    Stop recording stages. Records already made are kept until pop_records().
+    '''
+    global _ENABLED, _MEMORY
+    if _MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _ENABLED = False
+    _MEMORY = False
+    del _PEAKS[:]
+
+def is_enabled():
+    '''
+    Returns (enabled, memory) so the same settings can be used in a worker process.
+    '''
+    return _ENABLED, _MEMORY
+
+def stage(name, **args):
+    '''
+    Returns a context recording the stage called name, args (json-able) are kept with the record.
+    '''
+    if not _ENABLED:
+        return _NULL_STAGE
+    return _Stage(name, args)
+
+def records():
+    '''
+    Returns the list of records so far, in the order the stages finished.
+    '''
+    return list(_RECORDS)
+
+def pop_records():
+    '''
+    Returns the records so far and forgets them.
+    '''
+    popped = list(_RECORDS)
+    del _RECORDS[:]
+    return popped
+
+def add_records(new_records):
+    '''
+    Add records made elsewhere, e.g. in a worker process.
+    '''
+    _RECORDS.extend(new_records)
+
+def call_recorded(settings, func, arg):
+    '''
+    Runs func(arg) with instrumentation set up as settings (from is_enabled()), returns
+    (result, records made). Module level so it can be sent to a worker process.
+    '''
+    # a forked worker starts with a copy of the parent's records, which the parent already has.
+    pop_records()
+    enable(settings[1])
+    try:
+        result = func(arg)
+    finally:
+        worker_records = pop_records()
+        disable()
+    return result, worker_records
+
+def summary(stage_records=None):
+    '''
+    Returns {name: {'calls', 'seconds', 'max_seconds', 'peak_bytes'}} totalled over the records
+    (default all records so far), in order of total seconds, slowest first.
+    '''
+    totals = collections.OrderedDict()
+    for record in (_RECORDS if stage_records is None else stage_records):
+        total = totals.setdefault(record['name'], {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'peak_bytes': None})
+        total['calls'] += 1
+        total['seconds'] += record['seconds']
+        total['max_seconds'] = max(total['max_seconds'], record['seconds'])
+        if 'peak_bytes' in record:
+            total['peak_bytes'] = max(total['peak_bytes'] or 0, record['peak_bytes'])
+    return collections.OrderedDict(sorted(totals.items(), key=lambda item: -item[1]['seconds']))
+
+def format_summary(stage_records=None):
+    '''
+    Returns the summary as a printable table.
+    '''
+    lines = ['%-28s %6s %10s %10s %10s' %('stage', 'calls', 'total s', 'max s', 'peak MB')]
+    for name, total in summary(stage_records).items():
+        peak = '' if total['peak_bytes'] is None else '%.1f' %(total['peak_bytes'] / 2 ** 20)
+        lines.append('%-28s %6d %10.4f %10.4f %10s' %(name, total['calls'], total['seconds'], total['max_seconds'], peak))
+    return '\n'.join(lines)
+
+def chrome_trace(stage_records=None):
+    '''
+    Returns the records as a Chrome trace event dict (complete 'X' events, times in microseconds).
+    '''
+    stage_records = _RECORDS if stage_records is None else stage_records
+    origin = min([record['start'] for record in stage_records] or [0])
+    events = []
+    for record in stage_records:
+        args = dict(record['args'])
+        if 'peak_bytes' in record:
+            args['peak_bytes'] = record['peak_bytes']
+        events.append({'name': record['name'], 'cat': record['name'].split('.')[0], 'ph': 'X',
+                       'ts': round((record['start'] - origin) * 1e6, 1), 'dur': round(record['seconds'] * 1e6, 1),
+                       'pid': record['pid'], 'tid': record['tid'], 'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def export(filename, fmt='chrome', stage_records=None):
+    '''
+    Write the records (default all records so far) to filename, as a Chrome trace (fmt = 'chrome')
+    or as json with the raw records and the per stage summary (fmt = 'json').
+    '''
+    stage_records = _RECORDS if stage_records is None else stage_records
+    if fmt == 'chrome':
+        output = chrome_trace(stage_records)
+    else:
+        output = {'records': stage_records, 'summary': summary(stage_records)}
+    with open(filename, 'w') as open_file:
+        json.dump(output, open_file, indent=1)
@@ -0,0 +1,57 @@
+'''
+Process pool chart rendering for the Reddit power rankings.
+
+Each chart is a job (any picklable object) handed to a render function that saves
+the figure and returns its filename. Jobs are sent to a process pool whose workers
+use the headless Agg backend, so a season's charts render on all cores.
+
+Python 3.9
+'''
+
+import concurrent.futures
+import functools
+import os
+
+import instrumentation
+
+def init_worker():
+    '''
+    Switch the worker to the headless Agg backend before any figure is created.
+    '''
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+def render_all(render_job, jobs, workers=None):
+    '''
+    Takes render_job, a module level function (so it can be pickled) that renders one
+    job and returns the saved filename (or a list of filenames), and a list of jobs.
+    workers = None or 1 renders in this process, 0 uses one worker per core.
+    Returns the sorted list of saved filenames, the same whatever the number of workers.
+    If instrumentation is enabled the workers record their stages too, and send them back.
+    '''
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    if workers is None or workers == 1 or len(jobs) <= 1:
+        with instrumentation.stage('render_all', jobs=len(jobs), workers=1):
+            results = [render_job(job) for job in jobs]
+    else:
+        settings = instrumentation.is_enabled()
+        with instrumentation.stage('render_all', jobs=len(jobs), workers=workers), \
+             concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=init_worker) as executor:
+            if settings[0]:
+                results = []
+                for result, worker_records in executor.map(functools.partial(instrumentation.call_recorded, settings, render_job), jobs):
+                    results.append(result)
+                    instrumentation.add_records(worker_records)
+            else:
+                results = list(executor.map(render_job, jobs))
+
+    filenames = []
+    for result in results:
+        if isinstance(result, str):
+            filenames.append(result)
+        else:
+            filenames.extend(result)
+
+    return sorted(filenames)
@@ -0,0 +1,149 @@
+'''
+Rank aggregation methods for the Reddit power rankings.
+
+The consensus has always been the teams sorted by mean rank. The other methods here
+are built on the pairwise preference matrix, prefs[a, b] = number of rankers who rank
+team a ahead of team b (rankers missing either team don't count), so a ranker who
+skipped a week doesn't push every team down:
+
+* borda - most pairwise wins over the other teams, summed over rankers.
+* copeland - most head to head majorities.
+* schulze - Schulze beatpath winner order.
+* kemeny - approximate Kemeny order (fewest pairwise disagreements with the rankers), by local search.
+
+Every method returns the list of teams, best first, ties going to the earlier team
+like get_power_rankings.
+
+Python 3.9
+'''
+
+import numpy as np
+
+import ballots
+
+# cap on rankers x teams x teams comparisons made at once by preference_matrix.
+CHUNK_CELLS = 2 ** 23
+
+def ranker_preferences(week_ballots):
+    '''
+    Returns the (rankers x teams x teams) bool array ahead, ahead[r, a, b] = ranker r has team a
+    ranked ahead of team b, both ranked.
+    '''
+    # missing is ranked after every real rank, then pairs with a missing team are masked out.
+    ranked = week_ballots != ballots.MISSING
+    ranks = week_ballots.astype(np.int32)
+    ranks[~ranked] = np.iinfo(np.int32).max
+    ahead = ranks[:, :, None] < ranks[:, None, :]
+    ahead &= ranked[:, None, :]
+    return ahead
+
+def preference_matrix(week_ballots):
+    '''
+    Returns the (teams x teams) int array prefs, prefs[a, b] = number of rankers with team a
+    ranked ahead of team b, both ranked. Rankers are compared a chunk at a time to bound memory.
+    '''
+    n_rankers, n_teams = week_ballots.shape
+    chunk = max(1, CHUNK_CELLS // (n_teams * n_teams))
+
+    prefs = np.zeros((n_teams, n_teams), dtype=np.int64)
+    for start in range(0, n_rankers, chunk):
+        prefs += ranker_preferences(week_ballots[start:start + chunk]).sum(axis=0)
+    return prefs
+
+def _order_by_score(teams, score):
+    '''
+    Returns teams sorted by score, highest first, ties to the earlier team.
+    '''
+    return [teams[idx] for idx in np.argsort(-np.asarray(score, dtype=np.float64), kind='stable')]
+
+def mean_order(teams, week_ballots):
+    '''
+    The teams sorted by mean rank (missing rankings ignored).
+    '''
+    means = ballots.ballot_stats(week_ballots)['mean']
+    return [teams[idx] for idx in np.argsort(means, kind='stable')]
+
+def borda_order(teams, prefs):
+    '''
+    The teams sorted by total pairwise wins over all rankers (Borda count, missing rankings ignored).
+    '''
+    return _order_by_score(teams, prefs.sum(axis=1))
+
+def copeland_order(teams, prefs):
+    '''
+    The teams sorted by Copeland score, 1 per head to head majority, 0.5 per tie.
+    '''
+    score = (prefs > prefs.T).sum(axis=1) + 0.5 * ((prefs == prefs.T).sum(axis=1) - 1)
+    return _order_by_score(teams, score)
+
+def strongest_paths(prefs):
+    '''
+    Returns the (teams x teams) Schulze strongest path strengths, Floyd-Warshall with
+    each intermediate team done as one numpy step over the whole matrix.
+    '''
+    paths = np.where(prefs > prefs.T, prefs, 0)
+    for mid in range(prefs.shape[0]):
+        np.maximum(paths, np.minimum(paths[:, mid:mid + 1], paths[mid:mid + 1, :]), out=paths)
+    np.fill_diagonal(paths, 0)
+    return paths
+
+def schulze_order(teams, prefs):
+    '''
+    The teams sorted by the Schulze method, by the number of teams each beats on strongest paths.
+    '''
+    paths = strongest_paths(prefs)
+    return _order_by_score(teams, (paths > paths.T).sum(axis=1))
+
+def kemeny_score(order_idx, prefs):
+    '''
+    Returns the number of ranker pairwise preferences agreeing with the order (list of team indexes).
+    '''
+    ordered = prefs[np.ix_(order_idx, order_idx)]
+    return int(np.triu(ordered, k=1).sum())
+
+def kemeny_order(teams, prefs, max_passes=100):
+    '''
+    Approximate Kemeny order, the order agreeing with the most ranker pairwise preferences.
+    Starts from the Copeland order, then moves single teams to the place that gains the most
+    (all moves of a team are scored at once with a cumulative sum) until no move helps.
+    '''
+    team_index = {team: idx for idx, team in enumerate(teams)}
+    order = [team_index[team] for team in copeland_order(teams, prefs)]
+    n_teams = len(order)
+
+    for _ in range(max_passes):
+        improved = False
+        for pos in range(n_teams):
+            team = order[pos]
+            # swap_gain[k] = gain from the team swapping sides with order[k].
+            others = np.array(order)
+            swap_gain = prefs[team, others] - prefs[others, team]
+            gain = np.zeros(n_teams)
+            # moving up to place k passes order[k:pos], moving down to place k passes order[pos+1:k+1].
+            gain[:pos] = np.cumsum(swap_gain[:pos][::-1])[::-1]
+            gain[pos + 1:] = -np.cumsum(swap_gain[pos + 1:])
+            best = int(np.argmax(gain))
+            if gain[best] > 0:
+                order.insert(best, order.pop(pos))
+                improved = True
+        if not improved:
+            break
+
+    return [teams[idx] for idx in order]
+
+METHODS = ['mean', 'borda', 'copeland', 'schulze', 'kemeny']
+
+# the methods that only need the preference matrix, order(teams, prefs).
+PREFERENCE_ORDERS = {'borda': borda_order, 'copeland': copeland_order, 'schulze': schulze_order, 'kemeny': kemeny_order}
+
+def aggregate(teams, week_ballots, method='mean'):
+    '''
+    Returns the consensus order of teams (list) from week_ballots (rankers x teams array)
+    using method, one of METHODS.
+    '''
+    if method == 'mean':
+        return mean_order(teams, week_ballots)
+    if method not in METHODS:
+        raise ValueError('Unknown aggregation method %s, expected one of %s' %(method, ', '.join(METHODS)))
+
+    return PREFERENCE_ORDERS[method](teams, preference_matrix(week_ballots))
@@ -0,0 +1,150 @@
+'''
+Bootstrap confidence intervals for the consensus power rankings.
+
+The published order only says team A's mean rank is below team B's. Resampling the
+rankers (with replacement) thousands of times shows how sure that order is: a
+confidence interval for each team's consensus rank and the probability that team A
+finishes ahead of team B.
+
+Each resample is a (rankers) vector of how many times each ranker was drawn, so the
+(resamples x rankers x teams) sum of the drawn ballots is one matrix product of the
+(resamples x rankers) counts and the (rankers x teams) ballots. The other rank_aggregation
+methods resample the preference matrix the same way (counts times each ranker's pairwise
+preferences), then order each resample with the method. Resamples are done in chunks,
+each with its own seed, so the result is the same whatever the number of workers.
+
+The preference methods order each resample in Python, so they default to fewer resamples
+(kemeny takes about 1 s per 1000 resamples of a 32 team week, mean about 0.01 s).
+
+Python 3.9
+'''
+
+import concurrent.futures
+import os
+
+import numpy as np
+
+import ballots
+import rank_aggregation
+
+MEAN_RESAMPLES = 10000
+PREFERENCE_RESAMPLES = 1000 # the other methods order each resample in Python
+
+def default_resamples(method):
+    '''
+    Returns the default number of resamples for the rank_aggregation method.
+    '''
+    return MEAN_RESAMPLES if method == 'mean' else PREFERENCE_RESAMPLES
+
+def resample_ranks(week_ballots, resamples, rng, method='mean'):
+    '''
+    Returns a (resamples x teams) int array of each team's consensus rank (1 = best, by the
+    rank_aggregation method, ties to the earlier team like get_power_rankings) in each bootstrap
+    resample of the rankers. By mean rank, a team no drawn ranker ranked is placed last.
+    '''
+    n_rankers, n_teams = week_ballots.shape
+    draws = rng.multinomial(n_rankers, np.full(n_rankers, 1.0 / n_rankers), size=resamples).astype(np.float64)
+
+    if method == 'mean':
+        ranked = week_ballots != ballots.MISSING
+        ranks = np.where(ranked, week_ballots, 0).astype(np.float64)
+        sums = draws @ ranks
+        counts = draws @ ranked.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        means[counts == 0] = np.inf
+        order = np.argsort(means, axis=1, kind='stable')
+    else:
+        # each resample's preference matrix is the drawn rankers' preferences, summed (exact in float64).
+        ahead = rank_aggregation.ranker_preferences(week_ballots).reshape(n_rankers, -1).astype(np.float64)
+        prefs = np.rint(draws @ ahead).astype(np.int64).reshape(resamples, n_teams, n_teams)
+        order_teams = rank_aggregation.PREFERENCE_ORDERS[method]
+        team_ids = list(range(n_teams))
+        order = np.array([order_teams(team_ids, resample_prefs) for resample_prefs in prefs], dtype=np.intp).reshape(resamples, n_teams)
+
+    consensus = np.empty_like(order)
+    np.put_along_axis(consensus, order, np.arange(1, order.shape[1] + 1), axis=1)
+    return consensus
+
+def _bootstrap_chunk(chunk):
+    '''
+    Bootstrap one chunk, chunk = (ballots, resamples, seed, method). Module level so it can be sent to a worker process.
+    Returns (position_counts, ahead_counts):
+    position_counts[team, rank - 1] = number of resamples the team had that consensus rank,
+    ahead_counts[a, b] = number of resamples team a was ranked ahead of team b.
+    '''
+    week_ballots, resamples, seed, method = chunk
+    consensus = resample_ranks(week_ballots, resamples, np.random.default_rng(seed), method)
+    n_teams = consensus.shape[1]
+
+    position_counts = np.zeros((n_teams, n_teams), dtype=np.int64)
+    np.add.at(position_counts, (np.broadcast_to(np.arange(n_teams), consensus.shape), consensus - 1), 1)
+    # ahead_counts[a, b] = sum over resamples of rank a < rank b.
+    ahead_counts = (consensus[:, :, None] < consensus[:, None, :]).sum(axis=0)
+    return position_counts, ahead_counts
+
+def _count_quantile(counts, fraction):
+    '''
+    Returns the rank (1 based) at the given fraction of each team's rank counts (teams x ranks).
+    '''
+    cumulative = np.cumsum(counts, axis=1)
+    return (cumulative < fraction * cumulative[:, -1:]).sum(axis=1) + 1
+
+def bootstrap(teams, week_ballots, resamples=None, confidence=0.95, seed=0, chunk_size=2500, workers=None, method='mean'):
+    '''
+    Bootstrap the consensus ranks of teams (list) from week_ballots (rankers x teams array),
+    the consensus made by method (one of rank_aggregation.METHODS), resamples defaulting to default_resamples(method).
+    Chunks of chunk_size resamples are run in a process pool of workers processes
+    (0 = one per core, None = in this process).
+
+    Returns a dict of arrays ordered like teams:
+    'rank_low', 'rank_high' (the confidence interval), 'rank_median', 'positions'
+    (teams x ranks fraction of resamples at each rank) and 'ahead' (teams x teams probability
+    that the row team is ranked ahead of the column team), plus 'teams', 'resamples', 'confidence' and 'method'.
+    '''
+    if method not in rank_aggregation.METHODS:
+        raise ValueError('Unknown aggregation method %s, expected one of %s' %(method, ', '.join(rank_aggregation.METHODS)))
+    if resamples is None:
+        resamples = default_resamples(method)
+    if resamples < 1:
+        raise ValueError('resamples must be at least 1, not %d' %(resamples))
+    if not 0 < confidence < 1:
+        raise ValueError('confidence must be between 0 and 1, not %s' %(confidence))
+
+    sizes = [chunk_size] * (resamples // chunk_size)
+    if resamples % chunk_size:
+        sizes.append(resamples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = [(week_ballots, size, chunk_seed, method) for size, chunk_seed in zip(sizes, seeds)]
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    if workers is None or workers == 1 or len(chunks) <= 1:
+        results = [_bootstrap_chunk(chunk) for chunk in chunks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            results = list(executor.map(_bootstrap_chunk, chunks))
+
+    position_counts = sum(result[0] for result in results)
+    ahead_counts = sum(result[1] for result in results)
+    tail = (1 - confidence) / 2
+
+    return {
+        'teams': list(teams),
+        'resamples': resamples,
+        'confidence': confidence,
+        'method': method,
+        'rank_low': _count_quantile(position_counts, tail),
+        'rank_high': _count_quantile(position_counts, 1 - tail),
+        'rank_median': _count_quantile(position_counts, 0.5),
+        'positions': position_counts / resamples,
+        'ahead': ahead_counts / resamples,
+    }
+
+def week_bootstrap(week_data, **kwargs):
+    '''
+    Bootstrap a Week (anything with teams, ballots and method), kwargs as bootstrap.
+    The week's own method is used, so the intervals match its power rankings order.
+    '''
+    return bootstrap(week_data.teams, week_data.ballots, method=week_data.method, **kwargs)
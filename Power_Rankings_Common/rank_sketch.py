@@ -0,0 +1,212 @@
+'''
+Mergeable rank sketches for very large ballot volumes.
+
+A rank can only be 1 to the number of teams, so the counts of each rank for each team
+are a complete sketch of the ballots: (teams x ranks) integers whatever the number of
+ballots, exact quantiles (no t-digest/KLL error), and two sketches merge by adding
+their counts. Ingestion shards or weeks can each be sketched in their own process and
+merged, and the boxplot summary (quartiles, whiskers, outliers) is read off the counts.
+A sheet can be counted as it is read (sketch_rank_rows), without building its ballots array.
+
+Example:
+    sketch = rank_sketch.RankSketch()
+    for teams, shard_ballots in shards:
+        sketch.add_ballots(teams, shard_ballots)
+    summary = sketch.summary() # a season_summary.WeekSummary, as if from all the ballots
+    ax.bxp(summary.bxp_stats(teams))
+
+Python 3.9
+'''
+
+import numpy as np
+
+import ballots
+import season_summary
+
+# rows of a sheet counted per bincount by add_rank_rows.
+CHUNK_ROWS = 1024
+
+class RankSketch(object):
+    '''
+    RankSketch object, counts[team, rank] = number of rankers who gave team that rank.
+    Optionally takes teams (list of team names), in tie break order; later teams are added as they appear.
+    '''
+    def __init__(self, teams=()):
+        '''
+        Create an empty RankSketch.
+        '''
+        self.teams = []
+        self.team_index = {}
+        # column 0 (ballots.MISSING) stays 0.
+        self.counts = np.zeros((0, 1), dtype=np.int64)
+        self.n_ballots = 0
+        self._add_teams(teams)
+
+    @classmethod
+    def from_ballots(cls, teams, week_ballots):
+        '''
+        Returns a RankSketch of teams (list) and week_ballots (rankers x teams array).
+        '''
+        sketch = cls(teams)
+        sketch.add_ballots(teams, week_ballots)
+        return sketch
+
+    @property
+    def nbytes(self):
+        '''
+        Memory used by the counts, independent of the number of ballots.
+        '''
+        return self.counts.nbytes
+
+    def _add_teams(self, teams):
+        '''
+        Returns the index of each of teams, adding any new teams.
+        '''
+        new_teams = [team for team in dict.fromkeys(teams) if team not in self.team_index]
+        for team in new_teams:
+            self.team_index[team] = len(self.teams)
+            self.teams.append(team)
+        if new_teams:
+            self.counts = np.vstack((self.counts, np.zeros((len(new_teams), self.counts.shape[1]), dtype=np.int64)))
+        return np.array([self.team_index[team] for team in teams], dtype=np.intp)
+
+    def _grow_ranks(self, max_rank):
+        '''
+        Make room for ranks up to max_rank.
+        '''
+        if max_rank >= self.counts.shape[1]:
+            grown = np.zeros((self.counts.shape[0], max_rank + 1), dtype=np.int64)
+            grown[:, :self.counts.shape[1]] = self.counts
+            self.counts = grown
+
+    def add_ballots(self, teams, week_ballots):
+        '''
+        Add a (rankers x teams) ballots array, its columns named by teams (list), in one bincount pass.
+        '''
+        team_idx = self._add_teams(teams)
+        self._grow_ranks(int(week_ballots.max()) if week_ballots.size else 0)
+        n_ranks = self.counts.shape[1]
+        cells = np.broadcast_to(team_idx, week_ballots.shape) * n_ranks + week_ballots
+        counts = np.bincount(cells[week_ballots != ballots.MISSING], minlength=len(self.teams) * n_ranks)
+        self.counts += counts.reshape(len(self.teams), n_ranks)
+        self.n_ballots += week_ballots.shape[0]
+
+    def _add_id_rows(self, teams, rank_id_rows):
+        '''
+        Add a list of (rank, row of team ids) from ballots.iter_rank_ids, the ids indexing teams (list).
+        '''
+        if not rank_id_rows:
+            return
+        team_idx = self._add_teams(teams)
+        self._grow_ranks(rank_id_rows[-1][0])
+        n_ranks = self.counts.shape[1]
+        cells = []
+        for rank, id_row in rank_id_rows:
+            id_row = np.asarray(id_row, dtype=np.intp)
+            cells.append(team_idx[id_row[id_row >= 0]] * n_ranks + rank)
+        counts = np.bincount(np.concatenate(cells), minlength=len(self.teams) * n_ranks)
+        self.counts += counts.reshape(len(self.teams), n_ranks)
+
+    def add_rank_rows(self, rows, clean_name=str.strip, missing_cells=ballots.MISSING_CELLS, chunk_rows=CHUNK_ROWS):
+        '''
+        Count the rows of a ranking sheet (rows[rank - 1][ranker] is a team name, as ballots.encode_rank_rows)
+        as they are read, chunk_rows rows per bincount, so only one chunk of the sheet is held at a time.
+        Returns the sheet's teams in order of first appearance. If a cell isn't a team name or a ranker
+        ranks a team twice, a ValueError is raised after the last row, with the sketch part counted.
+        '''
+        teams = []
+        n_rankers = 0
+        chunk = []
+        for rank, id_row in enumerate(ballots.iter_rank_ids(rows, teams, clean_name, missing_cells), 1):
+            chunk.append((rank, id_row))
+            n_rankers = max(n_rankers, len(id_row))
+            if len(chunk) == chunk_rows:
+                self._add_id_rows(teams, chunk)
+                chunk = []
+        self._add_id_rows(teams, chunk)
+        self.n_ballots += n_rankers
+        return teams
+
+    def merge(self, other):
+        '''
+        Add the counts of another RankSketch (e.g. another shard or week) to this one. Returns self.
+        '''
+        team_idx = self._add_teams(other.teams)
+        self._grow_ranks(other.counts.shape[1] - 1)
+        self.counts[team_idx, :other.counts.shape[1]] += other.counts
+        self.n_ballots += other.n_ballots
+        return self
+
+    def rank_frequency(self, teams, n_ranks=None):
+        '''
+        Returns a (teams x ranks) array, [idx, rank - 1] = the number of rankers who gave teams[idx] that rank,
+        for ranks 1 to n_ranks (default the highest rank seen).
+        '''
+        n_ranks = self.counts.shape[1] - 1 if n_ranks is None else n_ranks
+        frequency = np.zeros((len(teams), n_ranks), dtype=np.int64)
+        width = min(n_ranks, self.counts.shape[1] - 1)
+        frequency[:, :width] = self.counts[[self.team_index[team] for team in teams], 1:width + 1]
+        return frequency
+
+    def _quantiles(self, cumulative, count, fractions):
+        '''
+        Linear interpolated quantiles (same as np.percentile) of each team from the cumulative rank counts.
+        '''
+        last = np.maximum(count - 1, 0)
+        results = []
+        for fraction in fractions:
+            position = last * fraction
+            low = np.floor(position).astype(np.int64)
+            high = np.minimum(low + 1, last)
+            frac = position - low
+            # the value at sorted position k is the first rank whose cumulative count is over k.
+            low_rank = (cumulative <= low[:, None]).sum(axis=1)
+            high_rank = (cumulative <= high[:, None]).sum(axis=1)
+            with np.errstate(invalid='ignore'):
+                value = low_rank * (1 - frac) + high_rank * frac
+            value[count == 0] = np.nan
+            results.append(value)
+        return results
+
+    def stats(self):
+        '''
+        Returns a dict of arrays (ordered like self.teams) with keys count, mean, std (population),
+        median, q1 and q3, as ballots.ballot_stats of all the ballots added.
+        '''
+        ranks = np.arange(self.counts.shape[1], dtype=np.float64)
+        count = self.counts.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (self.counts @ ranks) / count
+            std = np.sqrt((self.counts * (ranks - mean[:, None]) ** 2).sum(axis=1) / count)
+        q1, median, q3 = self._quantiles(np.cumsum(self.counts, axis=1), count, (0.25, 0.5, 0.75))
+        return {'count': count, 'mean': mean, 'std': std, 'median': median, 'q1': q1, 'q3': q3}
+
+    def summary(self, whis=1.5):
+        '''
+        Returns a season_summary.WeekSummary of all the ballots added, the same as
+        season_summary.summarize would give from the ballots themselves.
+        '''
+        stats = self.stats()
+        ranks = np.arange(self.counts.shape[1], dtype=np.float64)
+        present = self.counts > 0
+        iqr = stats['q3'] - stats['q1']
+        with np.errstate(invalid='ignore'):
+            inside = present & (ranks >= (stats['q1'] - whis * iqr)[:, None]) & (ranks <= (stats['q3'] + whis * iqr)[:, None])
+        stats['whislo'] = np.minimum(np.where(inside, ranks, np.inf).min(axis=1), stats['q1'])
+        stats['whishi'] = np.maximum(np.where(inside, ranks, -np.inf).max(axis=1), stats['q3'])
+
+        with np.errstate(invalid='ignore'):
+            outside = present & ((ranks < stats['whislo'][:, None]) | (ranks > stats['whishi'][:, None]))
+        flier_team, flier_rank = np.nonzero(outside)
+        fliers = (flier_team, flier_rank, self.counts[outside])
+
+        return season_summary.WeekSummary(self.teams, stats, fliers)
+
+def sketch_rank_rows(rows, clean_name=str.strip, missing_cells=ballots.MISSING_CELLS):
+    '''
+    Takes the same arguments as ballots.encode_rank_rows and returns (teams, RankSketch),
+    the rows counted as they are read rather than encoded into a ballots array.
+    '''
+    sketch = RankSketch()
+    teams = sketch.add_rank_rows(rows, clean_name, missing_cells)
+    return teams, sketch
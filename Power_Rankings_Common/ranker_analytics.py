@@ -0,0 +1,162 @@
+'''
+Ranker analytics for the Reddit power rankings.
+
+How far each ranker is from the consensus, and how much each pair of rankers agree
+(Spearman's rho and Kendall's tau), for one week or a whole season. Everything is
+calculated from the (rankers x teams) ballots array with matrix products, so there
+are no Python loops over pairs of rankers.
+
+Missing rankings are handled pairwise: two rankers are compared on the teams (or
+pairs of teams for Kendall) they both ranked. Spearman uses the ranks as given, so
+it is exact when both ballots are complete.
+
+Python 3.9
+'''
+
+import numpy as np
+
+import ballots
+
+def ranker_names(week_data):
+    '''
+    Returns the list of ranker names for a week, numbering them if the sheet doesn't name them.
+    '''
+    if getattr(week_data, 'rankers', None) is not None:
+        return list(week_data.rankers)
+    return ['ranker %d' %(idx) for idx in range(1, week_data.ballots.shape[0] + 1)]
+
+def consensus_deviation(week_ballots):
+    '''
+    Returns (deviation, mean_abs_deviation).
+    deviation is a (rankers x teams) array of each ranker's rank minus the team's mean rank
+    (nan where missing), positive = the ranker has the team lower than the consensus.
+    mean_abs_deviation is the mean absolute deviation of each ranker (nan if they ranked no teams).
+    '''
+    ranked = week_ballots != ballots.MISSING
+    ranks = np.where(ranked, week_ballots, np.nan)
+    consensus = ballots.ballot_stats(week_ballots)['mean']
+    deviation = ranks - consensus
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_abs_deviation = np.nansum(np.abs(deviation), axis=1) / ranked.sum(axis=1)
+    return deviation, mean_abs_deviation
+
+def _spearman_sums(week_ballots):
+    '''
+    Pairwise complete sums (n, sx, sy, sxx, syy, sxy) for Pearson correlation of every pair of rankers,
+    each a (rankers x rankers) array.
+    '''
+    mask = (week_ballots != ballots.MISSING).astype(np.float64)
+    ranks = np.where(mask > 0, week_ballots, 0).astype(np.float64)
+    squares = ranks ** 2
+    return (mask @ mask.T, ranks @ mask.T, mask @ ranks.T, squares @ mask.T, mask @ squares.T, ranks @ ranks.T)
+
+def _correlation(n, sx, sy, sxx, syy, sxy):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx ** 2 / n
+        var_y = syy - sy ** 2 / n
+        return cov / np.sqrt(var_x * var_y)
+
+def spearman_matrix(week_ballots):
+    '''
+    Returns the (rankers x rankers) Spearman's rho between every pair of rankers (nan if undefined).
+    '''
+    return _correlation(*_spearman_sums(week_ballots))
+
+def _pair_signs(week_ballots):
+    '''
+    Returns a (rankers x team pairs) int8 array of sign(rank of team i - rank of team j) for every
+    pair i < j, 0 if either team is missing.
+    '''
+    first, second = np.triu_indices(week_ballots.shape[1], k=1)
+    ranked = week_ballots != ballots.MISSING
+    signs = np.sign(week_ballots[:, first].astype(np.int32) - week_ballots[:, second]).astype(np.int8)
+    signs[~(ranked[:, first] & ranked[:, second])] = 0
+    return signs
+
+def _kendall_sums(week_ballots):
+    '''
+    Returns (concordant - discordant, number of pairs both ranked), (rankers x rankers) arrays.
+    '''
+    # float32 matmul is exact for these small integer sums and much faster than an integer matmul.
+    signs = _pair_signs(week_ballots).astype(np.float32)
+    both = np.abs(signs)
+    return (signs @ signs.T).astype(np.float64), (both @ both.T).astype(np.float64)
+
+def kendall_matrix(week_ballots):
+    '''
+    Returns the (rankers x rankers) Kendall's tau between every pair of rankers (nan if undefined).
+    A ballot has no ties, so this is both tau-a and tau-b.
+    '''
+    score, pairs = _kendall_sums(week_ballots)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return score / pairs
+
+def week_agreement(week_data):
+    '''
+    Returns a dict for one week with keys rankers (names), mean_abs_deviation, spearman and kendall.
+    Takes anything with ballots (and optionally rankers), e.g. a Week or BallotWeek.
+    '''
+    deviation, mean_abs_deviation = consensus_deviation(week_data.ballots)
+    return {'rankers': ranker_names(week_data), 'mean_abs_deviation': mean_abs_deviation,
+            'deviation': deviation, 'spearman': spearman_matrix(week_data.ballots),
+            'kendall': kendall_matrix(week_data.ballots)}
+
+def season_agreement(weeks_data):
+    '''
+    Returns the same dict as week_agreement for a list of weeks, with rankers matched by name.
+    Raises ValueError if there is more than one week and a week doesn't name its rankers, as the
+    numbered rankers of different weeks aren't the same people.
+    Kendall's tau pools the team pairs of every week (pairs are only compared within a week),
+    Spearman's rho is the mean of the weekly values for the weeks both rankers took part in.
+    deviation is a (rankers x teams) array of each ranker's mean deviation from the consensus for each
+    team (teams in the order of the returned teams list), i.e. their bias for or against each team.
+    '''
+    if len(weeks_data) > 1:
+        unnamed = [str(getattr(week_data, 'week_no', idx)) for idx, week_data in enumerate(weeks_data, 1) if getattr(week_data, 'rankers', None) is None]
+        if unnamed:
+            raise ValueError('Rankers can only be matched across weeks by name, week %s does not name them' %(', '.join(unnamed)))
+
+    ranker_ids = {}
+    team_ids = {}
+    week_rankers = []
+    week_teams = []
+    for week_data in weeks_data:
+        week_rankers.append(np.array([ranker_ids.setdefault(name, len(ranker_ids)) for name in ranker_names(week_data)], dtype=np.intp))
+        week_teams.append(np.array([team_ids.setdefault(team, len(team_ids)) for team in week_data.teams], dtype=np.intp))
+    rankers = sorted(ranker_ids, key=ranker_ids.get)
+    teams = sorted(team_ids, key=team_ids.get)
+
+    n_rankers, n_teams = len(rankers), len(teams)
+    kendall_score = np.zeros((n_rankers, n_rankers))
+    kendall_pairs = np.zeros((n_rankers, n_rankers))
+    spearman_sum = np.zeros((n_rankers, n_rankers))
+    spearman_weeks = np.zeros((n_rankers, n_rankers))
+    deviation_sum = np.zeros((n_rankers, n_teams))
+    deviation_count = np.zeros((n_rankers, n_teams))
+    abs_deviation_sum = np.zeros(n_rankers)
+    ranked_count = np.zeros(n_rankers)
+
+    for week_data, ranker_idx, team_idx in zip(weeks_data, week_rankers, week_teams):
+        grid = np.ix_(ranker_idx, ranker_idx)
+
+        score, pairs = _kendall_sums(week_data.ballots)
+        kendall_score[grid] += score
+        kendall_pairs[grid] += pairs
+
+        spearman = spearman_matrix(week_data.ballots)
+        defined = ~np.isnan(spearman)
+        spearman_sum[grid] += np.where(defined, spearman, 0)
+        spearman_weeks[grid] += defined
+
+        deviation, mean_abs_deviation = consensus_deviation(week_data.ballots)
+        ranked = ~np.isnan(deviation)
+        deviation_sum[np.ix_(ranker_idx, team_idx)] += np.where(ranked, deviation, 0)
+        deviation_count[np.ix_(ranker_idx, team_idx)] += ranked
+        abs_deviation_sum[ranker_idx] += np.nansum(np.abs(deviation), axis=1)
+        ranked_count[ranker_idx] += ranked.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {'rankers': rankers, 'teams': teams, 'mean_abs_deviation': abs_deviation_sum / ranked_count,
+                'deviation': deviation_sum / deviation_count, 'spearman': spearman_sum / spearman_weeks,
+                'kendall': kendall_score / kendall_pairs}
@@ -0,0 +1,214 @@
+'''
+Command line helpers shared by the Reddit power rankings scripts.
+
+Usage (from the script's directory):
+    python nfl_power_rankings.py rankings
+    python nfl_power_rankings.py --week 5 stats --format csv
+    python nba_power_rankings.py rankers --season
+    python nfl_power_rankings.py bootstrap --resamples 10000 --confidence 0.9
+    python nfl_power_rankings.py render --all --workers 0
+    python nba_power_rankings.py render --sketch --heatmap
+    python nfl_power_rankings.py --method schulze rankings
+    python nfl_power_rankings.py --trace trace.json render --all
+    python nfl_power_rankings.py serve --port 8000
+
+Nothing here imports matplotlib, so the rankings and stats commands start fast.
+
+Python 3.9
+'''
+
+import argparse
+import contextlib
+import csv
+import json
+import sys
+
+import numpy as np
+
+import instrumentation
+import rank_aggregation
+import rank_bootstrap
+
+STATS_FIELDS = ['rank', 'team', 'mean', 'std', 'median', 'q1', 'q3', 'count']
+BOOTSTRAP_FIELDS = ['rank', 'team', 'rank_low', 'rank_median', 'rank_high', 'p_ahead_of_next']
+
+def positive_int(value):
+    '''
+    argparse type for an int of at least 1.
+    '''
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('must be at least 1, not %d' %(number))
+    return number
+
+def build_parser(description, cur_week, default_command=None):
+    '''
+    Returns (parser, render_parser) with the rankings, stats, render and serve commands.
+    render_parser is returned so a script can add its own render options.
+    default_command is used when no command is given, otherwise a command is required.
+    '''
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--week', type=int, default=cur_week, help='week to use (default %(default)s)')
+    parser.add_argument('--method', choices=rank_aggregation.METHODS, default='mean', help='how the rankers\' ballots are combined into the power rankings (default %(default)s)')
+    parser.add_argument('--trace', metavar='FILE', help='record the time of each stage and write it to FILE')
+    parser.add_argument('--trace-format', choices=('chrome', 'json'), default='chrome', help='chrome trace (chrome://tracing, Perfetto) or json records and summary (default %(default)s)')
+    parser.add_argument('--trace-memory', action='store_true', help='also record the peak memory of each stage (slow)')
+    subparsers = parser.add_subparsers(dest='command')
+    if default_command is None:
+        subparsers.required = True
+    else:
+        # the sub command options aren't parsed when the command is left out, so default them here.
+        parser.set_defaults(command=default_command, format='json', season=False, all=False, workers=None, no_cache=False, max_fliers=None, heatmap=False, sketch=False)
+
+    subparsers.add_parser('rankings', help='print the power rankings')
+
+    stats_parser = subparsers.add_parser('stats', help='dump the stats for each team')
+    stats_parser.add_argument('--format', choices=('json', 'csv'), default='json')
+
+    rankers_parser = subparsers.add_parser('rankers', help='dump each ranker\'s deviation from the consensus and the agreement between rankers')
+    rankers_parser.add_argument('--season', action='store_true', help='every week up to --week, not just --week (needs sheets that name the rankers)')
+    rankers_parser.add_argument('--format', choices=('json', 'csv'), default='json', help='csv only has the per ranker columns')
+
+    bootstrap_parser = subparsers.add_parser('bootstrap', help='dump a bootstrap confidence interval of each team\'s rank (by --method), resampling the rankers')
+    bootstrap_parser.add_argument('--resamples', type=positive_int, default=None,
+                                  help='(default %d for --method mean, %d for the other methods, which order each resample in Python: '\
+                                       'kemeny takes about 1 s per 1000 resamples of 32 teams)' %(rank_bootstrap.MEAN_RESAMPLES, rank_bootstrap.PREFERENCE_RESAMPLES))
+    bootstrap_parser.add_argument('--confidence', type=float, default=0.95, help='(default %(default)s)')
+    bootstrap_parser.add_argument('--seed', type=int, default=0, help='random seed (default %(default)s)')
+    bootstrap_parser.add_argument('--workers', type=int, default=None, help='worker processes, 0 = one per core (default: in this process)')
+    bootstrap_parser.add_argument('--format', choices=('json', 'csv'), default='json', help='csv only has the per team columns')
+
+    render_parser = subparsers.add_parser('render', help='render the graphs')
+    render_parser.add_argument('--all', action='store_true', help='render every week up to --week, not just --week')
+    render_parser.add_argument('--workers', type=int, default=None, help='worker processes, 0 = one per core (default: render in this process)')
+    render_parser.add_argument('--no-cache', action='store_true', help='render even if the inputs have not changed')
+    render_parser.add_argument('--heatmap', action='store_true', help='also render the rank frequency and season heatmaps')
+    render_parser.add_argument('--max-fliers', type=int, default=None, help='draw a sample of at most this many outliers per team (default all)')
+    render_parser.add_argument('--sketch', action='store_true', help='draw the graphs from rank sketches counted while the csvs are read, no ballots are kept (--method mean only)')
+
+    serve_parser = subparsers.add_parser('serve', help='serve the rankings, stats and graphs over http, see rankings_service')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='(default %(default)s)')
+    serve_parser.add_argument('--port', type=int, default=8000, help='(default %(default)s)')
+    serve_parser.add_argument('--workers', type=int, default=1, help='graph render processes, 0 = one per core (default %(default)s)')
+    serve_parser.add_argument('--cache-mb', type=float, default=64, help='size of the cache of rendered responses (default %(default)s)')
+
+    return parser, render_parser
+
+def check_week(parser, args, n_weeks):
+    '''
+    parser.error unless --week is 1 to n_weeks, the weeks that have a csv up to the current week.
+    '''
+    if not 1 <= args.week <= n_weeks:
+        parser.error('--week must be 1 to %d, not %d' %(n_weeks, args.week))
+
+@contextlib.contextmanager
+def tracing(args):
+    '''
+    Context for running a command. With --trace the stages are recorded, then written to
+    the trace file and summarised on stderr at the end.
+    '''
+    if not args.trace:
+        yield
+        return
+
+    instrumentation.enable(args.trace_memory)
+    try:
+        with instrumentation.stage('command', command=args.command, week=args.week):
+            yield
+    finally:
+        instrumentation.disable()
+        instrumentation.export(args.trace, args.trace_format)
+        print(instrumentation.format_summary(), file=sys.stderr)
+
+def stats_table(week_data):
+    '''
+    Returns a list of dicts (keys STATS_FIELDS), one per team in power rankings order.
+    Takes a Week with teams, stats and power_rankings.
+    '''
+    team_index = {team: idx for idx, team in enumerate(week_data.teams)}
+    table = []
+    for rank, team in enumerate(week_data.power_rankings, 1):
+        idx = team_index[team]
+        row = {'rank': rank, 'team': team}
+        for field in STATS_FIELDS[2:]:
+            row[field] = week_data.stats[field][idx].item()
+        table.append(row)
+    return table
+
+def dump_stats(week_data, fmt='json', out=sys.stdout):
+    '''
+    Write the stats table for week_data to out as json or csv.
+    '''
+    table = stats_table(week_data)
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=STATS_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(table)
+    else:
+        json.dump({'week': week_data.week_no, 'teams': table}, out, indent=1)
+        out.write('\n')
+
+def _json_value(value):
+    '''
+    Numpy number as a float, nan as None, as json has no nan.
+    '''
+    value = float(value)
+    return None if np.isnan(value) else value
+
+def _json_matrix(array):
+    '''
+    Array as nested lists with nan as None, as json has no nan.
+    '''
+    return np.where(np.isnan(array), None, np.round(array, 4)).tolist()
+
+def dump_bootstrap(week_data, result, fmt='json', out=sys.stdout):
+    '''
+    Write a rank_bootstrap result for week_data to out as json or csv, one row per team in
+    power rankings order, with the probability each team is ranked ahead of the next team.
+    json also has the full (teams x teams) probability that the row team is ahead of the column team.
+    '''
+    team_index = {team: idx for idx, team in enumerate(result['teams'])}
+    order = [team_index[team] for team in week_data.power_rankings]
+    table = []
+    for rank, idx in enumerate(order, 1):
+        row = {'rank': rank, 'team': result['teams'][idx]}
+        for field in BOOTSTRAP_FIELDS[2:5]:
+            row[field] = result[field][idx].item()
+        row['p_ahead_of_next'] = result['ahead'][idx, order[rank]].item() if rank < len(order) else None
+        table.append(row)
+
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=BOOTSTRAP_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(table)
+    else:
+        output = {'week': week_data.week_no, 'method': result['method'], 'resamples': result['resamples'], 'confidence': result['confidence'], 'teams': table,
+                  'ahead': np.round(result['ahead'][np.ix_(order, order)], 4).tolist()}
+        json.dump(output, out, indent=1)
+        out.write('\n')
+
+def dump_rankers(agreement, fmt='json', out=sys.stdout):
+    '''
+    Write a ranker_analytics week_agreement or season_agreement dict to out as json or csv.
+    Each ranker gets their mean absolute deviation from the consensus and their mean
+    Spearman/Kendall agreement with the other rankers; json also has the full matrices.
+    '''
+    table = []
+    for idx, ranker in enumerate(agreement['rankers']):
+        row = {'ranker': ranker, 'mean_abs_deviation': _json_value(agreement['mean_abs_deviation'][idx])}
+        for method in ('spearman', 'kendall'):
+            others = np.delete(agreement[method][idx], idx)
+            row['mean_' + method] = _json_value(np.nanmean(others)) if (~np.isnan(others)).any() else None
+        table.append(row)
+
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=['ranker', 'mean_abs_deviation', 'mean_spearman', 'mean_kendall'], lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(table)
+    else:
+        output = {'rankers': table, 'spearman': _json_matrix(agreement['spearman']), 'kendall': _json_matrix(agreement['kendall'])}
+        if 'teams' in agreement:
+            output['teams'] = agreement['teams']
+            output['deviation'] = _json_matrix(agreement['deviation'])
+        json.dump(output, out, indent=1)
+        out.write('\n')
@@ -0,0 +1,272 @@
+'''
+League agnostic batch engine for the Reddit power rankings.
+
+Sheets are read by format adapters that turn a csv into (teams, ballots, rankers):
+    rank_rows  - NFL style, one row per rank and one column per ranker, no header.
+    wide_sheet - NBA style, a header row of rankers, a rank column then one column
+                 per ranker, followed by hand calculated summary columns (ignored).
+Each league just names its format, number of teams and team name files (see LEAGUES),
+so many leagues and seasons can be ingested in one batch run, fanned out over a process pool.
+Team names are resolved with the league's team_names.TeamNames, as in the scripts.
+With --sketch each csv is counted into a rank_sketch.RankSketch as its rows are read in
+its worker, and csvs with the same week number (shards of one week) are merged, so memory
+doesn't grow with the number of ballots.
+
+Usage:
+    python rankings_engine.py --workers 0 \\
+        nfl:2016:'../NFL_Power_Rankings_Reddit/csv_data/*.csv' \\
+        nba:2016:'../NBA_Power_Rankings_Reddit/csv_data/*.csv' > archive_stats.json
+
+Python 3.9
+'''
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import glob
+import json
+import os
+import re
+import sys
+
+import ballots
+import rank_sketch
+import rankings_cli
+import team_names
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def read_rank_rows(csv_file, clean_name=str.strip, encode=ballots.encode_rank_rows):
+    '''
+    Format adapter for sheets with one row per rank and one column per ranker (NFL).
+    Returns (teams, ballots, rankers), rankers is None as the sheet doesn't name them.
+    encode turns the rank rows into (teams, ballots), e.g. rank_sketch.sketch_rank_rows
+    gives a RankSketch in place of the ballots.
+    '''
+    with open(csv_file) as open_file:
+        teams, week_ballots = encode(csv.reader(open_file), clean_name=clean_name)
+    return teams, week_ballots, None
+
+def read_wide_sheet(csv_file, clean_name=str.strip, encode=ballots.encode_rank_rows):
+    '''
+    Format adapter for sheets with a header row naming the rankers (NBA).
+    Column 0 is the rank, then one column per ranker up to the first blank header cell;
+    the summary columns after that and any rows without a rank are ignored.
+    Returns (teams, ballots, rankers), encode as read_rank_rows.
+    '''
+    with open(csv_file) as open_file:
+        rows = csv.reader(open_file)
+        header = next(rows)
+        n_rankers = header.index('', 1) - 1 if '' in header[1:] else len(header) - 1
+        rank_rows = (row[1:n_rankers + 1] for row in rows if row and row[0].strip().isdigit())
+        teams, week_ballots = encode(rank_rows, clean_name=clean_name)
+    return teams, week_ballots, header[1:n_rankers + 1]
+
+FORMATS = {'rank_rows': read_rank_rows, 'wide_sheet': read_wide_sheet}
+
+# team_list_file (full team names, see team_names.read_team_list) and aliases_file are None if the league has none.
+League = collections.namedtuple('League', ['format', 'n_teams', 'team_list_file', 'aliases_file'])
+
+LEAGUES = {
+    'nfl': League('rank_rows', 32, None, os.path.join(HERE, '..', 'NFL_Power_Rankings_Reddit', 'nfl_team_aliases.txt')),
+    'nba': League('wide_sheet', 30, os.path.join(HERE, '..', 'NBA_Power_Rankings_Reddit', 'team_list.txt'),
+                  os.path.join(HERE, '..', 'NBA_Power_Rankings_Reddit', 'team_aliases.txt')),
+}
+
+_TEAM_NAMES = {} # league -> TeamNames, built once per process.
+
+def league_team_names(league):
+    '''
+    Returns the team_names.TeamNames of a league (a key of LEAGUES), from its team list and aliases files.
+    '''
+    if league not in _TEAM_NAMES:
+        settings = LEAGUES[league]
+        aliases = []
+        if settings.team_list_file:
+            aliases.append(team_names.team_list_aliases(team_names.read_team_list(settings.team_list_file)))
+        if settings.aliases_file:
+            aliases.append(team_names.read_aliases(settings.aliases_file))
+        _TEAM_NAMES[league] = team_names.TeamNames(team_names.merge_aliases(*aliases))
+    return _TEAM_NAMES[league]
+
+Source = collections.namedtuple('Source', ['league', 'season', 'week_no', 'csv_file'])
+
+class BallotWeek(object):
+    '''
+    One week of ballots for any league.
+    Takes league, season and week_no to identify it, plus teams (list), ballots
+    (rankers x teams array) and optionally rankers (list of names).
+    '''
+    def __init__(self, league, season, week_no, teams, week_ballots, rankers=None):
+        '''
+        Create BallotWeek object and calculate its stats and power rankings.
+        '''
+        self.league = league
+        self.season = season
+        self.week_no = week_no
+        self.teams = teams
+        self.ballots = week_ballots
+        self.rankers = rankers
+
+        self.stats = ballots.ballot_stats(self.ballots)
+        # stable sort by mean, so ties keep the order the teams first appear in the sheet.
+        self.power_rankings = [self.teams[idx] for idx in self.stats['mean'].argsort(kind='stable')]
+
+class SketchWeek(object):
+    '''
+    One week of any league summarized by a rank_sketch.RankSketch (e.g. merged from many shards).
+    Has the same stats and power rankings as a BallotWeek of all the ballots.
+    '''
+    def __init__(self, league, season, week_no, sketch):
+        '''
+        Create SketchWeek object and calculate its stats and power rankings.
+        '''
+        self.league = league
+        self.season = season
+        self.week_no = week_no
+        self.sketch = sketch
+        self.teams = sketch.teams
+
+        self.stats = sketch.stats()
+        self.power_rankings = [self.teams[idx] for idx in self.stats['mean'].argsort(kind='stable')]
+
+def _read_league_sheet(source, encode):
+    '''
+    Read a Source with its league's format adapter and encode, resolving the team names with the
+    league's TeamNames, and check it has the league's number of teams. Returns (teams, ballots, rankers).
+    '''
+    league = LEAGUES[source.league]
+    teams, week_ballots, rankers = FORMATS[league.format](source.csv_file, clean_name=league_team_names(source.league).clean_name, encode=encode)
+    if len(teams) != league.n_teams:
+        raise ValueError('%s has %d teams, expected %d for %s' %(source.csv_file, len(teams), league.n_teams, source.league))
+    return teams, week_ballots, rankers
+
+def read_source(source):
+    '''
+    Read a Source with its league's format adapter and settings.
+    Module level so it can be sent to a worker process. Returns a BallotWeek.
+    '''
+    teams, week_ballots, rankers = _read_league_sheet(source, ballots.encode_rank_rows)
+    return BallotWeek(source.league, source.season, source.week_no, teams, week_ballots, rankers)
+
+def sketch_source(source):
+    '''
+    Read a Source as read_source, counting the rows into a RankSketch as they are read, and return
+    (source, its RankSketch), a few KB however many ballots it has. No ballots array is built.
+    Module level so it can be sent to a worker process.
+    '''
+    _, sketch, _ = _read_league_sheet(source, rank_sketch.sketch_rank_rows)
+    return source, sketch
+
+def glob_sources(league, season, pattern):
+    '''
+    Returns a list of Sources for the csv files matching pattern, sorted by week.
+    The week number is the last number in each file's name, e.g. 2016_R03.csv -> 3.
+    '''
+    sources = []
+    for csv_file in glob.glob(pattern):
+        numbers = re.findall(r'\d+', os.path.basename(csv_file))
+        if not numbers:
+            raise ValueError('No week number in %s' %(csv_file))
+        sources.append(Source(league, season, int(numbers[-1]), csv_file))
+    return sorted(sources, key=lambda source: source.week_no)
+
+def _map_sources(func, sources, workers=None):
+    '''
+    Returns [func(source) for source in sources], in a process pool of workers processes
+    (0 = one per core, None = in this process).
+    '''
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    if workers is None or workers == 1 or len(sources) <= 1:
+        return [func(source) for source in sources]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # lots of small files, so send them in chunks to keep the pickling overhead down.
+        return list(executor.map(func, sources, chunksize=max(1, len(sources) // (workers * 4))))
+
+def _by_season(weeks):
+    '''
+    Returns a dict {(league, season): [week, ...]} sorted by week.
+    '''
+    seasons = collections.defaultdict(list)
+    for week in weeks:
+        seasons[(week.league, week.season)].append(week)
+    for season_weeks in seasons.values():
+        season_weeks.sort(key=lambda week: week.week_no)
+    return dict(seasons)
+
+def ingest(sources, workers=None):
+    '''
+    Read every source, in a process pool of workers processes (0 = one per core,
+    None = in this process). Returns a dict {(league, season): [BallotWeek, ...]} sorted by week.
+    '''
+    return _by_season(_map_sources(read_source, sources, workers))
+
+def ingest_sketches(sources, workers=None):
+    '''
+    Sketch every source, in a process pool as ingest, merging sources with the same league,
+    season and week number. Returns a dict {(league, season): [SketchWeek, ...]} sorted by week.
+    '''
+    sketches = collections.OrderedDict()
+    for source, sketch in _map_sources(sketch_source, sources, workers):
+        key = (source.league, source.season, source.week_no)
+        if key in sketches:
+            sketches[key].merge(sketch)
+        else:
+            sketches[key] = sketch
+    return _by_season(SketchWeek(league, season, week_no, sketch) for (league, season, week_no), sketch in sketches.items())
+
+def get_team_colors(colors_filename):
+    '''
+    Takes a txt filename and returns a dict of tuples of team colors
+    in the format {Team1: (Main Color, Secondary Color, Third Color)}.
+    If a color is missing then a complimentary color is appended.
+
+    # http://teamcolorcodes.com/nfl-team-color-codes/
+    # http://teamcolorcodes.com/nba-team-color-codes/
+    '''
+    team_colors = {}
+    with open(colors_filename) as file_name:
+        team_colors = {item[0]: item[1:] for item in [line.split() for line in file_name]}
+
+    for team, colors in team_colors.items():
+        while len(colors) < 3:
+            try:
+            # http://stackoverflow.com/questions/1664140/js-function-to-calculate-complementary-colour
+            # if missing a color, then add a roughly complimentary color to the main team color.
+            # format by adding # and removing 0x from the start of the hex string.
+                complimentary_color = (int(hex(0xffffff), 16) ^ int('0x'+colors[0][1:], 16))
+                colors.append('#'+hex(complimentary_color)[2:])
+            except:
+                raise ValueError('Problem with color', team, colors)
+
+    return team_colors
+
+def main(argv=None):
+    '''
+    Ingest every league:season:pattern given and print the stats of every week as json.
+    '''
+    parser = argparse.ArgumentParser(description='Batch power rankings stats for many leagues and seasons.')
+    parser.add_argument('sources', nargs='+', help='league:season:csv glob pattern, e.g. nba:2016:csv_data/*.csv')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, 0 = one per core (default: this process)')
+    parser.add_argument('--sketch', action='store_true', help='keep rank counts instead of ballots, merging csvs with the same week number')
+    args = parser.parse_args(argv)
+
+    sources = []
+    for spec in args.sources:
+        league, season, pattern = spec.split(':', 2)
+        if league not in LEAGUES:
+            parser.error('unknown league %s, expected one of %s' %(league, ', '.join(sorted(LEAGUES))))
+        sources.extend(glob_sources(league, season, pattern))
+
+    seasons = ingest_sketches(sources, args.workers) if args.sketch else ingest(sources, args.workers)
+    output = [{'league': league, 'season': season,
+               'weeks': [{'week': week.week_no, 'teams': rankings_cli.stats_table(week)} for week in weeks]}
+              for (league, season), weeks in sorted(seasons.items())]
+    json.dump(output, sys.stdout, indent=1)
+    sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
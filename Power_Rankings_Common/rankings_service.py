@@ -0,0 +1,303 @@
+'''
+Local HTTP service for the Reddit power rankings.
+
+Serves the rankings and stats as json and the graphs as png, so dashboards don't need
+to re-run the scripts and read the png folders. Built on asyncio streams (no web
+framework needed):
+
+* graphs are rendered in a process pool (headless Agg), never on the event loop,
+* csvs are read in one background thread, so the season store is only written by one thread,
+* encoded json and png responses are kept in an LRU cache limited by total bytes, keyed
+  by the size and modified time of the csvs and team name files they use, so a changed
+  file is picked up (the files are checked off the event loop),
+* loaded Weeks are kept in a second LRU cache limited by count,
+* identical requests arriving while a response is being made share the one result.
+
+GET endpoints (week defaults to the current week, method to mean):
+    /rankings?week=12&method=schulze
+    /stats?week=12
+    /graph/<kind>.png?week=12 e.g. boxplot, heatmap, season_heatmap (and scatter for the NFL)
+    /cache - cache size and hit counts
+
+Usage (from the script's directory):
+    python nfl_power_rankings.py serve --port 8000 --workers 2
+
+Python 3.9
+'''
+
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import urllib.parse
+
+import parallel_render
+import rank_aggregation
+import rankings_cli
+import season_store
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+class HTTPError(Exception):
+    '''
+    Error answered with an http status, e.g. HTTPError(404, 'no such graph').
+    '''
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+class LRUCache(object):
+    '''
+    LRUCache object, least recently used values are evicted once the values' total
+    size is over max_bytes. size(value) defaults to len, e.g. bytes.
+    '''
+    def __init__(self, max_bytes, size=len):
+        '''
+        Create an empty LRUCache.
+        '''
+        self.max_bytes = max_bytes
+        self.size = size
+        self.values = collections.OrderedDict()
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        '''
+        Returns the value for key (marking it most recently used), or None.
+        '''
+        value = self.values.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        '''
+        Add value for key, evicting the least recently used values to make room.
+        Values bigger than the whole cache aren't kept.
+        '''
+        if key in self.values:
+            self.n_bytes -= self.size(self.values.pop(key))
+        if self.size(value) > self.max_bytes:
+            return
+        self.values[key] = value
+        self.n_bytes += self.size(value)
+        while self.n_bytes > self.max_bytes:
+            _, evicted = self.values.popitem(last=False)
+            self.n_bytes -= self.size(evicted)
+            self.evictions += 1
+
+    def info(self):
+        '''
+        Returns a dict of the cache size and counts.
+        '''
+        return {'entries': len(self.values), 'bytes': self.n_bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class RankingsService(object):
+    '''
+    RankingsService object.
+    Takes load_week(week_no, method), returning a Week (called in a background thread),
+    render_png((kind, weeks)), a module level function returning png bytes (called in a worker process),
+    csv_files (list, csv_files[week_no - 1] is the week's csv), cur_week (default week),
+    graphs, a dict {kind: True if the graph is of every week up to the week, False for one week},
+    workers (render processes, 0 = one per core), cache_bytes (size of the response cache),
+    name_files (the team colors, aliases or team list files every response depends on)
+    and max_weeks (how many loaded Weeks are kept).
+    '''
+    def __init__(self, load_week, render_png, csv_files, cur_week, graphs, workers=1, cache_bytes=64 * 2 ** 20, name_files=(), max_weeks=64):
+        '''
+        Create RankingsService object. The pools are started by serve.
+        '''
+        self.load_week = load_week
+        self.render_png = render_png
+        self.csv_files = csv_files
+        self.cur_week = cur_week
+        self.graphs = graphs
+        self.workers = workers or os.cpu_count() or 1
+        self.name_files = list(name_files)
+        self.cache = LRUCache(cache_bytes)
+        self.weeks = LRUCache(max_weeks, size=lambda cached: 1) # (week_no, method) -> (sources, Week)
+        self.pending = {} # response key -> task making it
+        self.render_pool = None
+        self.load_pool = None
+
+    def _sources(self, week_nos):
+        '''
+        Returns the sources (size and modified time) of the csvs of week_nos followed by the name files,
+        so cache keys change with the files. Stats the files, so not called on the event loop.
+        '''
+        files = [self.csv_files[week_no - 1] for week_no in week_nos] + self.name_files
+        return tuple((source['mtime'], source['size']) for source in map(season_store.csv_source, files))
+
+    async def sources(self, week_nos):
+        '''
+        Returns _sources(week_nos), run in the default thread pool so a slow load doesn't hold up cache hits.
+        '''
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._sources, week_nos)
+
+    def _load_weeks(self, week_nos, method):
+        '''
+        Returns the Weeks for week_nos, loading the ones that are new or whose csv or name files changed.
+        Runs in the load thread.
+        '''
+        sources = self._sources(week_nos)
+        name_sources = sources[len(week_nos):]
+        weeks = []
+        for week_no, source in zip(week_nos, sources):
+            cached = self.weeks.get((week_no, method))
+            if cached is None or cached[0] != (source, name_sources):
+                cached = ((source, name_sources), self.load_week(week_no, method))
+                self.weeks.put((week_no, method), cached)
+            weeks.append(cached[1])
+        return weeks
+
+    async def _cached(self, key, make):
+        '''
+        Returns the cached response for key, or awaits make() (a coroutine function returning bytes)
+        once however many requests for key are waiting, and caches it.
+        '''
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        task = self.pending.get(key)
+        if task is None:
+            task = self.pending[key] = asyncio.ensure_future(make())
+            task.add_done_callback(lambda done: self.pending.pop(key, None))
+        # shield, so a client hanging up doesn't cancel the work for the others waiting.
+        value = await asyncio.shield(task)
+        self.cache.put(key, value)
+        return value
+
+    async def weeks_data(self, week_nos, method):
+        '''
+        Returns the Weeks for week_nos, loaded in the load thread.
+        '''
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.load_pool, self._load_weeks, week_nos, method)
+
+    def _params(self, query):
+        '''
+        Returns (week_no, method) from the query string dict, checked.
+        '''
+        try:
+            week_no = int(query.get('week', [self.cur_week])[0])
+        except ValueError:
+            raise HTTPError(400, 'week must be a number')
+        if not 1 <= week_no <= min(self.cur_week, len(self.csv_files)):
+            raise HTTPError(400, 'week must be 1 to %d' %(min(self.cur_week, len(self.csv_files))))
+        method = query.get('method', ['mean'])[0]
+        if method not in rank_aggregation.METHODS:
+            raise HTTPError(400, 'method must be one of %s' %(', '.join(rank_aggregation.METHODS)))
+        return week_no, method
+
+    async def rankings(self, query):
+        week_no, method = self._params(query)
+
+        async def make():
+            week_data = (await self.weeks_data([week_no], method))[0]
+            return json.dumps({'week': week_no, 'method': method, 'rankings': week_data.power_rankings}).encode()
+        return await self._cached(('rankings', week_no, method, await self.sources([week_no])), make)
+
+    async def stats(self, query):
+        week_no, method = self._params(query)
+
+        async def make():
+            week_data = (await self.weeks_data([week_no], method))[0]
+            return json.dumps({'week': week_no, 'method': method, 'teams': rankings_cli.stats_table(week_data)}).encode()
+        return await self._cached(('stats', week_no, method, await self.sources([week_no])), make)
+
+    async def graph(self, kind, query):
+        if kind not in self.graphs:
+            raise HTTPError(404, 'no graph %s, expected one of %s' %(kind, ', '.join(sorted(self.graphs))))
+        week_no, method = self._params(query)
+        week_nos = list(range(1, week_no + 1)) if self.graphs[kind] else [week_no]
+
+        async def make():
+            weeks = await self.weeks_data(week_nos, method)
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.render_pool, self.render_png, (kind, weeks))
+        return await self._cached(('graph', kind, week_no, method, await self.sources(week_nos)), make)
+
+    async def respond(self, method, target):
+        '''
+        Returns (status, content type, body bytes) for a request.
+        '''
+        if method != 'GET':
+            raise HTTPError(405, 'only GET is supported')
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        path = url.path.rstrip('/')
+        if path == '/rankings':
+            return 200, 'application/json', await self.rankings(query)
+        if path == '/stats':
+            return 200, 'application/json', await self.stats(query)
+        if path == '/cache':
+            return 200, 'application/json', json.dumps(dict(self.cache.info(), weeks=self.weeks.info())).encode()
+        if path.startswith('/graph/') and path.endswith('.png'):
+            return 200, 'image/png', await self.graph(path[len('/graph/'):-len('.png')], query)
+        raise HTTPError(404, 'unknown path %s' %(path))
+
+    async def handle(self, reader, writer):
+        '''
+        Serve the requests of one connection (kept alive for HTTP/1.1 unless the client closes it).
+        '''
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    status, content_type, body = await self.respond(method, target)
+                except HTTPError as error:
+                    status, content_type, body = error.status, 'application/json', json.dumps({'error': str(error)}).encode()
+                except Exception as error:
+                    status, content_type, body = 500, 'application/json', json.dumps({'error': repr(error)}).encode()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                head = 'HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n' \
+                       %(status, STATUS_TEXT[status], content_type, len(body), 'keep-alive' if keep_alive else 'close')
+                writer.write(head.encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def serve(self, host='127.0.0.1', port=8000):
+        '''
+        Start the pools and serve until interrupted.
+        '''
+        self.render_pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=parallel_render.init_worker)
+        self.load_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(asyncio.start_server(self.handle, host, port))
+        print('Serving on http://%s:%d' %(host, port))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            self.render_pool.shutdown()
+            self.load_pool.shutdown()
+            loop.close()
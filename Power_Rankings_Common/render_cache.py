@@ -0,0 +1,112 @@
+'''
+Content addressed render cache for the Reddit power rankings graphs.
+
+Each graph gets a key, a hash of everything it is drawn from (the contents of its
+input files plus extra values such as the graph type and a style version). The key
+of every saved graph is kept in a json manifest, so a graph whose key and file are
+unchanged since the last run does not need to be rendered again.
+
+Python 3.9
+'''
+
+import hashlib
+import json
+import os
+
+import parallel_render
+
+class RenderCache(object):
+    '''
+    RenderCache object.
+    Takes the filename of the json manifest, in the form {graph filename: key}.
+    '''
+    def __init__(self, manifest_file):
+        '''
+        Create RenderCache object, loading the manifest if it exists.
+        An unreadable manifest (e.g. edited by hand) is ignored, so every graph is rendered again.
+        '''
+        self.manifest_file = manifest_file
+        self.manifest = {}
+        if os.path.exists(manifest_file):
+            try:
+                with open(manifest_file) as open_file:
+                    manifest = json.load(open_file)
+            except ValueError:
+                manifest = None
+            if isinstance(manifest, dict):
+                self.manifest = manifest
+
+        # file path -> ((mtime, size), digest), so each input file is only hashed once per run.
+        self.file_digests = {}
+
+    def file_digest(self, path):
+        '''
+        Returns the sha1 hex digest of the contents of the file path.
+        '''
+        stat = os.stat(path)
+        cached = self.file_digests.get(path)
+        if cached is None or cached[0] != (stat.st_mtime, stat.st_size):
+            with open(path, 'rb') as open_file:
+                cached = ((stat.st_mtime, stat.st_size), hashlib.sha1(open_file.read()).hexdigest())
+            self.file_digests[path] = cached
+        return cached[1]
+
+    def key(self, files, *extra):
+        '''
+        Returns the key for a graph drawn from the list of input files and any extra values (e.g. style version).
+        '''
+        key_hash = hashlib.sha1()
+        for value in extra:
+            key_hash.update(repr(value).encode() + b'\0')
+        for path in files:
+            key_hash.update(self.file_digest(path).encode())
+        return key_hash.hexdigest()
+
+    def is_fresh(self, filename, key):
+        '''
+        True if filename was saved with this key and still exists, i.e. it doesn't need rendering.
+        '''
+        return self.manifest.get(filename) == key and os.path.exists(filename)
+
+    def record(self, filename, key):
+        '''
+        Record that filename has been saved with key.
+        '''
+        self.manifest[filename] = key
+
+    def save(self):
+        '''
+        Write the manifest to disk (via a temp file so it's never half written).
+        '''
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w') as open_file:
+            json.dump(self.manifest, open_file, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+def render_stale(cache, render_job, jobs, job_outputs, workers=None):
+    '''
+    Render only the jobs with at least one output that isn't fresh in cache, then record them.
+    job_outputs(job) returns a list of (filename, key) saved by job.
+    Each job sent to render_job is (job, set of its fresh filenames), so jobs with several
+    outputs can skip saving the ones that are up to date.
+    If cache is None every job is rendered.
+    Returns the sorted list of saved filenames.
+    '''
+    if cache is None:
+        return parallel_render.render_all(render_job, [(job, frozenset()) for job in jobs], workers)
+
+    keys = {}
+    stale_jobs = []
+    for job in jobs:
+        outputs = job_outputs(job)
+        fresh = frozenset(filename for filename, key in outputs if cache.is_fresh(filename, key))
+        if len(fresh) < len(outputs):
+            stale_jobs.append((job, fresh))
+            keys.update(outputs)
+
+    filenames = parallel_render.render_all(render_job, stale_jobs, workers)
+    for filename in filenames:
+        cache.record(filename, keys[filename])
+    cache.save()
+
+    return filenames
@@ -0,0 +1,191 @@
+'''
+Memory-mapped season store for the Reddit power rankings.
+
+A season is kept on disk as one (weeks x rankers x teams) array file (ranks.bin)
+plus a small json header (header.json) holding the team and ranker dictionaries.
+The array file is opened with np.memmap so loading is near instant no matter how
+many weeks are stored, and new weeks are appended to the end of the file without
+rewriting the old ones. When a week brings more rankers (or teams) than a slice holds,
+the weeks are copied once into a new data file with slices twice the size, which the
+header is then switched to, so a season or archive can keep growing.
+
+Python 3.9
+'''
+
+import json
+import os
+
+import numpy as np
+
+import ballots
+
+HEADER_FILE = 'header.json'
+DATA_FILE = 'ranks.bin'
+STORE_VERSION = 1
+
+class SeasonStore(object):
+    '''
+    SeasonStore object.
+    Takes a directory path, created if it does not exist.
+    max_rankers and max_teams are the starting size of each week's slice, only used
+    when creating a new store; the slices grow when more are needed.
+    '''
+    def __init__(self, path, max_rankers=1024, max_teams=64):
+        '''
+        Open (or create) the store in the directory path.
+        '''
+        self.path = path
+        self.header_file = os.path.join(path, HEADER_FILE)
+
+        if os.path.exists(self.header_file):
+            with open(self.header_file) as header_file:
+                self.header = json.load(header_file)
+            if self.header['version'] != STORE_VERSION:
+                raise ValueError('Unsupported season store version %s in %s' %(self.header['version'], path))
+            # stores made before the data file could grow only have DATA_FILE.
+            self.header.setdefault('data_file', DATA_FILE)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.header = {'version': STORE_VERSION, 'dtype': np.dtype(ballots.RANK_DTYPE).name,
+                           'max_rankers': max_rankers, 'max_teams': max_teams, 'data_file': DATA_FILE,
+                           'teams': [], 'rankers': [], 'weeks': [], 'week_teams': {}, 'sources': {}}
+            open(self.data_file, 'ab').close()
+            self._write_header()
+
+        self.team_ids = {team: idx for idx, team in enumerate(self.header['teams'])}
+        self.ranker_ids = {ranker: idx for idx, ranker in enumerate(self.header['rankers'])}
+        self.cube = self._open_cube()
+
+    @property
+    def data_file(self):
+        '''
+        Path of the current data file.
+        '''
+        return os.path.join(self.path, self.header['data_file'])
+
+    @property
+    def weeks(self):
+        '''
+        List of the week numbers in the store, in the order they were appended.
+        '''
+        return self.header['weeks']
+
+    def _slice_shape(self):
+        return (self.header['max_rankers'], self.header['max_teams'])
+
+    def _open_cube(self):
+        '''
+        Memory map the (weeks x rankers x teams) array. Only the weeks listed in the header
+        are mapped, so a half written append is ignored.
+        '''
+        n_weeks = len(self.header['weeks'])
+        if n_weeks == 0:
+            return np.zeros((0,) + self._slice_shape(), dtype=self.header['dtype'])
+        return np.memmap(self.data_file, dtype=self.header['dtype'], mode='r', shape=(n_weeks,) + self._slice_shape())
+
+    def _write_header(self):
+        '''
+        Write the header to a temp file then rename it, so the header on disk is never half written.
+        '''
+        tmp_file = self.header_file + '.tmp'
+        with open(tmp_file, 'w') as header_file:
+            json.dump(self.header, header_file)
+        os.replace(tmp_file, self.header_file)
+
+    def _intern(self, names, ids, key):
+        '''
+        Map each name to its store id, adding new names to the header dictionary.
+        '''
+        result = []
+        for name in names:
+            if name not in ids:
+                ids[name] = len(self.header[key])
+                self.header[key].append(name)
+            result.append(ids[name])
+        return np.asarray(result, dtype=np.intp)
+
+    def _grow(self, max_rankers, max_teams):
+        '''
+        Copy every week into a new data file with (max_rankers x max_teams) slices, then switch the header to it.
+        The old file is only removed once the new header is written, so a crash leaves a readable store.
+        '''
+        generation = self.header.get('generation', 0) + 1
+        data_name = 'ranks.%d.bin' %(generation)
+        old_file = self.data_file
+        old_rankers, old_teams = self._slice_shape()
+
+        block = np.full((max_rankers, max_teams), ballots.MISSING, dtype=self.header['dtype'])
+        with open(os.path.join(self.path, data_name), 'wb') as data_file:
+            for week_idx in range(len(self.header['weeks'])):
+                block[:old_rankers, :old_teams] = self.cube[week_idx]
+                data_file.write(block.tobytes())
+
+        self.header.update({'max_rankers': max_rankers, 'max_teams': max_teams, 'data_file': data_name, 'generation': generation})
+        self._write_header()
+        self.cube = self._open_cube()
+        os.remove(old_file)
+
+    def source(self, week_no):
+        '''
+        Returns the source info (any json data, e.g. csv file name and mtime) recorded when week_no was stored.
+        '''
+        return self.header['sources'].get(str(week_no))
+
+    def append_week(self, week_no, teams, week_ballots, rankers=None, source=None):
+        '''
+        Store a week. teams is a list of team names, week_ballots a (rankers x teams) array of ranks
+        and rankers an optional list of ranker names (defaults to the ballot row number).
+        A new week is appended to the end of the data file, an existing week is overwritten in place.
+        '''
+        if rankers is None:
+            rankers = [str(idx) for idx in range(week_ballots.shape[0])]
+        assert len(rankers) == week_ballots.shape[0] and len(teams) == week_ballots.shape[1], 'Names and ballots differ.'
+
+        team_idx = self._intern(teams, self.team_ids, 'teams')
+        ranker_idx = self._intern(rankers, self.ranker_ids, 'rankers')
+
+        max_rankers, max_teams = self._slice_shape()
+        if len(self.header['rankers']) > max_rankers or len(self.header['teams']) > max_teams:
+            while max_rankers < len(self.header['rankers']):
+                max_rankers *= 2
+            while max_teams < len(self.header['teams']):
+                max_teams *= 2
+            self._grow(max_rankers, max_teams)
+
+        block = np.full(self._slice_shape(), ballots.MISSING, dtype=self.header['dtype'])
+        block[np.ix_(ranker_idx, team_idx)] = week_ballots
+
+        if week_no in self.header['weeks']:
+            cube = np.memmap(self.data_file, dtype=self.header['dtype'], mode='r+', shape=self.cube.shape)
+            cube[self.header['weeks'].index(week_no)] = block
+            cube.flush()
+            del cube
+        else:
+            # data first, then the header, so a crash in between leaves the store as it was.
+            with open(self.data_file, 'r+b') as data_file:
+                data_file.seek(len(self.header['weeks']) * block.nbytes)
+                data_file.write(block.tobytes())
+            self.header['weeks'].append(week_no)
+
+        # keep the week's own team order so ties in the rankings break the same way as the csv.
+        self.header['week_teams'][str(week_no)] = team_idx.tolist()
+        self.header['sources'][str(week_no)] = source
+        self._write_header()
+        self.cube = self._open_cube()
+
+    def week_ballots(self, week_no):
+        '''
+        Returns (teams, ballots) for week_no, in the same form as ballots.encode_rank_rows.
+        Only the rankers that appear in that week are included, and the teams are in the order they were stored.
+        '''
+        block = self.cube[self.header['weeks'].index(week_no), :len(self.header['rankers'])]
+        team_idx = self.header['week_teams'][str(week_no)]
+        week_ballots = block[(block != ballots.MISSING).any(axis=1)][:, team_idx]
+        return [self.header['teams'][idx] for idx in team_idx], week_ballots
+
+def csv_source(csv_file):
+    '''
+    Returns the source info used to tell if a csv has changed since it was imported.
+    '''
+    stat = os.stat(csv_file)
+    return {'file': csv_file, 'mtime': stat.st_mtime, 'size': stat.st_size}
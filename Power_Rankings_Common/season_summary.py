@@ -0,0 +1,169 @@
+'''
+Materialized weekly summary table for the Reddit power rankings.
+
+For each team in a week: count, mean, std, median, quartiles, whisker bounds and the
+outliers (kept as distinct rank + count, so they stay small however many ballots there
+are). A summary is calculated once per week in one vectorized pass, saved to disk, and
+the graphs are drawn from it (boxplots via Axes.bxp) rather than from the raw ballots.
+
+Python 3.9
+'''
+
+import json
+import os
+
+import numpy as np
+
+import ballots
+import season_store
+
+STAT_FIELDS = ['count', 'mean', 'std', 'median', 'q1', 'q3', 'whislo', 'whishi']
+
+class WeekSummary(object):
+    '''
+    WeekSummary object.
+    Takes teams (list), stats (dict of arrays ordered like teams, keys STAT_FIELDS) and fliers,
+    a tuple of arrays (team index, rank, count) sorted by team index then rank.
+    '''
+    def __init__(self, teams, stats, fliers):
+        '''
+        Create WeekSummary object.
+        '''
+        self.teams = list(teams)
+        self.stats = stats
+        self.fliers = fliers
+        self.team_index = {team: idx for idx, team in enumerate(self.teams)}
+
+    def team_stats(self, field, teams):
+        '''
+        Returns an array of one stat (e.g. 'mean') for each team in teams, in the same order.
+        '''
+        return self.stats[field][[self.team_index[team] for team in teams]]
+
+    def team_fliers(self, team, max_fliers=None):
+        '''
+        Returns the outlier ranks of team, repeated by how many rankers gave them.
+        If there are more than max_fliers, a random sample (the same each time) of max_fliers of them.
+        '''
+        flier_team, flier_rank, flier_count = self.fliers
+        idx = self.team_index[team]
+        start, end = np.searchsorted(flier_team, [idx, idx + 1])
+        counts = flier_count[start:end]
+        if max_fliers is not None and counts.sum() > max_fliers:
+            counts = np.random.default_rng(idx).multivariate_hypergeometric(counts, max_fliers)
+        return np.repeat(flier_rank[start:end], counts)
+
+    def bxp_stats(self, teams, max_fliers=None):
+        '''
+        Returns a list of dicts, one per team in teams, in the form Axes.bxp takes,
+        with at most max_fliers outliers per team (default all).
+        '''
+        return [{'med': self.stats['median'][idx], 'q1': self.stats['q1'][idx], 'q3': self.stats['q3'][idx],
+                 'whislo': self.stats['whislo'][idx], 'whishi': self.stats['whishi'][idx],
+                 'mean': self.stats['mean'][idx], 'fliers': self.team_fliers(team, max_fliers), 'label': team}
+                for team, idx in ((team, self.team_index[team]) for team in teams)]
+
+def summarize(teams, week_ballots, whis=1.5):
+    '''
+    Takes teams (list) and a (rankers x teams) ballots array and returns a WeekSummary.
+    Whiskers follow matplotlib's boxplot: the furthest ranks within whis * IQR of the box,
+    anything beyond them is an outlier.
+    '''
+    stats = ballots.ballot_stats(week_ballots)
+    ranked = week_ballots != ballots.MISSING
+    ranks = np.where(ranked, week_ballots, np.nan)
+
+    iqr = stats['q3'] - stats['q1']
+    with np.errstate(invalid='ignore'):
+        inside = (ranks >= stats['q1'] - whis * iqr) & (ranks <= stats['q3'] + whis * iqr)
+    # a whisker never goes inside the box (e.g. nothing within the whisker range).
+    whislo = np.minimum(np.where(inside, ranks, np.inf).min(axis=0), stats['q1'])
+    whishi = np.maximum(np.where(inside, ranks, -np.inf).max(axis=0), stats['q3'])
+    stats['whislo'] = whislo
+    stats['whishi'] = whishi
+
+    # outliers as distinct (team, rank) with counts, sorted by team then rank.
+    with np.errstate(invalid='ignore'):
+        outside = ranked & ((ranks < whislo) | (ranks > whishi))
+    _, team_idx = np.nonzero(outside)
+    max_rank = int(week_ballots.max()) + 1 if week_ballots.size else 1
+    keys, counts = np.unique(team_idx * max_rank + week_ballots[outside].astype(np.int64), return_counts=True)
+    fliers = (keys // max_rank, keys % max_rank, counts)
+
+    return WeekSummary(teams, stats, fliers)
+
+class SummaryTable(object):
+    '''
+    SummaryTable object, the saved WeekSummary of every week.
+    Takes a directory path (created if needed), each week is saved as weekNN.npz.
+    Optionally takes name_files, the files the team names are resolved with (e.g. team aliases),
+    which are part of every summary's source, so editing one recalculates the summaries.
+    '''
+    def __init__(self, path, name_files=()):
+        '''
+        Create SummaryTable object.
+        '''
+        self.path = path
+        self.name_sources = [season_store.csv_source(name_file) for name_file in name_files]
+        os.makedirs(path, exist_ok=True)
+
+    def _full_source(self, source):
+        '''
+        The source saved with a summary: the week's own source plus the name files.
+        '''
+        return {'source': source, 'names': self.name_sources}
+
+    def week_file(self, week_no):
+        '''
+        Filename of the saved summary for week_no.
+        '''
+        return os.path.join(self.path, 'week%s.npz' %(str(week_no).rjust(2, '0')))
+
+    def load(self, week_no, source=None):
+        '''
+        Returns the saved WeekSummary for week_no, or None if there isn't one or it was saved from a
+        different source (any json data, e.g. season_store.csv_source of the csv).
+        '''
+        week_file = self.week_file(week_no)
+        if not os.path.exists(week_file):
+            return None
+        with np.load(week_file, allow_pickle=False) as data:
+            if json.loads(str(data['source'])) != self._full_source(source):
+                return None
+            stats = {field: data[field] for field in STAT_FIELDS}
+            return WeekSummary(data['teams'].tolist(), stats, (data['flier_team'], data['flier_rank'], data['flier_count']))
+
+    def save(self, week_no, summary, source=None):
+        '''
+        Save a WeekSummary for week_no, with its source info.
+        '''
+        flier_team, flier_rank, flier_count = summary.fliers
+        tmp_file = self.week_file(week_no) + '.tmp.npz'
+        np.savez(tmp_file, teams=np.array(summary.teams), source=json.dumps(self._full_source(source)),
+                 flier_team=flier_team, flier_rank=flier_rank, flier_count=flier_count,
+                 **{field: summary.stats[field] for field in STAT_FIELDS})
+        os.replace(tmp_file, self.week_file(week_no))
+
+    def get(self, week_no, source, teams, week_ballots):
+        '''
+        Returns the saved WeekSummary for week_no if it is up to date with source, otherwise
+        summarizes the ballots and saves the result.
+        '''
+        summary = self.load(week_no, source)
+        if summary is None:
+            summary = summarize(teams, week_ballots)
+            self.save(week_no, summary, source)
+        return summary
+
+def season_table(summaries, teams, fields=STAT_FIELDS):
+    '''
+    Takes a list of WeekSummary (one per week) and returns a dict {field: (weeks x teams) array}
+    with the teams in the order of teams (nan if a team is missing from a week).
+    '''
+    table = {field: np.full((len(summaries), len(teams)), np.nan) for field in fields}
+    for week_idx, summary in enumerate(summaries):
+        present = [idx for idx, team in enumerate(teams) if team in summary.team_index]
+        present_teams = [teams[idx] for idx in present]
+        for field in fields:
+            table[field][week_idx, present] = summary.team_stats(field, present_teams)
+    return table
@@ -0,0 +1,149 @@
+'''
+Team name canonicalization for the Reddit power rankings.
+
+Rankers don't all write team names the same way: 'Patriots', 'patriots ', 'NE',
+'[](/NE)' (Reddit flair), 'New England Patriots', 'Patriats'. A TeamNames is built
+once per league from the canonical names and their aliases, and resolves any of
+these to the canonical name and its integer id:
+
+* every alias is normalized (lower case, letters and digits only) into one dict, so a
+  lookup is one normalization and one dict lookup,
+* the flair codes and single words of the cell are tried next ('Patriots (11-1)'), used
+  only if every one that matches names the same team ('LA Chargers' is not the Rams),
+* then a fuzzy match against the known names for typos, cached per distinct cell.
+
+Cells that still don't resolve give None, so a whole sheet's bad cells can be reported
+at once (see ballots.encode_rank_rows).
+
+Python 3.9
+'''
+
+import collections
+import csv
+import difflib
+import re
+import sys
+
+FLAIR_RE = re.compile(r'\[[^\]]*\]\(/([^)\s]*)\)')
+NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+WORD_RE = re.compile(r'[0-9A-Za-z]+')
+
+# fuzzy matches must be at least this similar (difflib ratio), and only names this long
+# are matched fuzzily, as short abbreviations are too close to each other.
+FUZZY_CUTOFF = 0.8
+FUZZY_MIN_LENGTH = 4
+
+def normalize(name):
+    '''
+    Returns the lookup key for a name, e.g. ' New England  Patriots' -> 'newenglandpatriots'.
+    '''
+    return NON_ALNUM_RE.sub('', name.lower())
+
+def read_aliases(filename):
+    '''
+    Reads an alias file, one team per line: canonical name, then its aliases, comma separated.
+    Returns an OrderedDict {canonical name: [alias, ...]}.
+    '''
+    aliases = collections.OrderedDict()
+    with open(filename) as open_file:
+        for row in csv.reader(open_file):
+            row = [cell.strip() for cell in row if cell.strip()]
+            if row:
+                aliases.setdefault(row[0], []).extend(row[1:])
+    return aliases
+
+def read_team_list(filename):
+    '''
+    Reads a list of full team names, one per line as city then nickname (e.g. 'Golden State Warriors').
+    Returns a list of (canonical name, city, nickname), where the canonical name is the city, or the
+    full name for teams sharing a city (e.g. 'LA Clippers' and 'LA Lakers'), as the sheets use.
+    '''
+    with open(filename) as open_file:
+        names = [line.strip().rsplit(None, 1) for line in open_file if line.strip()]
+    city_counts = collections.Counter(city for city, nickname in names)
+    return [(city if city_counts[city] == 1 else city + ' ' + nickname, city, nickname) for city, nickname in names]
+
+def team_list_aliases(team_list):
+    '''
+    Returns an OrderedDict {canonical name: [full name, city, nickname]} from read_team_list output.
+    '''
+    return collections.OrderedDict((canonical, [city + ' ' + nickname, city, nickname]) for canonical, city, nickname in team_list)
+
+def merge_aliases(*alias_dicts):
+    '''
+    Returns one OrderedDict of aliases from several, e.g. team_list_aliases and read_aliases.
+    '''
+    merged = collections.OrderedDict()
+    for aliases in alias_dicts:
+        for team, team_aliases in aliases.items():
+            merged.setdefault(team, []).extend(team_aliases)
+    return merged
+
+class TeamNames(object):
+    '''
+    Resolves any alias of a league's teams to the canonical name and id.
+    Takes aliases, a dict (ordered) of {canonical name: [alias, ...]}; ids are in the same order.
+    An alias shared by two teams (e.g. a city with two teams) is ambiguous, so it isn't used.
+    '''
+    def __init__(self, aliases):
+        self.teams = [sys.intern(team) for team in aliases]
+        self.ids = {team: team_id for team_id, team in enumerate(self.teams)}
+
+        keys = {}
+        ambiguous = set()
+        for team, team_aliases in aliases.items():
+            for alias in [team] + list(team_aliases):
+                key = normalize(alias)
+                if key and keys.setdefault(key, self.ids[team]) != self.ids[team]:
+                    ambiguous.add(key)
+        for key in ambiguous:
+            # a canonical name always wins over another team's alias.
+            owner = [team_id for team_id, team in enumerate(self.teams) if normalize(team) == key]
+            if owner:
+                keys[key] = owner[0]
+            else:
+                del keys[key]
+        self.keys = keys
+        self.ambiguous = sorted(ambiguous)
+        self.fuzzy_keys = [key for key in keys if len(key) >= FUZZY_MIN_LENGTH]
+
+        self.cells = {} # raw cell -> team id (None if unresolved), so each distinct cell is resolved once.
+
+    def _lookup(self, cell):
+        '''
+        Resolve a raw cell without the cell cache. Returns a team id or None.
+        '''
+        team_id = self.keys.get(normalize(cell))
+        if team_id is not None:
+            return team_id
+
+        # flair codes and words, e.g. '[](/NE) Patriots' or 'Patriots (11-1)', if they all agree.
+        parts = FLAIR_RE.findall(cell) + WORD_RE.findall(FLAIR_RE.sub(' ', cell))
+        part_ids = set(self.keys.get(normalize(part)) for part in parts) - {None}
+        if len(part_ids) == 1:
+            return part_ids.pop()
+
+        key = normalize(FLAIR_RE.sub(' ', cell))
+        if len(key) >= FUZZY_MIN_LENGTH:
+            matches = difflib.get_close_matches(key, self.fuzzy_keys, n=1, cutoff=FUZZY_CUTOFF)
+            if matches:
+                return self.keys[matches[0]]
+        return None
+
+    def team_id(self, cell):
+        '''
+        Returns the id of the team named in cell (str), or None if it can't be resolved.
+        '''
+        try:
+            return self.cells[cell]
+        except KeyError:
+            team_id = self.cells[cell] = self._lookup(cell)
+            return team_id
+
+    def clean_name(self, cell):
+        '''
+        Returns the canonical name of the team in cell, or None if it can't be resolved.
+        Can be used as clean_name for ballots.encode_rank_rows, which reports every unresolved cell at once.
+        '''
+        team_id = self.team_id(cell)
+        return None if team_id is None else self.teams[team_id]
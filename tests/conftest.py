@@ -0,0 +1,87 @@
+'''
+Shared setup for the tests, which check the vectorized code against plain Python brute force.
+
+Run from the top of the repo:
+    python -m pytest tests
+
+Python 3.9
+'''
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+for directory in ('Power_Rankings_Common', 'Misc_Code', 'Benchmarks'):
+    sys.path.insert(0, os.path.join(HERE, '..', directory))
+
+import synthetic_ballots
+
+# (rankers, teams, share of missing rankers, share of single missing rankings, seed)
+BALLOT_CASES = [
+    (1, 5, 0.0, 0.0, 0),
+    (2, 4, 0.0, 0.3, 1),
+    (7, 6, 0.0, 0.0, 2),
+    (40, 32, 0.2, 0.05, 3),
+    (25, 30, 0.1, 0.2, 4),
+    (60, 8, 0.0, 0.1, 5),
+]
+
+def make_ballots(n_rankers, n_teams, missing_rate=0.0, hole_rate=0.0, seed=0):
+    '''
+    Returns (teams, ballots), synthetic_ballots with whole rankers missing (missing_rate) and
+    single rankings missing (hole_rate), e.g. a ranker who left a team off their ballot.
+    '''
+    teams = synthetic_ballots.team_names(n_teams)
+    week_ballots = synthetic_ballots.generate_ballots(n_rankers, n_teams, missing_rate, seed=seed)
+    rng = np.random.default_rng(seed + 1000)
+    week_ballots[rng.random(week_ballots.shape) < hole_rate] = 0
+    return teams, week_ballots
+
+@pytest.fixture(params=BALLOT_CASES, ids=lambda case: '%dx%d' %(case[0], case[1]))
+def week(request):
+    '''
+    (teams, ballots) for each of BALLOT_CASES.
+    '''
+    return make_ballots(*request.param)
+
+def rank_rows(teams, week_ballots, missing_cell='--'):
+    '''
+    Returns the sheet rows of ballots, rows[rank - 1][ranker] = team name (missing_cell if none).
+    '''
+    n_rankers, n_teams = week_ballots.shape
+    rows = [[missing_cell] * n_rankers for _ in range(n_teams)]
+    for ranker in range(n_rankers):
+        for team_idx in range(n_teams):
+            rank = int(week_ballots[ranker, team_idx])
+            if rank:
+                rows[rank - 1][ranker] = teams[team_idx]
+    return rows
+
+def brute_stats(week_ballots):
+    '''
+    ballots.ballot_stats one team at a time with the plain numpy functions.
+    '''
+    stats = {field: [] for field in ('count', 'mean', 'std', 'median', 'q1', 'q3')}
+    for column in week_ballots.T:
+        ranks = column[column != 0].astype(np.float64)
+        stats['count'].append(len(ranks))
+        if len(ranks):
+            q1, median, q3 = np.percentile(ranks, (25, 50, 75))
+            values = (ranks.mean(), ranks.std(), median, q1, q3)
+        else:
+            values = (np.nan,) * 5
+        for field, value in zip(('mean', 'std', 'median', 'q1', 'q3'), values):
+            stats[field].append(value)
+    return {field: np.array(values) for field, values in stats.items()}
+
+def write_file(filename, text):
+    '''
+    Write text to filename, changing its modified time even if the clock hasn't moved.
+    '''
+    old = os.stat(filename).st_mtime if os.path.exists(filename) else 0
+    with open(filename, 'w') as out:
+        out.write(text)
+    os.utime(filename, (old + 10, old + 10))
@@ -0,0 +1,75 @@
+'''
+ballot_stream.BallotAccumulator against the stats of the ballots so far.
+
+Python 3.9
+'''
+
+import numpy as np
+import pytest
+
+import ballot_stream
+import ballots
+from conftest import brute_stats, rank_rows
+
+def ranker_ballot(teams, ranks):
+    '''
+    One ranker's ballot as team names, ballot[rank - 1] = team, '--' where they left a rank empty.
+    '''
+    ballot = ['--'] * len(ranks)
+    for team, rank in zip(teams, ranks.tolist()):
+        if rank:
+            ballot[rank - 1] = team
+    return ballot
+
+def brute_mean_order(teams, week_ballots):
+    '''
+    Teams by mean rank, ties and teams nobody has ranked yet in teams order.
+    '''
+    means = brute_stats(week_ballots)['mean']
+    return sorted(teams, key=lambda team: (np.isnan(means[teams.index(team)]), means[teams.index(team)], teams.index(team)))
+
+def test_accumulator_matches_every_prefix(week):
+    '''
+    After each ballot the stats and power rankings are those of all the ballots added so far.
+    '''
+    teams, week_ballots = week
+    accumulator = ballot_stream.BallotAccumulator(teams)
+    for n_added, ranks in enumerate(week_ballots, 1):
+        accumulator.add_ballot(ranker_ballot(teams, ranks))
+        stats = accumulator.stats()
+        expected = brute_stats(week_ballots[:n_added])
+        for field in expected:
+            np.testing.assert_allclose(stats[field], expected[field], err_msg='%s after %d ballots' %(field, n_added))
+        assert accumulator.power_rankings == brute_mean_order(teams, week_ballots[:n_added])
+
+    means_stds = accumulator.mean_std_dict
+    expected = brute_stats(week_ballots)
+    for team_idx, team in enumerate(teams):
+        np.testing.assert_allclose(means_stds[team], (expected['mean'][team_idx], expected['std'][team_idx]))
+
+def test_accumulator_sheet_columns(week):
+    '''
+    Streaming the sheet's columns gives the same stats as encoding the whole sheet, teams seen as they appear.
+    '''
+    teams, week_ballots = week
+    rows = rank_rows(teams, week_ballots)
+    accumulator = ballot_stream.BallotAccumulator()
+    rankings = list(accumulator.stream(ballot_stream.sheet_ballots(rows)))
+
+    encoded_teams, encoded = ballots.encode_rank_rows(rows)
+    assert sorted(accumulator.teams) == sorted(encoded_teams)
+    order = [accumulator.teams.index(team) for team in encoded_teams]
+    stats = accumulator.stats()
+    expected = brute_stats(encoded)
+    for field in expected:
+        np.testing.assert_allclose(stats[field][order], expected[field], err_msg=field)
+    assert len(rankings) == week_ballots.shape[0]
+    assert rankings[-1] == accumulator.power_rankings
+
+def test_accumulator_rejects_repeated_team():
+    '''
+    A ballot naming a team twice is an error.
+    '''
+    accumulator = ballot_stream.BallotAccumulator()
+    with pytest.raises(ValueError):
+        accumulator.add_ballot(['a', 'b', 'a'])
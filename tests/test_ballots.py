@@ -0,0 +1,134 @@
+'''
+ballots.encode_rank_rows and ballot_stats against brute force.
+
+Python 3.9
+'''
+
+import numpy as np
+import pytest
+
+import ballot_stream
+import ballots
+import rank_sketch
+from conftest import brute_stats, make_ballots, rank_rows
+
+def brute_encode(rows, clean_name=str.strip):
+    '''
+    encode_rank_rows one cell at a time into lists.
+    '''
+    teams = []
+    entries = []
+    for rank, row in enumerate(rows, 1):
+        for ranker, cell in enumerate(row):
+            if cell.strip() in ('', '--'):
+                continue
+            team = clean_name(cell)
+            if team not in teams:
+                teams.append(team)
+            entries.append((ranker, team, rank))
+    n_rankers = max((len(row) for row in rows), default=0)
+    expected = np.zeros((n_rankers, len(teams)), dtype=np.int64)
+    for ranker, team, rank in entries:
+        expected[ranker, teams.index(team)] = rank
+    return teams, expected
+
+def test_encode_rank_rows(week):
+    '''
+    The sheet rows give back the same teams (first appearance order) and ranks.
+    '''
+    teams, week_ballots = week
+    rows = rank_rows(teams, week_ballots)
+    encoded_teams, encoded = ballots.encode_rank_rows(rows)
+    expected_teams, expected = brute_encode(rows)
+
+    assert encoded_teams == expected_teams
+    assert encoded.dtype == ballots.RANK_DTYPE
+    np.testing.assert_array_equal(encoded, expected)
+    # and the same as the ballots the rows were written from, columns in the encoded order.
+    np.testing.assert_array_equal(encoded, week_ballots[:, [teams.index(team) for team in encoded_teams]])
+
+def test_encode_rank_rows_clean_name():
+    '''
+    clean_name is called once per distinct cell, and ragged rows and blank cells are missing rankings.
+    '''
+    calls = []
+    def clean_name(cell):
+        calls.append(cell)
+        return cell.strip().title()
+
+    rows = [['a', ' b', 'a'], ['b', 'a ', ''], ['c', '--']]
+    teams, encoded = ballots.encode_rank_rows(rows, clean_name=clean_name)
+    expected_teams, expected = brute_encode(rows, clean_name=lambda cell: cell.strip().title())
+
+    assert teams == expected_teams == ['A', 'B', 'C']
+    np.testing.assert_array_equal(encoded, expected)
+    assert sorted(calls) == sorted(set(cell for row in rows for cell in row if cell.strip() not in ('', '--')))
+
+def test_encode_rank_rows_bad_cells():
+    '''
+    Every cell that isn't a team name is reported at once.
+    '''
+    names = {'Patriots': 'Patriots', 'Jets': 'Jets'}
+    with pytest.raises(ValueError) as error:
+        ballots.encode_rank_rows([['Patriots', 'Pats?'], ['Jets', '???']], clean_name=names.get)
+    assert "'Pats?'" in str(error.value) and "'???'" in str(error.value)
+
+def test_encode_rank_rows_repeated_team():
+    '''
+    A team twice in one ranker's column is an error listing every repeat, not a silently overwritten rank,
+    as the streaming paths (the rank sketch and the ballot accumulator) reject it too.
+    '''
+    rows = [['A', 'B', 'A'], ['A', 'A', 'B'], ['C', 'C', 'B']]
+    with pytest.raises(ValueError) as error:
+        ballots.encode_rank_rows(rows)
+    message = str(error.value)
+    assert "'A' by ranker 1 (again at rank 2)" in message
+    assert "'B' by ranker 3 (again at rank 3)" in message
+    assert 'ranker 2' not in message
+
+    with pytest.raises(ValueError):
+        rank_sketch.sketch_rank_rows(rows)
+    with pytest.raises(ValueError):
+        ballot_stream.BallotAccumulator().add_ballots(ballot_stream.sheet_ballots(rows))
+
+def test_iter_rank_ids_streams():
+    '''
+    Rows are yielded as they are read, with the teams list growing as new teams appear.
+    '''
+    teams = []
+    rows = iter([['a', 'b'], ['b', '--'], ['c', 'a']])
+    ids = ballots.iter_rank_ids(rows, teams)
+    assert next(ids) == [0, 1] and teams == ['a', 'b']
+    assert next(ids) == [1, -1]
+    assert next(ids) == [2, 0] and teams == ['a', 'b', 'c']
+
+def test_ballot_stats(week):
+    '''
+    Count, mean, std and quartiles of each team match np.percentile on its ranks.
+    '''
+    teams, week_ballots = week
+    stats = ballots.ballot_stats(week_ballots)
+    expected = brute_stats(week_ballots)
+    for field in expected:
+        np.testing.assert_allclose(stats[field], expected[field], err_msg=field)
+
+def test_ballot_stats_unranked_team():
+    '''
+    A team nobody ranked has a count of 0 and nan stats.
+    '''
+    teams, week_ballots = make_ballots(9, 5, hole_rate=0.2, seed=7)
+    week_ballots[:, 2] = ballots.MISSING
+    stats = ballots.ballot_stats(week_ballots)
+    expected = brute_stats(week_ballots)
+    assert stats['count'][2] == 0
+    for field in expected:
+        np.testing.assert_allclose(stats[field], expected[field], err_msg=field)
+
+def test_team_rankings(week):
+    '''
+    The old {team: ranks} form keeps each team's ranks in ranker order without the missing ones.
+    '''
+    teams, week_ballots = week
+    pr_data = ballots.team_rankings(teams, week_ballots)
+    for team_idx, team in enumerate(teams):
+        assert pr_data[team].tolist() == [rank for rank in week_ballots[:, team_idx].tolist() if rank]
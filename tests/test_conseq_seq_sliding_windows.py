@@ -0,0 +1,79 @@
+'''
+Misc_Code/conseq_seq_sliding_windows against brute force over every subsequence.
+
+Python 3.9
+'''
+
+import numpy as np
+import pytest
+
+import conseq_seq_sliding_windows as conseq
+
+def brute_max_subsequence(values):
+    '''
+    (max sum, start, end) over every subsequence, ties to the earliest end then the shortest.
+    '''
+    best = None
+    for end in range(1, len(values) + 1):
+        for start in range(end - 1, -1, -1):
+            total = sum(values[start:end])
+            if best is None or total > best[0]:
+                best = (total, start, end)
+    return best
+
+def random_lists(seed, count=200):
+    '''
+    Random int lists of length 1 to 12, with plenty of zeros and ties.
+    '''
+    rng = np.random.default_rng(seed)
+    return [rng.integers(-5, 6, rng.integers(1, 13)).tolist() for _ in range(count)]
+
+def test_max_contig_sum():
+    '''
+    Kadane's sum and bounds are the brute force best.
+    '''
+    for values in random_lists(0):
+        expected = brute_max_subsequence(values)
+        assert conseq.max_contig_sum(values) == expected[0]
+        assert conseq.max_contig_subsequence(values) == expected
+        assert conseq.max_contig_sum_stream(iter(values)) == expected
+
+def test_max_contig_sum_examples():
+    '''
+    The examples in testing().
+    '''
+    assert conseq.max_contig_sum([1, 2, 3, -10, 40, -50, 100]) == 100
+    assert conseq.max_contig_subsequence([5, -2, 7]) == (10, 0, 3)
+    assert conseq.max_contig_sum_stream(iter([-3, 4, -1, 2, -8, 1])) == (5, 1, 4)
+
+def test_max_contig_sum_batch():
+    '''
+    The batch gives the brute force best of each sequence, ragged lists and 2d arrays.
+    '''
+    seqs = random_lists(1)
+    sums, starts, ends = conseq.max_contig_sum_batch(seqs)
+    assert list(zip(sums.tolist(), starts.tolist(), ends.tolist())) == [brute_max_subsequence(values) for values in seqs]
+
+    grid = np.random.default_rng(2).normal(size=(50, 9))
+    sums, starts, ends = conseq.max_contig_sum_batch(grid)
+    for row, total, start, end in zip(grid, sums, starts, ends):
+        expected = brute_max_subsequence(row.tolist())
+        assert total == pytest.approx(expected[0])
+        assert (start, end) == expected[1:]
+
+def test_max_contig_sum_empty():
+    '''
+    Empty input is an error.
+    '''
+    with pytest.raises(ValueError):
+        conseq.max_contig_sum_stream([])
+    with pytest.raises(ValueError):
+        conseq.max_contig_sum_batch([[1, 2], []])
+
+def test_window():
+    '''
+    Every window of length n, as lists.
+    '''
+    for values in random_lists(3, 50):
+        for n in range(1, len(values) + 1):
+            assert list(conseq.window(values, n)) == [values[idx:idx + n] for idx in range(len(values) - n + 1)]
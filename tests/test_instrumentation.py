@@ -0,0 +1,142 @@
+'''
+Tests for the stage instrumentation: nested memory peaks, worker records and the exports.
+
+Python 3.9
+'''
+
+import concurrent.futures
+import json
+import os
+
+import numpy as np
+import pytest
+
+import instrumentation
+import parallel_render
+
+MB = 2 ** 20
+
+@pytest.fixture(autouse=True)
+def clean_records():
+    '''
+    Each test starts and ends with instrumentation disabled and no records.
+    '''
+    instrumentation.disable()
+    instrumentation.pop_records()
+    yield
+    instrumentation.disable()
+    instrumentation.pop_records()
+
+def allocate(n_bytes):
+    '''
+    Allocate and free n_bytes.
+    '''
+    block = np.ones(n_bytes, dtype=np.uint8)
+    del block
+
+def staged_job(job):
+    '''
+    A render_job for parallel_render.render_all recording one stage. Module level so it can be sent to a worker.
+    '''
+    with instrumentation.stage('job', job=job):
+        allocate(MB)
+    return 'job%d.png' %(job)
+
+def test_disabled():
+    '''
+    Disabled stages are the shared null context and record nothing.
+    '''
+    assert instrumentation.stage('a', week=1) is instrumentation.stage('b')
+    with instrumentation.stage('a'):
+        pass
+    assert instrumentation.records() == []
+    assert instrumentation.is_enabled() == (False, False)
+
+def test_nested_peak_memory():
+    '''
+    A stage's peak includes its inner stages, but not the peaks of stages that finished before it started.
+    '''
+    instrumentation.enable(memory=True)
+    with instrumentation.stage('outer'):
+        allocate(MB)
+        with instrumentation.stage('inner'):
+            allocate(8 * MB)
+        with instrumentation.stage('sibling'):
+            allocate(2 * MB)
+    with instrumentation.stage('after'):
+        pass
+    peaks = {record['name']: record['peak_bytes'] for record in instrumentation.records()}
+    assert [record['name'] for record in instrumentation.records()] == ['inner', 'sibling', 'outer', 'after']
+
+    assert 8 * MB <= peaks['inner'] < 9 * MB
+    assert 2 * MB <= peaks['sibling'] < 3 * MB
+    assert peaks['outer'] >= peaks['inner']
+    assert peaks['after'] < MB
+
+def test_call_recorded_in_worker():
+    '''
+    A worker returns only its own records, made with the parent's settings, and the parent's records are untouched.
+    '''
+    instrumentation.enable()
+    with instrumentation.stage('parent'):
+        pass
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        result, worker_records = executor.submit(instrumentation.call_recorded, instrumentation.is_enabled(), staged_job, 3).result()
+    assert result == 'job3.png'
+    assert [(record['name'], record['args']) for record in worker_records] == [('job', {'job': 3})]
+    assert worker_records[0]['pid'] != os.getpid()
+    assert 'peak_bytes' not in worker_records[0]
+    assert [record['name'] for record in instrumentation.records()] == ['parent']
+
+    # render_all adds the workers' records to the parent's.
+    assert parallel_render.render_all(staged_job, [1, 2, 3], workers=2) == ['job1.png', 'job2.png', 'job3.png']
+    jobs = [record for record in instrumentation.records() if record['name'] == 'job']
+    assert sorted(record['args']['job'] for record in jobs) == [1, 2, 3]
+    assert all(record['pid'] != os.getpid() for record in jobs)
+    assert [record['name'] for record in instrumentation.records()].count('render_all') == 1
+
+RECORDS = [
+    {'name': 'csv', 'start': 100.0, 'seconds': 0.5, 'pid': 1, 'tid': 7, 'args': {'week': 1}},
+    {'name': 'boxplot.save', 'start': 100.5, 'seconds': 2.0, 'pid': 2, 'tid': 8, 'args': {'week': 1}, 'peak_bytes': 3 * MB},
+    {'name': 'csv', 'start': 101.0, 'seconds': 1.0, 'pid': 1, 'tid': 7, 'args': {'week': 2}},
+    {'name': 'boxplot.save', 'start': 101.5, 'seconds': 0.25, 'pid': 2, 'tid': 8, 'args': {'week': 2}, 'peak_bytes': MB},
+]
+
+def test_summary():
+    '''
+    Stages are totalled by name, slowest first, with the largest peak.
+    '''
+    totals = instrumentation.summary(RECORDS)
+    assert list(totals) == ['boxplot.save', 'csv']
+    assert totals['boxplot.save'] == {'calls': 2, 'seconds': 2.25, 'max_seconds': 2.0, 'peak_bytes': 3 * MB}
+    assert totals['csv'] == {'calls': 2, 'seconds': 1.5, 'max_seconds': 1.0, 'peak_bytes': None}
+
+    lines = instrumentation.format_summary(RECORDS).splitlines()
+    assert lines[0].split() == ['stage', 'calls', 'total', 's', 'max', 's', 'peak', 'MB']
+    assert lines[1].split() == ['boxplot.save', '2', '2.2500', '2.0000', '3.0']
+    assert lines[2].split() == ['csv', '2', '1.5000', '1.0000']
+
+def test_chrome_trace_and_export(tmp_path):
+    '''
+    The trace has one complete event per record in microseconds from the first start, and export writes it.
+    '''
+    trace = instrumentation.chrome_trace(RECORDS)
+    events = trace['traceEvents']
+    assert [(event['name'], event['cat'], event['ph'], event['ts'], event['dur'], event['pid'], event['tid']) for event in events] == [
+        ('csv', 'csv', 'X', 0.0, 500000.0, 1, 7),
+        ('boxplot.save', 'boxplot', 'X', 500000.0, 2000000.0, 2, 8),
+        ('csv', 'csv', 'X', 1000000.0, 1000000.0, 1, 7),
+        ('boxplot.save', 'boxplot', 'X', 1500000.0, 250000.0, 2, 8),
+    ]
+    assert events[1]['args'] == {'week': 1, 'peak_bytes': 3 * MB}
+    assert RECORDS[1]['args'] == {'week': 1}
+
+    instrumentation.add_records(RECORDS)
+    instrumentation.export(str(tmp_path / 'trace.json'))
+    with open(str(tmp_path / 'trace.json')) as trace_file:
+        assert json.load(trace_file) == trace
+    instrumentation.export(str(tmp_path / 'records.json'), fmt='json')
+    with open(str(tmp_path / 'records.json')) as records_file:
+        output = json.load(records_file)
+    assert output['records'] == RECORDS
+    assert list(output['summary']) == ['boxplot.save', 'csv']
@@ -0,0 +1,151 @@
+'''
+rank_aggregation against pairwise brute force and, for Kemeny, every possible order.
+
+Python 3.9
+'''
+
+import itertools
+
+import numpy as np
+import pytest
+
+import rank_aggregation
+from conftest import brute_stats, make_ballots
+
+def brute_preferences(week_ballots):
+    '''
+    prefs[a, b] = rankers with a ranked ahead of b, both ranked.
+    '''
+    n_rankers, n_teams = week_ballots.shape
+    prefs = np.zeros((n_teams, n_teams), dtype=np.int64)
+    for ranks in week_ballots.tolist():
+        for a in range(n_teams):
+            for b in range(n_teams):
+                if ranks[a] and ranks[b] and ranks[a] < ranks[b]:
+                    prefs[a, b] += 1
+    return prefs
+
+def brute_order(teams, score):
+    '''
+    Teams by score, highest first, ties to the earlier team.
+    '''
+    return [teams[idx] for idx in sorted(range(len(teams)), key=lambda idx: (-score[idx], idx))]
+
+def brute_schulze_paths(prefs):
+    '''
+    Schulze strongest paths, the textbook triple loop.
+    '''
+    n_teams = len(prefs)
+    paths = np.where(prefs > prefs.T, prefs, 0)
+    for mid in range(n_teams):
+        for a in range(n_teams):
+            if a == mid:
+                continue
+            for b in range(n_teams):
+                if b != mid and b != a:
+                    paths[a, b] = max(paths[a, b], min(paths[a, mid], paths[mid, b]))
+    return paths
+
+def brute_kemeny_score(order_idx, week_ballots):
+    '''
+    Ranker pairwise preferences the order agrees with, counted ballot by ballot.
+    '''
+    score = 0
+    for ranks in week_ballots.tolist():
+        for pos, a in enumerate(order_idx):
+            for b in order_idx[pos + 1:]:
+                if ranks[a] and ranks[b] and ranks[a] < ranks[b]:
+                    score += 1
+    return score
+
+def test_preference_matrix(week, monkeypatch):
+    '''
+    The same counts in one chunk or one ranker per chunk.
+    '''
+    teams, week_ballots = week
+    expected = brute_preferences(week_ballots)
+    np.testing.assert_array_equal(rank_aggregation.preference_matrix(week_ballots), expected)
+    monkeypatch.setattr(rank_aggregation, 'CHUNK_CELLS', 1)
+    np.testing.assert_array_equal(rank_aggregation.preference_matrix(week_ballots), expected)
+
+def test_ranker_preferences(week):
+    '''
+    Each ranker's own preferences sum to the matrix.
+    '''
+    teams, week_ballots = week
+    ahead = rank_aggregation.ranker_preferences(week_ballots)
+    for ranker in range(week_ballots.shape[0]):
+        np.testing.assert_array_equal(ahead[ranker], brute_preferences(week_ballots[ranker:ranker + 1]) > 0)
+
+def test_mean_borda_copeland_schulze(week):
+    '''
+    Each method's order from its score worked out pair by pair.
+    '''
+    teams, week_ballots = week
+    prefs = brute_preferences(week_ballots)
+    n_teams = len(teams)
+
+    means = brute_stats(week_ballots)['mean']
+    expected_mean = [teams[idx] for idx in sorted(range(n_teams), key=lambda idx: (np.isnan(means[idx]), means[idx], idx))]
+    assert rank_aggregation.aggregate(teams, week_ballots, 'mean') == expected_mean
+
+    borda = [sum(prefs[a, b] for b in range(n_teams)) for a in range(n_teams)]
+    assert rank_aggregation.aggregate(teams, week_ballots, 'borda') == brute_order(teams, borda)
+
+    copeland = [sum(1.0 if prefs[a, b] > prefs[b, a] else 0.5 if prefs[a, b] == prefs[b, a] else 0.0
+                    for b in range(n_teams) if b != a) for a in range(n_teams)]
+    assert rank_aggregation.aggregate(teams, week_ballots, 'copeland') == brute_order(teams, copeland)
+
+    paths = brute_schulze_paths(prefs)
+    np.testing.assert_array_equal(rank_aggregation.strongest_paths(prefs), paths)
+    schulze = [sum(paths[a, b] > paths[b, a] for b in range(n_teams)) for a in range(n_teams)]
+    assert rank_aggregation.aggregate(teams, week_ballots, 'schulze') == brute_order(teams, schulze)
+
+def test_kemeny_score(week):
+    '''
+    The score of an order from the preference matrix is the ballot by ballot count.
+    '''
+    teams, week_ballots = week
+    prefs = rank_aggregation.preference_matrix(week_ballots)
+    order_idx = list(np.random.default_rng(0).permutation(len(teams)))
+    assert rank_aggregation.kemeny_score(order_idx, prefs) == brute_kemeny_score(order_idx, week_ballots)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_kemeny_order_small(seed):
+    '''
+    The approximate Kemeny order is a permutation no single team move improves, checked against
+    every move, and never worse than the Copeland order it starts from or better than the best of every permutation.
+    '''
+    teams, week_ballots = make_ballots(9, 6, hole_rate=0.1, seed=seed)
+    prefs = rank_aggregation.preference_matrix(week_ballots)
+    team_index = {team: idx for idx, team in enumerate(teams)}
+
+    order = [team_index[team] for team in rank_aggregation.aggregate(teams, week_ballots, 'kemeny')]
+    copeland = [team_index[team] for team in rank_aggregation.copeland_order(teams, prefs)]
+    score = brute_kemeny_score(order, week_ballots)
+    best = max(brute_kemeny_score(list(order_idx), week_ballots) for order_idx in itertools.permutations(range(len(teams))))
+
+    assert sorted(order) == list(range(len(teams)))
+    assert brute_kemeny_score(copeland, week_ballots) <= score <= best
+    for pos in range(len(order)):
+        for new_pos in range(len(order)):
+            moved = order[:pos] + order[pos + 1:]
+            moved.insert(new_pos, order[pos])
+            assert brute_kemeny_score(moved, week_ballots) <= score
+
+def test_kemeny_order_condorcet():
+    '''
+    When the head to head majorities are a strict order, it is the Kemeny order.
+    '''
+    teams = ['a', 'b', 'c', 'd', 'e']
+    week_ballots = np.array([[1, 2, 3, 4, 5], [2, 1, 3, 5, 4], [1, 3, 2, 4, 5], [1, 2, 4, 3, 5]])
+    assert rank_aggregation.aggregate(teams, week_ballots, 'kemeny') == teams
+    assert max(itertools.permutations(range(5)), key=lambda order_idx: brute_kemeny_score(list(order_idx), week_ballots)) == (0, 1, 2, 3, 4)
+
+def test_unknown_method():
+    '''
+    Only METHODS are accepted.
+    '''
+    teams, week_ballots = make_ballots(3, 4)
+    with pytest.raises(ValueError):
+        rank_aggregation.aggregate(teams, week_ballots, 'plurality')
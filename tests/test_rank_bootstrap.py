@@ -0,0 +1,72 @@
+'''
+Tests for the bootstrap confidence intervals of the consensus ranks.
+'''
+
+import numpy as np
+import pytest
+
+import rank_aggregation
+import rank_bootstrap
+import synthetic_ballots
+
+from conftest import make_ballots
+
+def assert_same_result(result, other):
+    '''
+    Assert two bootstrap results are identical.
+    '''
+    assert result.keys() == other.keys()
+    for name in result:
+        assert np.array_equal(result[name], other[name]), name
+
+@pytest.mark.parametrize('method', ['mean', 'schulze'])
+def test_seed_reproducible(method):
+    '''
+    The same seed gives the same result whatever the number of workers, another seed doesn't.
+    '''
+    teams, week_ballots = make_ballots(25, 12, 0.1, 0.1, seed=3)
+    result = rank_bootstrap.bootstrap(teams, week_ballots, resamples=300, seed=5, chunk_size=70, method=method)
+    assert_same_result(result, rank_bootstrap.bootstrap(teams, week_ballots, resamples=300, seed=5, chunk_size=70, method=method))
+    assert_same_result(result, rank_bootstrap.bootstrap(teams, week_ballots, resamples=300, seed=5, chunk_size=70, method=method, workers=2))
+    other = rank_bootstrap.bootstrap(teams, week_ballots, resamples=300, seed=6, chunk_size=70, method=method)
+    assert not np.array_equal(result['positions'], other['positions'])
+
+def test_default_resamples():
+    '''
+    The preference methods default to fewer resamples, as they are ordered in Python.
+    '''
+    teams, week_ballots = make_ballots(5, 4, seed=1)
+    for method in rank_aggregation.METHODS:
+        expected = rank_bootstrap.MEAN_RESAMPLES if method == 'mean' else rank_bootstrap.PREFERENCE_RESAMPLES
+        assert rank_bootstrap.default_resamples(method) == expected
+    assert rank_bootstrap.bootstrap(teams, week_ballots, method='borda')['resamples'] == rank_bootstrap.PREFERENCE_RESAMPLES
+
+def test_unanimous_rankers():
+    '''
+    When every ranker agrees there is no doubt: each interval is the one rank.
+    '''
+    teams = ['T%d' %(team) for team in range(6)]
+    week_ballots = np.tile(np.array([3, 1, 2, 6, 4, 5], dtype=np.int16), (10, 1))
+    for method in rank_aggregation.METHODS:
+        result = rank_bootstrap.bootstrap(teams, week_ballots, resamples=50, method=method)
+        assert list(result['rank_low']) == list(result['rank_high']) == [3, 1, 2, 6, 4, 5]
+        assert np.array_equal(result['ahead'] + result['ahead'].T, 1 - np.eye(6))
+
+@pytest.mark.parametrize('method', ['mean', 'borda'])
+def test_interval_coverage(method):
+    '''
+    Samples of rankers from a large population: the intervals hold the population's consensus
+    rank about as often as the confidence says.
+    '''
+    n_teams, confidence = 10, 0.9
+    population = synthetic_ballots.generate_ballots(3000, n_teams, 0.0, seed=7)
+    true_ranks = np.empty(n_teams, dtype=np.intp)
+    true_ranks[rank_aggregation.aggregate(list(range(n_teams)), population, method)] = np.arange(1, n_teams + 1)
+
+    rng = np.random.default_rng(1)
+    covered = []
+    for trial in range(40):
+        sample = population[rng.choice(len(population), 40)]
+        result = rank_bootstrap.bootstrap(list(range(n_teams)), sample, resamples=300, confidence=confidence, seed=trial, method=method)
+        covered.extend((result['rank_low'] <= true_ranks) & (true_ranks <= result['rank_high']))
+    assert np.mean(covered) >= confidence - 0.05
@@ -0,0 +1,108 @@
+'''
+rank_sketch.RankSketch against the ballots it counts: summary vs season_summary.summarize
+(see test_season_summary), and streaming vs encoded sheets.
+
+Python 3.9
+'''
+
+import numpy as np
+import pytest
+
+import ballots
+import rank_sketch
+import rankings_engine
+import season_summary
+import synthetic_ballots
+from conftest import make_ballots, rank_rows
+
+def assert_same_summary(summary, expected):
+    '''
+    Same teams, stats (to rounding) and outliers.
+    '''
+    assert summary.teams == expected.teams
+    for field in season_summary.STAT_FIELDS:
+        np.testing.assert_allclose(summary.stats[field], expected.stats[field], err_msg=field)
+    for got, want in zip(summary.fliers, expected.fliers):
+        np.testing.assert_array_equal(got, want)
+
+def test_summary_matches_summarize(week):
+    '''
+    The summary read off the counts is the summary of the ballots, and so are the Axes.bxp stats.
+    '''
+    teams, week_ballots = week
+    sketch = rank_sketch.RankSketch.from_ballots(teams, week_ballots)
+    summary = sketch.summary()
+    expected = season_summary.summarize(teams, week_ballots)
+    assert_same_summary(summary, expected)
+    assert sketch.n_ballots == week_ballots.shape[0]
+
+    for got, want in zip(summary.bxp_stats(teams[::-1], max_fliers=3), expected.bxp_stats(teams[::-1], max_fliers=3)):
+        assert got.pop('label') == want.pop('label')
+        assert got.keys() == want.keys()
+        for key in got:
+            np.testing.assert_allclose(got[key], want[key], err_msg=key)
+
+def test_rank_frequency(week):
+    '''
+    frequency[team, rank - 1] is the number of rankers who gave the team that rank.
+    '''
+    teams, week_ballots = week
+    sketch = rank_sketch.RankSketch.from_ballots(teams, week_ballots)
+    order = teams[::-1]
+    expected = [[int((week_ballots[:, teams.index(team)] == rank).sum()) for rank in range(1, len(teams) + 1)] for team in order]
+    assert sketch.rank_frequency(order, len(teams)).tolist() == expected
+
+@pytest.mark.parametrize('n_shards', [2, 3, 7])
+def test_merged_shards(n_shards):
+    '''
+    Sketches of shards of the rankers, with their teams in different orders, merge to the sketch of all of them.
+    '''
+    teams, week_ballots = make_ballots(50, 12, 0.1, 0.1, seed=n_shards)
+    rng = np.random.default_rng(n_shards)
+    merged = rank_sketch.RankSketch(teams)
+    for shard in np.array_split(np.arange(len(week_ballots)), n_shards):
+        columns = rng.permutation(len(teams))
+        merged.merge(rank_sketch.RankSketch.from_ballots([teams[idx] for idx in columns], week_ballots[shard][:, columns]))
+
+    whole = rank_sketch.RankSketch.from_ballots(teams, week_ballots)
+    assert merged.teams == whole.teams and merged.n_ballots == whole.n_ballots
+    np.testing.assert_array_equal(merged.counts, whole.counts)
+    assert_same_summary(merged.summary(), season_summary.summarize(teams, week_ballots))
+
+@pytest.mark.parametrize('chunk_rows', [1, 4, rank_sketch.CHUNK_ROWS])
+def test_add_rank_rows(week, chunk_rows):
+    '''
+    Counting the sheet rows as they are read gives the sketch of the encoded ballots.
+    '''
+    teams, week_ballots = week
+    rows = rank_rows(teams, week_ballots)
+    sketch = rank_sketch.RankSketch()
+    sheet_teams = sketch.add_rank_rows(iter(rows), chunk_rows=chunk_rows)
+
+    expected = rank_sketch.RankSketch.from_ballots(*ballots.encode_rank_rows(rows))
+    assert sheet_teams == sketch.teams == expected.teams
+    assert sketch.n_ballots == expected.n_ballots
+    np.testing.assert_array_equal(sketch.rank_frequency(sketch.teams, len(teams)), expected.rank_frequency(sketch.teams, len(teams)))
+
+def test_sketch_source(tmp_path):
+    '''
+    The engine's streaming sketch of each league's sheet is the sketch of the sheet's ballots.
+    '''
+    for league, fmt in (('nfl', 'nfl'), ('nba', 'nba')):
+        n_teams = rankings_engine.LEAGUES[league].n_teams
+        names = list(rankings_engine.league_team_names(league).teams)
+        csv_files = synthetic_ballots.write_season(str(tmp_path / league), fmt, 2, 23, n_teams, 0.1, names=names)
+        for week_no, csv_file in enumerate(csv_files, 1):
+            source = rankings_engine.Source(league, 2016, week_no, csv_file)
+            week = rankings_engine.read_source(source)
+            _, sketch = rankings_engine.sketch_source(source)
+            expected = rank_sketch.RankSketch.from_ballots(week.teams, week.ballots)
+            assert sketch.teams == expected.teams and sketch.n_ballots == expected.n_ballots
+            np.testing.assert_array_equal(sketch.counts, expected.counts)
+
+def test_sketch_rank_rows_bad_cells():
+    '''
+    Bad cells are reported as by encode_rank_rows.
+    '''
+    with pytest.raises(ValueError):
+        rank_sketch.sketch_rank_rows([['a', 'b'], ['b', 'x']], clean_name={'a': 'a', 'b': 'b'}.get)
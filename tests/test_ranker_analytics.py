@@ -0,0 +1,173 @@
+'''
+ranker_analytics against pairwise brute force over rankers and teams.
+
+Python 3.9
+'''
+
+import os
+import types
+
+import numpy as np
+import pytest
+
+import benchmark_suite
+import ranker_analytics
+from conftest import brute_stats, make_ballots
+
+def brute_pearson(x, y):
+    '''
+    Pearson correlation of two rank lists, nan if fewer than two values or no variance.
+    '''
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    if len(x) < 2:
+        return np.nan
+    dx, dy = x - x.mean(), y - y.mean()
+    denominator = np.sqrt((dx ** 2).sum() * (dy ** 2).sum())
+    return np.nan if denominator == 0 else (dx * dy).sum() / denominator
+
+def brute_spearman(week_ballots):
+    '''
+    Spearman's rho of every pair of rankers over the teams both ranked.
+    '''
+    n_rankers = week_ballots.shape[0]
+    rho = np.full((n_rankers, n_rankers), np.nan)
+    for first in range(n_rankers):
+        for second in range(n_rankers):
+            both = (week_ballots[first] != 0) & (week_ballots[second] != 0)
+            rho[first, second] = brute_pearson(week_ballots[first][both], week_ballots[second][both])
+    return rho
+
+def brute_kendall_sums(week_ballots):
+    '''
+    (concordant - discordant, pairs) of every pair of rankers over the team pairs both ranked.
+    '''
+    n_rankers, n_teams = week_ballots.shape
+    score = np.zeros((n_rankers, n_rankers))
+    pairs = np.zeros((n_rankers, n_rankers))
+    for first in range(n_rankers):
+        for second in range(n_rankers):
+            a, b = week_ballots[first].tolist(), week_ballots[second].tolist()
+            for i in range(n_teams):
+                for j in range(i + 1, n_teams):
+                    if a[i] and a[j] and b[i] and b[j]:
+                        score[first, second] += np.sign(a[i] - a[j]) * np.sign(b[i] - b[j])
+                        pairs[first, second] += 1
+    return score, pairs
+
+def brute_kendall(week_ballots):
+    '''
+    Kendall's tau of every pair of rankers.
+    '''
+    score, pairs = brute_kendall_sums(week_ballots)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return score / pairs
+
+def brute_deviation(week_ballots):
+    '''
+    (deviation, mean_abs_deviation) one ranker and team at a time.
+    '''
+    means = brute_stats(week_ballots)['mean']
+    n_rankers, n_teams = week_ballots.shape
+    deviation = np.full((n_rankers, n_teams), np.nan)
+    mean_abs = np.full(n_rankers, np.nan)
+    for ranker in range(n_rankers):
+        for team in range(n_teams):
+            if week_ballots[ranker, team]:
+                deviation[ranker, team] = week_ballots[ranker, team] - means[team]
+        if (week_ballots[ranker] != 0).any():
+            mean_abs[ranker] = np.nanmean(np.abs(deviation[ranker]))
+    return deviation, mean_abs
+
+def test_spearman_matrix(week):
+    '''
+    Pairwise complete Spearman's rho.
+    '''
+    teams, week_ballots = week
+    np.testing.assert_allclose(ranker_analytics.spearman_matrix(week_ballots), brute_spearman(week_ballots), atol=1e-12)
+
+def test_kendall_matrix(week):
+    '''
+    Kendall's tau over the team pairs both rankers ranked.
+    '''
+    teams, week_ballots = week
+    np.testing.assert_allclose(ranker_analytics.kendall_matrix(week_ballots), brute_kendall(week_ballots))
+
+def test_consensus_deviation(week):
+    '''
+    Each ranker's rank minus the mean rank, and their mean absolute deviation.
+    '''
+    teams, week_ballots = week
+    deviation, mean_abs = ranker_analytics.consensus_deviation(week_ballots)
+    expected_deviation, expected_mean_abs = brute_deviation(week_ballots)
+    np.testing.assert_allclose(deviation, expected_deviation)
+    np.testing.assert_allclose(mean_abs, expected_mean_abs)
+
+def test_week_agreement_names_rankers():
+    '''
+    Rankers are numbered when the sheet doesn't name them.
+    '''
+    teams, week_ballots = make_ballots(3, 4, seed=1)
+    agreement = ranker_analytics.week_agreement(types.SimpleNamespace(teams=teams, ballots=week_ballots, rankers=None))
+    assert agreement['rankers'] == ['ranker 1', 'ranker 2', 'ranker 3']
+
+def test_season_agreement():
+    '''
+    Rankers are matched by name across weeks: Kendall pools the pairs, Spearman averages the weeks,
+    the deviation averages each ranker's deviation per team.
+    '''
+    weeks = []
+    for seed, names in enumerate([['ann', 'bob', 'cat', 'dan'], ['cat', 'ann', 'eve'], ['bob', 'eve', 'ann', 'fay', 'cat']]):
+        teams, week_ballots = make_ballots(len(names), 6, hole_rate=0.15, seed=seed)
+        weeks.append(types.SimpleNamespace(teams=teams if seed != 1 else teams[::-1], ballots=week_ballots, rankers=names))
+    # the middle week lists its teams the other way round, the teams are matched by name.
+    weeks[1].ballots = weeks[1].ballots[:, ::-1]
+
+    agreement = ranker_analytics.season_agreement(weeks)
+    rankers, teams = agreement['rankers'], agreement['teams']
+    assert rankers == ['ann', 'bob', 'cat', 'dan', 'eve', 'fay']
+
+    n_rankers = len(rankers)
+    score = np.zeros((n_rankers, n_rankers))
+    pairs = np.zeros((n_rankers, n_rankers))
+    rho_sum = np.zeros((n_rankers, n_rankers))
+    rho_weeks = np.zeros((n_rankers, n_rankers))
+    deviations = [[[] for _ in teams] for _ in rankers]
+    abs_deviations = [[] for _ in rankers]
+    for week_data in weeks:
+        idx = [rankers.index(name) for name in week_data.rankers]
+        week_score, week_pairs = brute_kendall_sums(week_data.ballots)
+        week_rho = brute_spearman(week_data.ballots)
+        deviation, _ = brute_deviation(week_data.ballots)
+        for a, first in enumerate(idx):
+            for b, second in enumerate(idx):
+                score[first, second] += week_score[a, b]
+                pairs[first, second] += week_pairs[a, b]
+                if not np.isnan(week_rho[a, b]):
+                    rho_sum[first, second] += week_rho[a, b]
+                    rho_weeks[first, second] += 1
+            for team_idx, team in enumerate(week_data.teams):
+                if not np.isnan(deviation[a, team_idx]):
+                    deviations[first][teams.index(team)].append(deviation[a, team_idx])
+                    abs_deviations[first].append(abs(deviation[a, team_idx]))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        np.testing.assert_allclose(agreement['kendall'], score / pairs)
+        np.testing.assert_allclose(agreement['spearman'], rho_sum / rho_weeks)
+    np.testing.assert_allclose(agreement['deviation'], [[np.mean(values) if values else np.nan for values in row] for row in deviations])
+    np.testing.assert_allclose(agreement['mean_abs_deviation'], [np.mean(values) for values in abs_deviations])
+
+def test_season_agreement_unnamed_rankers():
+    '''
+    Numbered rankers can't be matched across weeks, one week of them is fine.
+    '''
+    weeks = []
+    for week_no, names in enumerate([['ann', 'bob'], None, None], 1):
+        teams, week_ballots = make_ballots(2, 4, seed=week_no)
+        weeks.append(types.SimpleNamespace(week_no=week_no, teams=teams, ballots=week_ballots, rankers=names))
+    with pytest.raises(ValueError, match='week 2, 3 does not'):
+        ranker_analytics.season_agreement(weeks)
+    assert ranker_analytics.season_agreement(weeks[1:2])['rankers'] == ['ranker 1', 'ranker 2']
+
+    nfl = benchmark_suite.import_script(os.path.abspath(benchmark_suite.NFL_DIR), 'nfl_power_rankings')
+    with pytest.raises(SystemExit):
+        nfl.main(['rankers', '--season'])
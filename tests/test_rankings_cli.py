@@ -0,0 +1,20 @@
+'''
+Tests for the command line helpers shared by the scripts.
+'''
+
+import pytest
+
+import rankings_cli
+
+def test_check_week():
+    '''
+    --week must be a week that has a csv, up to the current week.
+    '''
+    parser, _ = rankings_cli.build_parser('test', 12)
+    for week in (1, 5, 12):
+        rankings_cli.check_week(parser, parser.parse_args(['--week', str(week), 'rankings']), 12)
+    rankings_cli.check_week(parser, parser.parse_args(['rankings']), 12)
+
+    for week, n_weeks in ((0, 12), (-1, 12), (13, 12), (4, 3)):
+        with pytest.raises(SystemExit):
+            rankings_cli.check_week(parser, parser.parse_args(['--week', str(week), 'rankings']), n_weeks)
@@ -0,0 +1,111 @@
+'''
+rankings_engine's sheet adapters and batch ingest against hand written and synthetic sheets.
+
+Python 3.9
+'''
+
+import random
+
+import numpy as np
+import pytest
+
+import rankings_engine
+import synthetic_ballots
+from conftest import brute_stats
+
+# an NBA style sheet: a header of rankers, a blank column then summary columns, a blank row and a notes row.
+WIDE_SHEET = '''11/7/16,Atlanta Ann,Boston Bob,Chicago Cat,,Median,Average
+1,Hawks,Celtics, Nets ,,Hawks,1.3
+2,Celtics,Hawks,Hawks,,Celtics,1.7
+3,Nets,Nets,Celtics,,Nets,3
+4,Bulls,--,Bulls,,Bulls,4
+,,,,,,
+Notes: Bob forgot the Bulls,,,,,,
+'''
+
+def test_read_wide_sheet(tmp_path):
+    '''
+    Only the ranker columns and the rank rows are read, the summary columns and other rows are ignored.
+    '''
+    csv_file = tmp_path / 'week01.csv'
+    csv_file.write_text(WIDE_SHEET)
+    teams, week_ballots, rankers = rankings_engine.read_wide_sheet(str(csv_file))
+    assert rankers == ['Atlanta Ann', 'Boston Bob', 'Chicago Cat']
+    assert teams == ['Hawks', 'Celtics', 'Nets', 'Bulls']
+    np.testing.assert_array_equal(week_ballots, [[1, 2, 3, 4], [2, 1, 3, 0], [2, 3, 1, 4]])
+
+    # without summary columns every column after the rank is a ranker.
+    csv_file.write_text('\n'.join(','.join(row.split(',')[:4]) for row in WIDE_SHEET.splitlines()))
+    teams, week_ballots, rankers = rankings_engine.read_wide_sheet(str(csv_file))
+    assert rankers == ['Atlanta Ann', 'Boston Bob', 'Chicago Cat']
+    np.testing.assert_array_equal(week_ballots, [[1, 2, 3, 4], [2, 1, 3, 0], [2, 3, 1, 4]])
+
+def test_read_wide_sheet_team_names(tmp_path):
+    '''
+    The league's names resolve nicknames and aliases, and a sheet with the wrong number of teams is refused.
+    '''
+    csv_file = tmp_path / 'week01.csv'
+    csv_file.write_text(WIDE_SHEET)
+    clean_name = rankings_engine.league_team_names('nba').clean_name
+    teams, _, _ = rankings_engine.read_wide_sheet(str(csv_file), clean_name=clean_name)
+    assert teams == [clean_name(team) for team in ('Hawks', 'Celtics', 'Nets', 'Bulls')]
+    assert teams == ['Atlanta', 'Boston', 'Brooklyn', 'Chicago']
+    with pytest.raises(ValueError, match='4 teams, expected 30'):
+        rankings_engine.read_source(rankings_engine.Source('nba', 2016, 1, str(csv_file)))
+
+@pytest.fixture
+def seasons(tmp_path):
+    '''
+    Returns ({(league, season): [ballots of each week]}, sources): three synthetic weeks of the NFL and
+    NBA with the real team names, and one more NFL season, the sources shuffled.
+    '''
+    expected = {}
+    sources = []
+    for league, fmt, season, seed in (('nfl', 'nfl', 2016, 0), ('nba', 'nba', 2016, 10), ('nfl', 'nfl', 2017, 20)):
+        n_teams = rankings_engine.LEAGUES[league].n_teams
+        names = list(rankings_engine.league_team_names(league).teams)
+        csv_files = synthetic_ballots.write_season(str(tmp_path / ('%s%d' %(league, season))), fmt, 3, 9, n_teams, 0.2, names=names, seed=seed)
+        sources.extend(rankings_engine.glob_sources(league, season, str(tmp_path / ('%s%d' %(league, season)) / '*.csv')))
+        teams = synthetic_ballots.team_names(n_teams, names)
+        expected[(league, season)] = (teams, [synthetic_ballots.generate_ballots(9, n_teams, 0.2, seed=seed + week_no) for week_no in (1, 2, 3)])
+    random.Random(0).shuffle(sources)
+    return expected, sources
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_ingest(seasons, workers):
+    '''
+    Every week of every season is read back to the ballots it was written from, sorted by week,
+    with the stats and power rankings of those ballots.
+    '''
+    expected, sources = seasons
+    ingested = rankings_engine.ingest(sources, workers)
+    assert sorted(ingested) == sorted(expected)
+    for key, (teams, season_ballots) in expected.items():
+        weeks = ingested[key]
+        assert [week.week_no for week in weeks] == [1, 2, 3]
+        for week, week_ballots in zip(weeks, season_ballots):
+            assert (week.league, week.season) == key
+            columns = [week.teams.index(team) for team in teams]
+            # the missing rankers' columns of '--' are kept, as rows of MISSING.
+            np.testing.assert_array_equal(week.ballots[:, columns], week_ballots)
+            assert (week.rankers is None) == (key[0] == 'nfl')
+
+            stats = brute_stats(week.ballots)
+            for field in ('count', 'mean', 'median', 'q1', 'q3'):
+                np.testing.assert_allclose(week.stats[field], stats[field], err_msg=field)
+            means = [stats['mean'][week.teams.index(team)] for team in week.power_rankings]
+            assert means == sorted(means)
+
+def test_ingest_sketches_match_ingest(seasons):
+    '''
+    The sketched weeks have the same stats and power rankings as the ingested ballots.
+    '''
+    _, sources = seasons
+    ingested = rankings_engine.ingest(sources)
+    sketched = rankings_engine.ingest_sketches(sources, workers=2)
+    assert sorted(sketched) == sorted(ingested)
+    for key, weeks in ingested.items():
+        for week, sketch_week in zip(weeks, sketched[key]):
+            assert sketch_week.week_no == week.week_no
+            assert sketch_week.power_rankings == week.power_rankings
+            np.testing.assert_allclose(sketch_week.stats['mean'], week.stats['mean'])
@@ -0,0 +1,120 @@
+'''
+Tests for the rankings service caches, without starting the server.
+'''
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import rankings_service
+from conftest import write_file
+
+def test_lru_cache_eviction():
+    '''
+    The least recently used values are evicted once the total size is over max_bytes.
+    '''
+    cache = rankings_service.LRUCache(10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    assert cache.get('a') == b'1234' # a is now more recently used than b
+    cache.put('c', b'1234')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234' and cache.get('c') == b'1234'
+    assert cache.info() == {'entries': 2, 'bytes': 8, 'max_bytes': 10, 'hits': 3, 'misses': 1, 'evictions': 1}
+
+    # replacing a value counts its new size, a value bigger than the cache isn't kept.
+    cache.put('a', b'12')
+    assert cache.n_bytes == 6
+    cache.put('d', b'12345678901')
+    assert cache.get('d') is None and cache.n_bytes == 6
+
+    counted = rankings_service.LRUCache(2, size=lambda value: 1)
+    for key in 'xyz':
+        counted.put(key, key)
+    assert list(counted.values) == ['y', 'z'] and counted.evictions == 1
+
+class FakeWeek(object):
+    '''
+    Stands in for a script's Week, the rankings are the csv's teams.
+    '''
+    def __init__(self, week_no, csv_file):
+        self.week_no = week_no
+        with open(csv_file) as csv:
+            self.power_rankings = csv.read().split()
+
+@pytest.fixture
+def service(tmp_path):
+    '''
+    A RankingsService over two csvs and a name file, counting the weeks loaded.
+    '''
+    csv_files = [str(tmp_path / ('week%d.csv' %(week_no))) for week_no in (1, 2)]
+    for csv_file in csv_files:
+        write_file(csv_file, 'A B C')
+    names_file = str(tmp_path / 'aliases.txt')
+    write_file(names_file, 'A,a')
+
+    loads = []
+    def load_week(week_no, method):
+        loads.append((week_no, method, threading.current_thread().name))
+        time.sleep(0.05)
+        return FakeWeek(week_no, csv_files[week_no - 1])
+
+    service = rankings_service.RankingsService(load_week, None, csv_files, 2, {}, name_files=[names_file], max_weeks=1)
+    service.loads = loads
+    return service
+
+def rankings(service, *queries):
+    '''
+    Returns the decoded rankings responses for queries, requested at the same time.
+    '''
+    async def requests():
+        return await asyncio.gather(*[service.rankings(query) for query in queries])
+    return [json.loads(body) for body in asyncio.run(requests())]
+
+def test_pending_requests_shared(service):
+    '''
+    Identical requests waiting at the same time share one load, later ones are cache hits.
+    '''
+    responses = rankings(service, *[{'week': ['2']}] * 5)
+    assert responses == [{'week': 2, 'method': 'mean', 'rankings': ['A', 'B', 'C']}] * 5
+    assert len(service.loads) == 1
+    assert service.loads[0][2] != threading.main_thread().name
+    assert service.pending == {}
+
+    rankings(service, {'week': ['2']})
+    assert len(service.loads) == 1
+    assert service.cache.hits == 1
+
+def test_changed_files_invalidate(service):
+    '''
+    A changed csv or name file is a new response key and reloads the week.
+    '''
+    rankings(service, {'week': ['1']})
+    write_file(service.csv_files[0], 'C B A')
+    assert rankings(service, {'week': ['1']})[0]['rankings'] == ['C', 'B', 'A']
+    assert len(service.loads) == 2
+
+    write_file(service.name_files[0], 'A,a\nB,b')
+    rankings(service, {'week': ['1']})
+    assert len(service.loads) == 3
+    assert service.cache.hits == 0
+
+def test_week_cache_bounded(service):
+    '''
+    Only max_weeks loaded Weeks are kept.
+    '''
+    rankings(service, {'week': ['1']}, {'week': ['2']}, {'week': ['1'], 'method': ['borda']})
+    assert service.weeks.info()['entries'] == 1
+    assert service.weeks.evictions == 2
+
+def test_params_checked(service):
+    '''
+    Bad weeks and methods are 400 errors.
+    '''
+    for query in ({'week': ['0']}, {'week': ['3']}, {'week': ['x']}, {'method': ['nope']}):
+        with pytest.raises(rankings_service.HTTPError) as error:
+            service._params(query)
+        assert error.value.status == 400
@@ -0,0 +1,117 @@
+'''
+Tests for the render cache: hits, invalidation and a corrupted manifest.
+'''
+
+import os
+import types
+
+import pytest
+
+import benchmark_suite
+import render_cache
+from conftest import write_file
+
+RENDERED = []
+
+def render_job(job_skip):
+    '''
+    Saves the outputs of a job (a tuple of filenames) that aren't in skip, recording each call.
+    '''
+    job, skip = job_skip
+    RENDERED.append((job, skip))
+    saved = []
+    for filename in job:
+        if filename not in skip:
+            with open(filename, 'w') as out:
+                out.write('graph')
+            saved.append(filename)
+    return saved
+
+@pytest.fixture
+def season(tmp_path):
+    '''
+    Returns (manifest file, jobs, job_outputs) for two jobs, the second with two outputs, each keyed on one csv.
+    '''
+    del RENDERED[:]
+    csv_files = {}
+    for name in ('a', 'b', 'c'):
+        csv_files[name] = str(tmp_path / (name + '.csv'))
+        write_file(csv_files[name], name)
+    graph = lambda name: str(tmp_path / (name + '.png'))
+    jobs = [(graph('a'),), (graph('b'), graph('c'))]
+
+    def job_outputs(cache, job):
+        return [(filename, cache.key([csv_files[os.path.basename(filename)[0]]], 'graph', 1)) for filename in job]
+    return str(tmp_path / 'render_cache.json'), csv_files, jobs, job_outputs
+
+def render(manifest_file, jobs, job_outputs):
+    '''
+    Returns the filenames saved by render_stale with a fresh RenderCache of manifest_file.
+    '''
+    cache = render_cache.RenderCache(manifest_file)
+    return render_cache.render_stale(cache, render_job, jobs, lambda job: job_outputs(cache, job))
+
+def test_cache_hits_and_csv_change(season):
+    '''
+    A second run renders nothing, a changed csv or a deleted graph renders only the outputs affected.
+    '''
+    manifest_file, csv_files, jobs, job_outputs = season
+    assert render(manifest_file, jobs, job_outputs) == sorted(jobs[0] + jobs[1])
+    assert render(manifest_file, jobs, job_outputs) == []
+    assert len(RENDERED) == 2
+
+    write_file(csv_files['c'], 'changed')
+    assert render(manifest_file, jobs, job_outputs) == [jobs[1][1]]
+    assert RENDERED[-1] == (jobs[1], frozenset([jobs[1][0]]))
+
+    # rewriting a csv with the same contents keeps the key, as it is a hash of the contents.
+    write_file(csv_files['a'], 'a')
+    os.remove(jobs[1][0])
+    assert render(manifest_file, jobs, job_outputs) == [jobs[1][0]]
+
+    assert render_cache.render_stale(None, render_job, jobs, None) == sorted(jobs[0] + jobs[1])
+
+@pytest.mark.parametrize('contents', ['{"a.png": "12', '', '\xff\xfe', '[1, 2]'])
+def test_corrupt_manifest(season, contents):
+    '''
+    A corrupted manifest renders everything again and is rewritten.
+    '''
+    manifest_file, csv_files, jobs, job_outputs = season
+    render(manifest_file, jobs, job_outputs)
+    with open(manifest_file, 'w', encoding='latin-1') as out:
+        out.write(contents)
+    assert render(manifest_file, jobs, job_outputs) == sorted(jobs[0] + jobs[1])
+    assert render(manifest_file, jobs, job_outputs) == []
+
+def test_graph_key(tmp_path, monkeypatch):
+    '''
+    The NFL graph key changes with the csvs, the name files, the style version, the method and the outlier cap.
+    '''
+    nfl = benchmark_suite.import_script(os.path.abspath(benchmark_suite.NFL_DIR), 'nfl_power_rankings')
+    files = {}
+    for name in ('week1.csv', 'week2.csv', 'colors.txt', 'aliases.txt'):
+        files[name] = str(tmp_path / name)
+        write_file(files[name], name)
+    monkeypatch.setattr(nfl, 'TEAM_COLORS_FILE', files['colors.txt'])
+    monkeypatch.setattr(nfl, 'TEAM_ALIASES_FILE', files['aliases.txt'])
+    weeks = [types.SimpleNamespace(csv_file=files['week%d.csv' %(week_no)], method='mean', max_fliers=None) for week_no in (1, 2)]
+    cache = render_cache.RenderCache(str(tmp_path / 'render_cache.json'))
+
+    keys = set()
+    def key_changed():
+        key = nfl.graph_key(cache, 'scatter', weeks)
+        assert key not in keys
+        keys.add(key)
+
+    key_changed()
+    assert nfl.graph_key(cache, 'scatter', weeks) in keys
+    assert nfl.graph_key(cache, 'boxplot', weeks) not in keys
+    for name in files:
+        write_file(files[name], 'changed ' + name)
+        key_changed()
+    monkeypatch.setattr(nfl, 'STYLE_VERSION', nfl.STYLE_VERSION + 1)
+    key_changed()
+    weeks[-1].method = 'schulze'
+    key_changed()
+    weeks[-1].max_fliers = 10
+    key_changed()
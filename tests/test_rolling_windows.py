@@ -0,0 +1,73 @@
+'''
+Misc_Code/rolling_windows against windows sliced out one at a time.
+
+Python 3.9
+'''
+
+import numpy as np
+import pytest
+
+import rolling_windows
+
+CASES = [(length, n, seed) for seed, length in enumerate((1, 2, 7, 30, 101)) for n in (1, 2, 3, 5, 10, 30, 101) if n <= length]
+
+def brute_windows(values, n):
+    '''
+    Every window of length n, sliced one at a time.
+    '''
+    return [values[idx:idx + n] for idx in range(len(values) - n + 1)]
+
+@pytest.mark.parametrize('length, n, seed', CASES)
+def test_windows(length, n, seed):
+    '''
+    Array views and iterator views hold the same windows as slicing.
+    '''
+    values = np.random.default_rng(seed).integers(-50, 50, length)
+    expected = [window.tolist() for window in brute_windows(values, n)]
+
+    view = rolling_windows.windows(values, n)
+    assert view.tolist() == expected
+    assert np.shares_memory(view, values)
+    assert [list(window) for window in rolling_windows.windows(iter(values.tolist()), n, dtype=np.int64)] == expected
+
+def test_windows_short_and_invalid():
+    '''
+    Input shorter than n gives no windows, an empty read-only view of an array, n must be at least 1.
+    '''
+    assert list(rolling_windows.windows(iter([1, 2]), 3)) == []
+    for values, shape in ((np.arange(2), (0, 3)), (np.arange(0), (0, 3)), (np.ones((2, 4)), (0, 4, 3))):
+        empty = rolling_windows.windows(values, 3)
+        assert empty.shape == shape and empty.dtype == values.dtype
+        assert not empty.flags.writeable
+        assert rolling_windows.windows(values, 3).tolist() == []
+    assert rolling_windows.windows(np.arange(3), 3).tolist() == [[0, 1, 2]]
+    with pytest.raises(ValueError):
+        rolling_windows.windows([1, 2], 0)
+
+@pytest.mark.parametrize('length, n, seed', CASES)
+def test_rolling_aggregates(length, n, seed):
+    '''
+    Prefix sum and block min/max aggregates, and their streaming versions, of ints and floats.
+    '''
+    rng = np.random.default_rng(seed)
+    for values in (rng.integers(-50, 50, length), rng.normal(size=length)):
+        windows = brute_windows(values.tolist(), n)
+        np.testing.assert_allclose(rolling_windows.rolling_sum(values, n), [sum(window) for window in windows])
+        np.testing.assert_allclose(rolling_windows.rolling_mean(values, n), [sum(window) / n for window in windows])
+        assert rolling_windows.rolling_min(values, n).tolist() == [min(window) for window in windows]
+        assert rolling_windows.rolling_max(values, n).tolist() == [max(window) for window in windows]
+
+        np.testing.assert_allclose(list(rolling_windows.stream_rolling_sum(iter(values.tolist()), n)), [sum(window) for window in windows])
+        np.testing.assert_allclose(list(rolling_windows.stream_rolling_mean(iter(values.tolist()), n)), [sum(window) / n for window in windows])
+        assert list(rolling_windows.stream_rolling_min(iter(values.tolist()), n)) == [min(window) for window in windows]
+        assert list(rolling_windows.stream_rolling_max(iter(values.tolist()), n)) == [max(window) for window in windows]
+
+def test_rolling_invalid_window():
+    '''
+    The window must fit in the values.
+    '''
+    for func in (rolling_windows.rolling_sum, rolling_windows.rolling_min, rolling_windows.rolling_max):
+        with pytest.raises(ValueError):
+            func([1, 2, 3], 4)
+        with pytest.raises(ValueError):
+            func([1, 2, 3], 0)
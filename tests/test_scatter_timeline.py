@@ -0,0 +1,88 @@
+'''
+Tests for the NFL scatter plot timeline: the incremental frames and the pdf/gif export.
+'''
+
+import os
+import re
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import animation
+import matplotlib.image
+import numpy as np
+import pytest
+
+import benchmark_suite
+
+N_WEEKS = 3
+
+@pytest.fixture(scope='module')
+def nfl():
+    '''
+    The NFL script, imported from its own directory.
+    '''
+    return benchmark_suite.import_script(os.path.abspath(benchmark_suite.NFL_DIR), 'nfl_power_rankings')
+
+@pytest.fixture(scope='module')
+def weeks_data(nfl):
+    '''
+    The first N_WEEKS weeks of the NFL season.
+    '''
+    csv_files = [os.path.join(benchmark_suite.NFL_DIR, csv_file) for csv_file in nfl.CSV_FILE_LIST[:N_WEEKS]]
+    return [nfl.Week(week_no, csv_file, nfl.TEAM_COLORS) for week_no, csv_file in enumerate(csv_files, 1)]
+
+def test_scatter_frames_match_create_scatter(nfl, weeks_data, tmp_path, monkeypatch):
+    '''
+    Each incremental frame is the same image as create_scatter drawn from scratch, and skipped frames aren't saved.
+    '''
+    monkeypatch.chdir(tmp_path)
+    filenames = nfl.create_scatter_frames(weeks_data)
+    assert filenames == [nfl.scatter_filename(week_data.week_no) for week_data in weeks_data[1:]]
+
+    for idx, filename in enumerate(filenames, 2):
+        full = str(tmp_path / ('full%d.png' %(idx)))
+        nfl.create_scatter(weeks_data[:idx], full)
+        assert np.array_equal(matplotlib.image.imread(filename), matplotlib.image.imread(full))
+
+    skip = {nfl.scatter_filename(weeks_data[1].week_no)}
+    assert nfl.create_scatter_frames(weeks_data, skip) == filenames[1:]
+
+def test_export_pdf(nfl, weeks_data, tmp_path):
+    '''
+    The pdf export has one page per week.
+    '''
+    filename = str(tmp_path / 'out' / 'season.pdf')
+    assert nfl.export_scatter_timeline(weeks_data, filename) == filename
+    with open(filename, 'rb') as pdf:
+        data = pdf.read()
+    assert data.startswith(b'%PDF')
+    assert len(re.findall(rb'/Type\s*/Page\b', data)) == N_WEEKS
+
+@pytest.mark.skipif(not animation.writers.is_available('pillow'), reason='needs pillow')
+def test_export_gif(nfl, weeks_data, tmp_path):
+    '''
+    The gif export has one frame per week, all the same size.
+    '''
+    from PIL import Image
+
+    filename = str(tmp_path / 'season.gif')
+    nfl.export_scatter_timeline(weeks_data, filename)
+    with Image.open(filename) as gif:
+        assert gif.n_frames == N_WEEKS
+
+def test_export_problem(nfl, weeks_data, tmp_path, monkeypatch):
+    '''
+    An unknown extension or a missing animation writer is reported before anything is drawn.
+    '''
+    assert nfl.export_problem('season.pdf') is None
+    assert 'Can only export' in nfl.export_problem('season.png')
+
+    monkeypatch.setattr(animation.writers, 'is_available', lambda name: False)
+    assert 'ffmpeg' in nfl.export_problem('season.mp4')
+    assert 'pillow' in nfl.export_problem('season.GIF')
+    with pytest.raises(ValueError):
+        nfl.export_scatter_timeline(weeks_data, str(tmp_path / 'season.mp4'))
+    assert not os.path.exists(str(tmp_path / 'season.mp4'))
+
+    with pytest.raises(SystemExit):
+        nfl.main(['render', '--export', 'season.mp4'])
@@ -0,0 +1,163 @@
+'''
+season_store.SeasonStore round trips: append, overwrite, grow and reopen.
+
+Python 3.9
+'''
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import ballots
+import season_store
+from conftest import make_ballots
+
+def expected_week(store, teams, week_ballots, rankers):
+    '''
+    The ballots as the store gives them back: rankers in store order without those who ranked nobody.
+    '''
+    order = sorted(range(len(rankers)), key=lambda idx: store.ranker_ids[rankers[idx]])
+    rows = week_ballots[order]
+    return teams, rows[(rows != ballots.MISSING).any(axis=1)]
+
+def assert_week(store, week_no, teams, week_ballots, rankers):
+    '''
+    The store gives back week_no as it was appended.
+    '''
+    stored_teams, stored = store.week_ballots(week_no)
+    expected_teams, expected = expected_week(store, teams, week_ballots, rankers)
+    assert stored_teams == expected_teams
+    np.testing.assert_array_equal(stored, expected)
+
+def season(n_weeks, n_rankers, n_teams, seed=0):
+    '''
+    n_weeks of (teams, ballots, rankers) with the rankers coming and going, the teams in a different order each week.
+    '''
+    rng = np.random.default_rng(seed)
+    weeks = []
+    for week_no in range(1, n_weeks + 1):
+        teams, week_ballots = make_ballots(n_rankers, n_teams, 0.1, 0.05, seed=seed + week_no)
+        columns = rng.permutation(n_teams)
+        names = ['ranker%02d' %(idx) for idx in rng.choice(2 * n_rankers, n_rankers, replace=False)]
+        weeks.append(([teams[idx] for idx in columns], week_ballots[:, columns], names))
+    return weeks
+
+def test_append_and_reopen(tmp_path):
+    '''
+    Every week reads back the same, before and after reopening the store.
+    '''
+    weeks = season(4, 9, 6)
+    store = season_store.SeasonStore(str(tmp_path), max_rankers=32, max_teams=8)
+    for week_no, (teams, week_ballots, rankers) in enumerate(weeks, 1):
+        store.append_week(week_no, teams, week_ballots, rankers, source={'week': week_no})
+
+    reopened = season_store.SeasonStore(str(tmp_path))
+    assert reopened.weeks == [1, 2, 3, 4]
+    for week_no, week in enumerate(weeks, 1):
+        assert_week(store, week_no, *week)
+        assert_week(reopened, week_no, *week)
+        assert reopened.source(week_no) == {'week': week_no}
+
+def test_grow(tmp_path):
+    '''
+    More rankers or teams than a slice holds copy the weeks into a new generation of the data file,
+    removing the old one, and the earlier weeks keep their ballots.
+    '''
+    store = season_store.SeasonStore(str(tmp_path), max_rankers=2, max_teams=2)
+    assert os.path.exists(os.path.join(str(tmp_path), season_store.DATA_FILE))
+    weeks = season(3, 5, 6, seed=3)
+    for week_no, (teams, week_ballots, rankers) in enumerate(weeks, 1):
+        store.append_week(week_no, teams, week_ballots, rankers)
+        assert store.header['max_rankers'] >= len(store.header['rankers'])
+        assert store.header['max_teams'] >= len(store.header['teams'])
+        for earlier_no in range(1, week_no + 1):
+            assert_week(store, earlier_no, *weeks[earlier_no - 1])
+
+    data_files = sorted(name for name in os.listdir(str(tmp_path)) if name.endswith('.bin'))
+    assert data_files == [store.header['data_file']] == ['ranks.%d.bin' %(store.header['generation'])]
+    # doubled from 2 until everyone fits.
+    for key, names in (('max_rankers', 'rankers'), ('max_teams', 'teams')):
+        size = store.header[key]
+        assert size & (size - 1) == 0 and size // 2 < len(store.header[names]) <= size
+
+    reopened = season_store.SeasonStore(str(tmp_path))
+    for week_no, week in enumerate(weeks, 1):
+        assert_week(reopened, week_no, *week)
+
+def test_overwrite_week(tmp_path):
+    '''
+    Storing a week again replaces it in place, with its new teams order and source.
+    '''
+    store = season_store.SeasonStore(str(tmp_path), max_rankers=16, max_teams=8)
+    first, second, replacement = season(3, 6, 6, seed=5)
+    store.append_week(1, *first, source='old')
+    store.append_week(2, *second)
+    size = os.path.getsize(store.data_file)
+
+    store.append_week(1, *replacement, source='new')
+    assert store.weeks == [1, 2]
+    assert os.path.getsize(store.data_file) == size
+    assert store.source(1) == 'new'
+
+    reopened = season_store.SeasonStore(str(tmp_path))
+    assert_week(reopened, 1, *replacement)
+    assert_week(reopened, 2, *second)
+
+def test_unnamed_and_missing_rankers(tmp_path):
+    '''
+    Unnamed rankers are numbered by row, and rankers who ranked nobody aren't given back.
+    '''
+    teams, week_ballots = make_ballots(5, 4, seed=1)
+    week_ballots[2] = ballots.MISSING
+    store = season_store.SeasonStore(str(tmp_path))
+    store.append_week(1, teams, week_ballots)
+    assert store.header['rankers'] == ['0', '1', '2', '3', '4']
+    stored_teams, stored = store.week_ballots(1)
+    np.testing.assert_array_equal(stored, week_ballots[[0, 1, 3, 4]])
+
+def test_half_written_append_ignored(tmp_path):
+    '''
+    Data written past the weeks in the header (a crash before the header was written) is not read.
+    '''
+    store = season_store.SeasonStore(str(tmp_path), max_rankers=8, max_teams=4)
+    week = season(1, 4, 4)[0]
+    store.append_week(1, *week)
+    with open(store.data_file, 'ab') as data_file:
+        data_file.write(b'\x01' * 64)
+    reopened = season_store.SeasonStore(str(tmp_path))
+    assert reopened.weeks == [1]
+    assert_week(reopened, 1, *week)
+
+def test_version_checked(tmp_path):
+    '''
+    A store written by another version is refused.
+    '''
+    season_store.SeasonStore(str(tmp_path))
+    header_file = os.path.join(str(tmp_path), season_store.HEADER_FILE)
+    with open(header_file) as open_file:
+        header = json.load(open_file)
+    header['version'] = season_store.STORE_VERSION + 1
+    with open(header_file, 'w') as open_file:
+        json.dump(header, open_file)
+    with pytest.raises(ValueError):
+        season_store.SeasonStore(str(tmp_path))
+
+def test_csv_source(tmp_path):
+    '''
+    The source changes when the csv is edited (size or mtime), so the week is imported again.
+    '''
+    csv_file = str(tmp_path / 'week01.csv')
+    with open(csv_file, 'w') as open_file:
+        open_file.write('Patriots,Jets\n')
+    source = season_store.csv_source(csv_file)
+    assert season_store.csv_source(csv_file) == source
+
+    os.utime(csv_file, (source['mtime'] + 10, source['mtime'] + 10))
+    touched = season_store.csv_source(csv_file)
+    assert touched != source and touched['size'] == source['size']
+
+    with open(csv_file, 'a') as open_file:
+        open_file.write('Jets,Patriots\n')
+    assert season_store.csv_source(csv_file)['size'] != source['size']
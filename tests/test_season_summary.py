@@ -0,0 +1,67 @@
+'''
+season_summary.summarize against matplotlib's boxplot_stats.
+
+Python 3.9
+'''
+
+import numpy as np
+import pytest
+
+import season_store
+import season_summary
+from conftest import write_file
+
+def test_summarize_matches_boxplot_stats(week):
+    '''
+    Quartiles, whiskers and outliers of each team are what matplotlib's boxplot would draw.
+    '''
+    cbook = pytest.importorskip('matplotlib.cbook')
+    teams, week_ballots = week
+    summary = season_summary.summarize(teams, week_ballots)
+    for team_idx, team in enumerate(teams):
+        ranks = week_ballots[:, team_idx]
+        ranks = ranks[ranks != 0]
+        if not len(ranks):
+            assert summary.stats['count'][team_idx] == 0
+            continue
+        expected = cbook.boxplot_stats(ranks.astype(np.float64))[0]
+        for field, key in (('median', 'med'), ('q1', 'q1'), ('q3', 'q3'), ('whislo', 'whislo'), ('whishi', 'whishi'), ('mean', 'mean')):
+            assert summary.stats[field][team_idx] == pytest.approx(expected[key]), field
+        assert sorted(summary.team_fliers(team).tolist()) == sorted(expected['fliers'].tolist())
+
+def test_summary_table_invalidated(week, tmp_path, monkeypatch):
+    '''
+    A saved summary is loaded while the csv and name files are unchanged, and summarized again
+    when either changes.
+    '''
+    teams, week_ballots = week
+    csv_file, names_file = str(tmp_path / 'week01.csv'), str(tmp_path / 'aliases.txt')
+    write_file(csv_file, 'ranks')
+    write_file(names_file, 'names')
+    summarized = []
+    summarize = season_summary.summarize
+    monkeypatch.setattr(season_summary, 'summarize', lambda *args: summarized.append(args) or summarize(*args))
+
+    def get():
+        table = season_summary.SummaryTable(str(tmp_path / 'summary'), [names_file])
+        return table.get(1, season_store.csv_source(csv_file), teams, week_ballots)
+
+    summary = get()
+    loaded = get()
+    assert len(summarized) == 1
+    assert loaded.teams == summary.teams
+    for field in season_summary.STAT_FIELDS:
+        np.testing.assert_array_equal(loaded.stats[field], summary.stats[field])
+    for expected, actual in zip(summary.fliers, loaded.fliers):
+        np.testing.assert_array_equal(actual, expected)
+
+    write_file(csv_file, 'new ranks')
+    get()
+    assert len(summarized) == 2
+    get()
+    assert len(summarized) == 2
+
+    write_file(names_file, 'new names')
+    get()
+    assert len(summarized) == 3
+    assert season_summary.SummaryTable(str(tmp_path / 'summary')).load(1, season_store.csv_source(csv_file)) is None
@@ -0,0 +1,100 @@
+'''
+team_names.TeamNames against a linear search of the leagues' alias lists.
+
+Python 3.9
+'''
+
+import numpy as np
+import pytest
+
+import rankings_engine
+import team_names
+
+def brute_resolve(aliases, cell):
+    '''
+    The one team with an alias (or canonical name) equal to cell ignoring case, spaces and punctuation,
+    a canonical name winning over other teams' aliases. None if no team or several.
+    '''
+    key = team_names.normalize(cell)
+    canonical = [team for team in aliases if team_names.normalize(team) == key]
+    if canonical:
+        return canonical[0]
+    matches = set(team for team, team_aliases in aliases.items() if key in [team_names.normalize(alias) for alias in team_aliases])
+    return matches.pop() if len(matches) == 1 else None
+
+def league_aliases(league):
+    '''
+    The merged aliases dict the engine builds a league's TeamNames from.
+    '''
+    settings = rankings_engine.LEAGUES[league]
+    alias_dicts = []
+    if settings.team_list_file:
+        alias_dicts.append(team_names.team_list_aliases(team_names.read_team_list(settings.team_list_file)))
+    if settings.aliases_file:
+        alias_dicts.append(team_names.read_aliases(settings.aliases_file))
+    return team_names.merge_aliases(*alias_dicts)
+
+def respell(name, rng):
+    '''
+    The same name as a ranker might type it: random case, doubled spaces, dots and padding.
+    '''
+    letters = [char.upper() if rng.random() < 0.5 else char.lower() for char in name]
+    spelled = ''.join(letters).replace(' ', rng.choice([' ', '  ', '. ']))
+    return rng.choice(['', ' ', '  ']) + spelled + rng.choice(['', ' ', '.'])
+
+@pytest.mark.parametrize('league', sorted(rankings_engine.LEAGUES))
+def test_every_alias(league):
+    '''
+    Every alias of every team, however it is spelled, resolves as the linear search does.
+    '''
+    aliases = league_aliases(league)
+    names = rankings_engine.league_team_names(league)
+    rng = np.random.default_rng(0)
+    resolved = 0
+    for team, team_aliases in aliases.items():
+        for alias in [team] + team_aliases:
+            for cell in (alias, respell(alias, rng), respell(alias, rng)):
+                expected = brute_resolve(aliases, cell)
+                if expected is not None:
+                    assert names.clean_name(cell) == expected, cell
+                    assert names.team_id(cell) == names.teams.index(expected)
+                    resolved += 1
+        # every team can be named.
+        assert names.clean_name(team) == team
+    assert names.teams == list(aliases)
+    assert resolved > 3 * len(aliases)
+
+def test_flair_words_and_typos():
+    '''
+    Reddit flair, words around the name, and typos resolve; a word naming another team isn't trusted.
+    '''
+    nfl = rankings_engine.league_team_names('nfl')
+    assert nfl.clean_name('[](/NE)') == 'Patriots'
+    assert nfl.clean_name('[](/NE) Patriots') == 'Patriots'
+    assert nfl.clean_name('Patriots (11-1)') == 'Patriots'
+    assert nfl.clean_name('Patriats') == 'Patriots'
+    assert nfl.clean_name('LA') == 'Rams'
+    # 'LA' alone is the Rams, but here the other word says Chargers.
+    assert nfl.clean_name('LA Chargers') == 'Chargers'
+    assert nfl.clean_name('not a team') is None
+
+def test_shared_city():
+    '''
+    A city with two teams is ambiguous, the full names are not.
+    '''
+    nba = rankings_engine.league_team_names('nba')
+    assert nba.clean_name('Golden State Warriors') == 'Golden State'
+    assert nba.clean_name('Los Angeles Lakers') == 'LA Lakers'
+    assert nba.clean_name('LAC') == 'LA Clippers'
+    assert nba.clean_name('Los Angeles') is None
+    assert 'la' in nba.ambiguous or 'losangeles' in nba.ambiguous
+
+def test_canonical_name_wins():
+    '''
+    An alias shared with another team's canonical name goes to that team, other shared aliases to neither.
+    '''
+    names = team_names.TeamNames({'Jets': ['NY', 'Gang Green'], 'Giants': ['NY', 'Jets fans hate them'], 'Big Blue': ['Jets']})
+    assert names.clean_name('Jets') == 'Jets'
+    assert names.clean_name('NY') is None
+    assert names.clean_name('gang green') == 'Jets'
+    assert names.ambiguous == ['jets', 'ny']